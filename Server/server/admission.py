@@ -0,0 +1,313 @@
+# admission.py
+import math, os, threading, time, uuid
+from collections import deque
+from functools import wraps
+from flask import request, jsonify
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+
+# Defaults per gate, overridable through app.config['ADMISSION_LIMITS']
+DEFAULT_LIMITS = {
+    'concurrency': 16,  # requests allowed into the handler at once
+    'rate': 500,  # token bucket refill per second
+    'burst': 100,
+    'queue': 200,  # requests allowed to wait in line inside the worker
+    'wait': 5,  # seconds a queued request waits before being shed
+    'token_age': 600  # seconds a waiting room token stays valid
+}
+
+
+class MemoryWaitingRoom:
+    """Waiting room positions for a single worker; another worker's room doesn't know its tokens."""
+
+    def __init__(self):
+        # Positions only mean something to the room that issued them
+        self.id = uuid.uuid4().hex[:8]
+        self.lock = threading.Lock()
+        # 'serving' advances as requests complete
+        self.issued = 0
+        self.serving = 0
+        # Positions whose token already jumped the line, with when they did
+        self.redeemed = {}
+
+    def issue(self):
+        with self.lock:
+            self.issued = max(self.issued, self.serving) + 1
+            return self.issued
+
+    def advance(self):
+        with self.lock:
+            if self.serving < self.issued:
+                self.serving += 1
+
+    def redeem(self, position, token_age):
+        with self.lock:
+            now = time.monotonic()
+            # Their tokens have expired by now, so nobody can present them again
+            for used, at in list(self.redeemed.items()):
+                if now - at > token_age:
+                    del self.redeemed[used]
+            if position > self.serving or position in self.redeemed:
+                return False
+            self.redeemed[position] = now
+            return True
+
+    def unredeem(self, position):
+        with self.lock:
+            self.redeemed.pop(position, None)
+
+    def state(self):
+        # (issued, serving)
+        return self.issued, self.serving
+
+
+REDIS_ISSUE = """
+local issued = math.max(tonumber(redis.call('GET', KEYS[1]) or '0'), tonumber(redis.call('GET', KEYS[2]) or '0')) + 1
+redis.call('SET', KEYS[1], issued)
+return issued
+"""
+
+REDIS_ADVANCE = """
+if tonumber(redis.call('GET', KEYS[2]) or '0') < tonumber(redis.call('GET', KEYS[1]) or '0') then
+    redis.call('INCR', KEYS[2])
+end
+"""
+
+
+class RedisWaitingRoom:
+    """Waiting room positions shared by every worker through Redis, so a token works whichever worker it reaches."""
+
+    def __init__(self, name, url, prefix='transitewise:admission:'):
+        import redis  # optional dependency, only needed for multi-worker deployments
+        self.client = redis.Redis.from_url(url)
+        self.prefix = f'{prefix}{name}:'
+        # The first worker to start picks the id; tokens from before a Redis flush stop working with it
+        self.client.set(self.prefix + 'id', uuid.uuid4().hex[:8], nx=True)
+        self.id = self.client.get(self.prefix + 'id').decode()
+        self.keys = [self.prefix + 'issued', self.prefix + 'serving']
+        self.issue_script = self.client.register_script(REDIS_ISSUE)
+        self.advance_script = self.client.register_script(REDIS_ADVANCE)
+
+    def issue(self):
+        return int(self.issue_script(keys=self.keys))
+
+    def advance(self):
+        self.advance_script(keys=self.keys)
+
+    def redeem(self, position, token_age):
+        if position > self.state()[1]:
+            return False
+        # Kept until the token has expired, so nobody can present it again
+        return bool(self.client.set(f'{self.prefix}redeemed:{position}', 1, nx=True, ex=token_age))
+
+    def unredeem(self, position):
+        self.client.delete(f'{self.prefix}redeemed:{position}')
+
+    def state(self):
+        issued, serving = self.client.mget(self.keys)
+        return int(issued or 0), int(serving or 0)
+
+
+class Gate:
+    """Concurrency limit and token bucket with a FIFO line and a virtual waiting room.
+
+    The limits and the line are per worker; the waiting room is shared when it is
+    a RedisWaitingRoom.
+    """
+
+    def __init__(self, name, concurrency, rate, burst, queue, wait, token_age, room=None):
+        if concurrency < 1 or rate <= 0 or burst < 1:
+            raise ValueError(f'Admission gate {name!r} needs concurrency, rate and burst above zero')
+        self.name = name
+        self.room = room or MemoryWaitingRoom()
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.max_queue = queue
+        self.max_wait = wait
+        self.token_age = token_age
+        self.condition = threading.Condition()
+        self.line = deque()
+        self.active = 0
+        self.tokens = burst
+        self.refilled = time.monotonic()
+        self.admitted = 0
+        self.shed = 0
+        self.waited = 0.0
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled) * self.rate)
+        self.refilled = now
+
+    def has_capacity(self, now):
+        self.refill(now)
+        return self.active < self.concurrency and self.tokens >= 1
+
+    def admit(self, started):
+        self.active += 1
+        self.tokens -= 1
+        self.admitted += 1
+        self.waited += time.monotonic() - started
+
+    def acquire(self, priority=False):
+        """Returns True once admitted, False when the request should be shed."""
+        started = time.monotonic()
+        with self.condition:
+            if not self.line and self.has_capacity(started):
+                self.admit(started)
+                return True
+            if len(self.line) >= self.max_queue and not priority:
+                self.shed += 1
+                return False
+
+            entry = object()
+            if priority:
+                self.line.appendleft(entry)
+            else:
+                self.line.append(entry)
+            deadline = started + self.max_wait
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self.line[0] is entry and self.has_capacity(now):
+                        self.admit(started)
+                        return True
+                    if now >= deadline:
+                        self.shed += 1
+                        return False
+                    # Wake on a release, or when the bucket has the head's next token
+                    if self.line[0] is not entry or self.active >= self.concurrency:
+                        self.condition.wait(deadline - now)
+                    else:
+                        self.condition.wait(min(deadline - now, (1 - self.tokens) / self.rate))
+            finally:
+                self.line.remove(entry)
+                self.condition.notify_all()
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify_all()
+        self.room.advance()
+
+    @property
+    def id(self):
+        return self.room.id
+
+    @property
+    def serving(self):
+        return self.room.state()[1]
+
+    def redeem(self, position):
+        """Claims the priority a position's token carries; False if it was used before or isn't due yet."""
+        return self.room.redeem(position, self.token_age)
+
+    def unredeem(self, position):
+        # Not admitted after all; the same token may try again
+        self.room.unredeem(position)
+
+    def issue_position(self):
+        return self.room.issue()
+
+    def retry_after(self, position, serving):
+        # Rough wait: people ahead divided by the slowest of the two limits
+        ahead = max(position - serving, 1) + len(self.line)
+        return max(1, math.ceil(ahead / max(min(self.rate, self.concurrency * 10), 1)))
+
+    def metrics(self):
+        issued, serving = self.room.state()
+        with self.condition:
+            return {
+                'active': self.active,
+                'queue_depth': len(self.line),
+                'waiting_room': max(issued - serving, 0),
+                'admitted': self.admitted,
+                'shed': self.shed,
+                'average_wait_ms': round(self.waited / self.admitted * 1000, 3) if self.admitted else 0
+            }
+
+
+class AdmissionControl:
+    def __init__(self, app=None):
+        self.gates = {}
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('ADMISSION_ENABLED', True)
+        app.config.setdefault('ADMISSION_LIMITS', {})
+        # Redis, so waiting room tokens work on every worker; without it each worker has its own room
+        app.config.setdefault('ADMISSION_STORAGE_URL', os.getenv('ADMISSION_STORAGE_URL'))
+        self.gates = {}
+        # Bad limits fail at startup rather than on the first request through the gate
+        for name in app.config['ADMISSION_LIMITS']:
+            self.gate(name)
+
+    @property
+    def serializer(self):
+        if not self.app.secret_key:
+            # A token signed with a known key lets anyone mint their own place at the front
+            raise RuntimeError('SECRET_KEY must be set to issue waiting room tokens')
+        return URLSafeTimedSerializer(self.app.secret_key, salt='waiting-room')
+
+    def gate(self, name):
+        with self.lock:
+            if name not in self.gates:
+                limits = dict(DEFAULT_LIMITS, **self.app.config['ADMISSION_LIMITS'].get(name, {}))
+                url = self.app.config['ADMISSION_STORAGE_URL']
+                room = RedisWaitingRoom(name, url) if url else MemoryWaitingRoom()
+                self.gates[name] = Gate(name, room=room, **limits)
+            return self.gates[name]
+
+    def position(self, gate):
+        # The waiting room position in a signed token this gate issued
+        token = request.headers.get('X-Queue-Token')
+        if not token:
+            return None
+        try:
+            name, gate_id, position = self.serializer.loads(token, max_age=gate.token_age)
+        except (BadSignature, ValueError, TypeError):
+            return None
+        return position if (name, gate_id) == (gate.name, gate.id) else None
+
+    def limit(self, name, methods=None):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.app.config['ADMISSION_ENABLED'] or (methods and request.method not in methods):
+                    return view(*args, **kwargs)
+
+                gate = self.gate(name)
+                position = self.position(gate)
+                # A token whose turn has come skips the line limit once
+                priority = position is not None and gate.redeem(position)
+                if not gate.acquire(priority=priority):
+                    serving = gate.serving
+                    if priority:
+                        gate.unredeem(position)
+                    elif position is not None and position <= serving:
+                        # Already used: back of the room
+                        position = None
+                    position = position or gate.issue_position()
+                    response = jsonify({
+                        'message': 'High demand, you are in the waiting room',
+                        'position': position,
+                        'ahead': max(position - serving, 0),
+                        'token': self.serializer.dumps([gate.name, gate.id, position])
+                    })
+                    response.status_code = 503
+                    response.headers['Retry-After'] = str(gate.retry_after(position, serving))
+                    return response
+                try:
+                    return view(*args, **kwargs)
+                finally:
+                    gate.release()
+            return wrapper
+        return decorator
+
+    def metrics(self):
+        return {name: gate.metrics() for name, gate in self.gates.items()}
+
+
+admission = AdmissionControl()
@@ -0,0 +1,4 @@
+# api/__init__.py
+from api import auth, users, fleet, reservations, feedback, planning, system, sync
+
+blueprints = [auth.bp, users.bp, fleet.bp, reservations.bp, feedback.bp, planning.bp, system.bp, sync.bp]
@@ -0,0 +1,136 @@
+# api/auth.py
+from flask import Blueprint, request, session, jsonify
+from flask_jwt_extended import create_access_token, jwt_required
+from models import db, User, Driver, Admin
+from ratelimit import limiter
+from firebase import firebase
+from api.common import jwt_identity
+
+bp = Blueprint('auth', __name__)
+
+# Endpoint to create a new user
+@bp.route('/signup', methods=['POST'])
+@limiter.limit('5/minute')
+def signup():
+    request_json = request.get_json()
+
+    username = request_json.get('username')
+    email = request_json.get('email')
+    password = request_json.get('password')
+
+    if not email or not password or not username:
+        return jsonify({'message': 'Email, password, and username are required'}), 400
+    try:
+        # Create Firebase user
+        user_record = firebase.auth.create_user(
+            email=email,
+            password=password
+        )
+        firebase_uid = user_record.uid
+
+        # Create new user in PostgreSQL
+        new_user = User(email=email, username=username, firebase_uid=firebase_uid)
+        db.session.add(new_user)
+        db.session.commit()
+
+        access_token = create_access_token(identity=str(new_user.id))
+        return jsonify({'token': access_token}), 201
+    
+    except Exception as e:
+        return jsonify({'message': 'Error registering user', 'error': str(e)}), 400
+
+    
+@bp.route('/login', methods=['POST'])
+@limiter.limit('10/minute')
+def login():
+    request_json = request.get_json()
+
+    uid = request_json.get('uid')
+    email = request_json.get('email')
+
+    if not uid or not email:
+        return jsonify({'message': 'UID and email are required'}), 400
+
+    try:
+        # Get user from Firebase using the UID
+        user_record = firebase.auth.get_user(uid)
+        
+        # Optionally, get user from PostgreSQL if needed
+        user = User.query.filter_by(firebase_uid=uid).first()
+
+        if user:
+            access_token = create_access_token(identity=str(user.id))
+            return jsonify({
+                'token': access_token,
+                'user': {
+                    'email': user_record.email,
+                    'name': user.username
+                }
+            }), 200
+        else:
+            return jsonify({'message': 'User not found in database'}), 404
+    except firebase.auth.AuthError as e:
+        return jsonify({'message': 'Error fetching user data from Firebase', 'error': str(e)}), 401
+
+@bp.route('/current_user', methods=['GET'])
+@jwt_required()
+def get_current_user():
+    try:
+        current_user_id = jwt_identity()
+        current_user = User.query.get(current_user_id)
+
+        if current_user:
+            return jsonify({
+                'id': current_user.id,
+                'email': current_user.email,
+                'name': current_user.username,
+            }), 200
+        else:
+            return jsonify({'message': 'User not found'}), 404
+    except Exception as e:
+        return jsonify({'message': 'An error occurred', 'error': str(e)}), 500
+
+@bp.route('/current_driver', methods=['GET'])
+@jwt_required()
+def get_current_driver():
+    try:
+        current_driver_id = jwt_identity()
+        current_driver = Driver.query.get(current_driver_id)
+
+        if current_driver:
+            return jsonify({
+                'id': current_driver.id,
+                'full_name': current_driver.full_name,
+                'id_number': current_driver.id_number,
+                'driving_license': current_driver.driving_license,
+                'phone_number': current_driver.phone_number
+            }), 200
+        else:
+            return jsonify({'message': 'User not found'}), 404
+    except Exception as e:
+        return jsonify({'message': 'An error occurred', 'error': str(e)}), 500
+    
+@bp.route('/current_admin', methods=['GET'])
+@jwt_required()
+def get_current_admin():
+    try:
+        current_admin_id = jwt_identity()
+        current_admin = Admin.query.get(current_admin_id)
+
+        if current_admin:
+            return jsonify({
+                'id': current_admin.id,
+                'full_name': current_admin.full_name,
+                'id_number': current_admin.id_number,
+                'phone_number': current_admin.phone_number
+            }), 200
+        else:
+            return jsonify({'message': 'User not found'}), 404
+    except Exception as e:
+        return jsonify({'message': 'An error occurred', 'error': str(e)}), 500
+
+@bp.route('/logout', methods=['DELETE'])
+def logout():
+    session.pop('user_id', None)  # Removes the user_id from the session if it exists
+    
+    return jsonify({}), 204
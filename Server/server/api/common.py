@@ -0,0 +1,55 @@
+# api/common.py
+import base64, json
+from datetime import datetime
+from flask import request
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
+from stops import resolve_stop
+from models import db
+
+
+def jwt_identity():
+    # Tokens carry the id as a string: PyJWT rejects any other subject
+    identity = get_jwt_identity()
+    return int(identity) if identity is not None else None
+
+
+def optional_user_id():
+    # Bookings can be made anonymously; a valid token links them to the account
+    try:
+        verify_jwt_in_request(optional=True)
+    except (JWTExtendedException, PyJWTError):
+        return None
+    return jwt_identity()
+
+
+def date_range():
+    # Optional ?from=&to= ISO datetimes; raises ValueError if malformed
+    start = datetime.fromisoformat(request.args['from']) if request.args.get('from') else None
+    end = datetime.fromisoformat(request.args['to']) if request.args.get('to') else None
+    return start, end
+
+
+def stop_values(data, field):
+    # Name and id columns for a stop given in a request body; raises ValueError for a blank name
+    stop = resolve_stop(data[field])
+    return {field: stop.name, f'{field}_id': stop.id}
+
+
+def encode_cursor(values):
+    # Opaque to clients: the sort key of the last row on a page
+    data = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    # The values in the columns' types; raises ValueError if malformed
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError('Invalid cursor')
+    return [datetime.fromisoformat(value) if isinstance(column.type, db.DateTime) else value
+            for value, column in zip(values, columns)]
@@ -0,0 +1,191 @@
+# api/feedback.py
+from flask import Blueprint, request, jsonify, url_for
+from sqlalchemy import tuple_
+from models import db, Review, ContactUs
+from ratelimit import limiter
+from formats import listing
+from writebehind import write_behind
+from ratings import summary
+from search import SEARCHABLE, search
+from api.common import encode_cursor, decode_cursor
+
+bp = Blueprint('feedback', __name__)
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# Sort -> key columns, all descending; each is backed by an index on reviews
+REVIEW_ORDERS = {
+    'recent': (Review.created_at, Review.id),
+    'rating': (Review.rating, Review.created_at, Review.id)
+}
+
+
+def text_values(data, limits):
+    # Required text fields, checked up front since buffered rows are inserted after the response
+    values = {}
+    for field, limit in limits.items():
+        value = data.get(field)
+        if not isinstance(value, str) or not value.strip() or (limit and len(value) > limit):
+            raise ValueError(f'{field} is required' + (f' and at most {limit} characters' if limit else ''))
+        values[field] = value
+    return values
+
+
+def rating_value(data):
+    rating = data.get('rating')
+    if not isinstance(rating, int) or isinstance(rating, bool) or not 1 <= rating <= 5:
+        raise ValueError('rating must be a whole number from 1 to 5')
+    return rating
+
+
+def review_values(data):
+    values = text_values(data, {'name': 50, 'email': 50, 'review': None})
+    return {**values, 'rating': rating_value(data)}
+
+
+def contact_values(data):
+    return text_values(data, {'name': 255, 'email': 255, 'message': None})
+
+
+def page_size(value, default):
+    return max(1, min(int(value), MAX_PAGE_SIZE)) if value else default
+
+
+def reviews_page(args):
+    # Raises ValueError for an unknown sort, a malformed cursor or a non-numeric limit or rating
+    sort = args.get('sort', 'recent')
+    if sort not in REVIEW_ORDERS:
+        raise ValueError(f"sort must be one of {', '.join(REVIEW_ORDERS)}")
+    columns = REVIEW_ORDERS[sort]
+    limit = page_size(args.get('limit'), PAGE_SIZE)
+    query = Review.query
+    if args.get('rating'):
+        query = query.filter(Review.rating == int(args['rating']))
+    if args.get('after'):
+        # Rows after the last one sent, found through the index instead of skipping OFFSET rows
+        query = query.filter(tuple_(*columns) < tuple_(*decode_cursor(args['after'], columns)))
+    rows = query.order_by(*[column.desc() for column in columns]).limit(limit + 1).all()
+    following = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        following = encode_cursor([getattr(rows[-1], column.key) for column in columns])
+    return rows, following
+
+
+def accepted(kind, values):
+    # Acknowledged now, inserted with the next batch
+    return jsonify({**values, 'provisional_id': write_behind.submit(kind, values), 'status': 'queued'}), 202
+
+# Endpoint to manage reviews
+@bp.route('/reviews', methods=['GET', 'POST'])
+@limiter.limit('5/minute', methods=['POST'])
+def manage_reviews():
+    if request.method == 'GET':
+        # Without limit or after: every review, as before
+        if not request.args.get('limit') and not request.args.get('after'):
+            reviews = Review.query.all()
+            return listing([review.to_dict() for review in reviews])
+        try:
+            reviews, following = reviews_page(request.args)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        response = listing([review.to_dict() for review in reviews])
+        if following:
+            args = {**request.args.to_dict(), 'after': following}
+            response.headers['Link'] = f'<{url_for("feedback.manage_reviews", **args)}>; rel="next"'
+        return response
+    elif request.method == 'POST':
+        try:
+            values = review_values(request.get_json(silent=True) or {})
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        if write_behind.enabled:
+            return accepted('review', values)
+        new_review = Review(**values)
+        db.session.add(new_review)
+        db.session.commit()
+        return jsonify(new_review.to_dict()), 201
+
+@bp.route('/reviews/summary', methods=['GET'])
+def review_summary():
+    return jsonify(summary()), 200
+
+@bp.route('/reviews/<int:id>', methods=['GET', 'PATCH', 'DELETE'])
+def manage_review(id):
+    review = Review.query.get_or_404(id)
+    if request.method == 'GET':
+        return jsonify(review.to_dict())
+    elif request.method == 'PATCH':
+        data = request.json
+        try:
+            rating = rating_value(data) if 'rating' in data else review.rating
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        if 'name' in data:
+            review.name = data['name']
+        if 'email' in data:
+            review.email = data['email']
+        if 'review' in data:
+            review.review = data['review']
+        review.rating = rating
+        db.session.commit()
+        return jsonify(review.to_dict())
+    elif request.method == 'DELETE':
+        db.session.delete(review)
+        db.session.commit()
+        return '', 204
+    
+# Endpoint to manage contactus
+@bp.route('/contact', methods=['GET', 'POST'])
+@limiter.limit('5/minute', methods=['POST'])
+def manage_contactus():
+    if request.method == 'GET':
+        contactus = ContactUs.query.all()
+        return listing([contact.to_dict() for contact in contactus])
+    elif request.method == 'POST':
+        try:
+            values = contact_values(request.get_json(silent=True) or {})
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        if write_behind.enabled:
+            return accepted('contact', values)
+        new_contact = ContactUs(**values)
+        db.session.add(new_contact)
+        db.session.commit()
+        return jsonify(new_contact.to_dict()), 201
+    
+@bp.route('/contact/<int:id>', methods=['GET', 'PATCH', 'DELETE'])
+def manage_contact(id):
+    contact = ContactUs.query.get_or_404(id)
+    if request.method == 'GET':
+        return jsonify(contact.to_dict())
+    elif request.method == 'PATCH':
+        data = request.json
+        if 'name' in data:
+            contact.name = data['name']
+        if 'email' in data:
+            contact.email = data['email']
+        if 'message' in data:
+            contact.message = data['message']
+        db.session.commit()
+        return jsonify(contact.to_dict())
+    elif request.method == 'DELETE':
+        db.session.delete(contact)
+        db.session.commit()
+        return '', 204
+
+# Full-text search: /search?q=late bus&in=reviews,contact&limit=20
+@bp.route('/search', methods=['GET'])
+def search_feedback():
+    terms = request.args.get('q', '').strip()
+    if not terms:
+        return jsonify({'message': 'q is required'}), 400
+    kinds = request.args['in'].split(',') if request.args.get('in') else list(SEARCHABLE)
+    unknown = set(kinds) - set(SEARCHABLE)
+    if unknown:
+        return jsonify({'message': f"in must be one or more of {', '.join(SEARCHABLE)}"}), 400
+    try:
+        limit = page_size(request.args.get('limit'), PAGE_SIZE)
+    except ValueError:
+        return jsonify({'message': 'limit must be a number'}), 400
+    return jsonify({kind: [row.to_dict() for row in search(kind, terms, limit)] for kind in kinds}), 200
@@ -0,0 +1,221 @@
+# api/fleet.py
+from datetime import datetime, timedelta
+from flask import Blueprint, Response, request, jsonify
+from models import db, Bus, Booking, Seat, RevokedTicket, BusArchive
+from stops import resolve_stop
+from events import hub, bus_channel, stream
+from admission import admission
+from tickets import signer
+from conflicts import as_datetime, conflicts_for, find_conflicts
+from archive import includes_archive
+from notifications import announce
+from jobs import reconcile_later
+from concurrency import if_match, with_etag, stale, missing_or_stale, versioned_update
+from formats import listing
+from outbox import QUIET_COLUMNS, record
+from api.common import date_range, stop_values
+
+bp = Blueprint('fleet', __name__)
+
+# Endpoint to manage buses
+@bp.route('/buses', methods=['GET', 'POST'])
+def manage_buses():
+    if request.method == 'GET':
+        try:
+            start, end = date_range()
+        except ValueError:
+            return jsonify({'message': 'from and to must be ISO datetimes'}), 400
+
+        def in_range(model):
+            query = model.query
+            if start:
+                query = query.filter(model.departure_time >= start)
+            if end:
+                query = query.filter(model.departure_time < end)
+            return query.all()
+
+        # Departed trips come from the archive only when the range reaches back that far
+        buses = in_range(BusArchive) if includes_archive(start) else []
+        return listing([bus.to_dict() for bus in buses + in_range(Bus)])
+    elif request.method == 'POST':
+        data = request.json
+        try:
+            conflicts = conflicts_for(None, data['driver_id'], data['number_plate'],
+                                      data['departure_time'], data['arrival_time'])
+        except ValueError:
+            return jsonify({'message': 'Invalid driver_id, departure_time or arrival_time'}), 400
+        if conflicts and not data.get('allow_conflicts'):
+            return jsonify({'message': 'Departure overlaps another trip', 'conflicts': conflicts}), 409
+
+        try:
+            origin = resolve_stop(data['departure_from'])
+            destination = resolve_stop(data['departure_to'])
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        new_bus = Bus(
+            driver_id=data['driver_id'],
+            number_plate=data['number_plate'],
+            number_of_seats=data['number_of_seats'],
+            seats_available=data['number_of_seats'],
+            departure_from=origin.name,
+            departure_to=destination.name,
+            origin=origin,
+            destination=destination,
+            departure_time=data['departure_time'],
+            arrival_time=data['arrival_time'],
+            price_per_seat=data['price_per_seat']
+        )
+        db.session.add(new_bus)
+        db.session.commit()
+        return jsonify(new_bus.to_dict()), 201
+
+@bp.route('/buses/<int:id>', methods=['GET', 'PATCH', 'DELETE'])
+@admission.limit('seats', methods=['GET'])
+def manage_bus(id):
+    try:
+        expected = if_match()
+    except ValueError:
+        return jsonify({'message': 'Invalid If-Match header'}), 400
+
+    if request.method == 'GET':
+        bus = Bus.query.get_or_404(id)
+        return with_etag(jsonify(bus.to_dict()), bus)
+    elif request.method == 'PATCH':
+        data = request.json
+        fields = ['driver_id', 'number_plate', 'number_of_seats', 'seats_available',
+                  'departure_time', 'arrival_time', 'price_per_seat']
+        values = {field: data[field] for field in fields if field in data}
+        try:
+            for field in ('departure_from', 'departure_to'):
+                if field in data:
+                    values.update(stop_values(data, field))
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        # One UPDATE ... WHERE id = ? AND version = ?, no SELECT first
+        bus = versioned_update(Bus, id, values, expected)
+        if bus is None:
+            db.session.rollback()
+            return missing_or_stale(Bus, id)
+        # The UPDATE bypasses the flush that records outbox events
+        if set(values) - QUIET_COLUMNS:
+            record('bus.updated', bus)
+        if 'number_of_seats' in data:
+            reconcile_later(bus.id)
+        if 'departure_time' in data and data.get('notify', True):
+            announce(bus, f"{bus.number_plate} {bus.departure_from} to {bus.departure_to} "
+                          f"now departs {as_datetime(bus.departure_time):%d %b %H:%M}.")
+        try:
+            conflicts = conflicts_for(bus.id, bus.driver_id, bus.number_plate, bus.departure_time, bus.arrival_time)
+        except ValueError:
+            db.session.rollback()
+            return jsonify({'message': 'Invalid driver_id, departure_time or arrival_time'}), 400
+        if conflicts and not data.get('allow_conflicts'):
+            db.session.rollback()
+            return jsonify({'message': 'Departure overlaps another trip', 'conflicts': conflicts}), 409
+        response = with_etag(jsonify(bus.to_dict()), bus)
+        db.session.commit()
+        return response
+    elif request.method == 'DELETE':
+        bus = Bus.query.get_or_404(id)
+        if expected is not None and expected != bus.version:
+            return stale(bus.version)
+        db.session.delete(bus)
+        db.session.commit()
+        return '', 204
+
+# Message every passenger of a bus, e.g. about a delay
+@bp.route('/buses/<int:id>/announcements', methods=['POST'])
+def announce_to_passengers(id):
+    bus = Bus.query.get_or_404(id)
+    message = (request.get_json(silent=True) or {}).get('message')
+    if not message:
+        return jsonify({'message': 'message is required'}), 400
+    queued = announce(bus, message)
+    db.session.commit()
+    return jsonify({'queued': queued}), 202
+
+# Overlapping departures for the same driver or vehicle
+@bp.route('/buses/conflicts', methods=['GET'])
+def bus_conflicts():
+    try:
+        start, end = date_range()
+    except ValueError:
+        return jsonify({'message': 'from and to must be ISO datetimes'}), 400
+    start = start or datetime.now()
+    end = end or start + timedelta(days=30)
+    return jsonify(find_conflicts(start, end)), 200
+
+# Server-sent events with seat changes for one bus
+@bp.route('/buses/<int:id>/events', methods=['GET'])
+def bus_events(id):
+    bus = Bus.query.get_or_404(id)
+    # Subscribe before reading the snapshot so no change falls in between
+    subscription = hub.subscribe(bus_channel(bus.id))
+    booked = db.session.query(Booking.seat_number).filter(Booking.bus_id == bus.id, Booking.status != 'cancelled')
+    snapshot = {
+        'type': 'snapshot',
+        'bus_id': bus.id,
+        'seats_available': bus.seats_available,
+        'booked': [seat_number for seat_number, in booked],
+        'seats': [seat.to_dict() for seat in Seat.query.filter_by(bus_id=bus.id)]
+    }
+    return Response(stream(subscription, snapshot), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Signed passenger list a driver device downloads before departure
+@bp.route('/buses/<int:id>/manifest', methods=['GET'])
+def bus_manifest(id):
+    if not signer.configured:
+        return jsonify({'message': 'Ticket signing is not configured'}), 503
+    bus = Bus.query.get_or_404(id)
+    bookings = Booking.query.filter(Booking.bus_id == bus.id, Booking.status != 'cancelled').order_by(Booking.seat_number)
+    revoked = [ticket for ticket, in db.session.query(RevokedTicket.ticket).filter_by(bus_id=bus.id)]
+    return jsonify(signer.manifest(bus, bookings, revoked)), 200
+    
+# Endpoint to manage seats
+@bp.route('/seats', methods=['GET', 'POST', 'PATCH'])
+@admission.limit('seats', methods=['GET'])
+def manage_seats():
+    if request.method == 'GET':
+        # ?bus_id= gives one bus's seat map
+        seats = Seat.query
+        if request.args.get('bus_id'):
+            seats = seats.filter_by(bus_id=request.args.get('bus_id', type=int))
+        return listing([seat.to_dict() for seat in seats])
+
+    elif request.method == 'POST':
+        data = request.json
+        new_seat = Seat(
+            bus_id=data['bus_id'],
+            seat_number=data['seat_number'],
+            status=data['status']
+        )
+        db.session.add(new_seat)
+        db.session.commit()
+        return jsonify(new_seat.to_dict()), 201
+
+    elif request.method == 'PATCH':
+        data = request.json
+        seat_id = data.get('seat_id')
+        new_status = data.get('status')
+
+        if not seat_id or not new_status:
+            return jsonify({'error': 'Invalid input'}), 400
+
+        try:
+            expected = if_match()
+        except ValueError:
+            return jsonify({'error': 'Invalid If-Match header'}), 400
+
+        seat = Seat.query.get(seat_id)
+
+        if not seat:
+            return jsonify({'error': 'Seat not found'}), 404
+        if expected is not None and expected != seat.version:
+            return stale(seat.version)
+
+        # Seat events need the old status, so this goes through the ORM's versioned flush
+        seat.status = new_status
+        db.session.commit()
+
+        return with_etag(jsonify(seat.to_dict()), seat), 200
@@ -0,0 +1,235 @@
+# api/planning.py
+import click
+from datetime import date, time, datetime
+from flask import Blueprint, request, jsonify
+from sqlalchemy.exc import IntegrityError
+from models import db, Bus, Route, Schedule, Stop
+from importer import import_timetable, read_csv
+from timetable import materialize, parse_days, DAYS_AHEAD
+from journeys import planner
+from stops import resolve_stop, stop_index
+from jobs import enqueue
+from concurrency import if_match, with_etag, stale, missing_or_stale, versioned_update
+from formats import listing
+from api.common import stop_values
+
+# CLI commands stay top level: `flask import-timetable`, not `flask planning import-timetable`
+bp = Blueprint('planning', __name__, cli_group=None)
+
+# Endpoint to manage routes
+@bp.route('/routes', methods=['GET', 'POST'])
+def manage_routes():
+    if request.method == 'GET':
+        routes = Route.query.all()
+        return listing([route.to_dict() for route in routes])
+    elif request.method == 'POST':
+        data = request.json
+        try:
+            origin = resolve_stop(data['departure_from'])
+            destination = resolve_stop(data['departure_to'])
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        new_route = Route(
+            route_name=data['route_name'],
+            departure_to=destination.name,
+            departure_from=origin.name,
+            origin=origin,
+            destination=destination
+            )
+        db.session.add(new_route)
+        db.session.commit()
+        return jsonify(new_route.to_dict()), 201
+
+@bp.route('/routes/<int:id>', methods=['GET', 'PATCH', 'DELETE'])
+def manage_route(id):
+    try:
+        expected = if_match()
+    except ValueError:
+        return jsonify({'message': 'Invalid If-Match header'}), 400
+
+    if request.method == 'GET':
+        route = Route.query.get_or_404(id)
+        return with_etag(jsonify(route.to_dict()), route)
+    elif request.method == 'PATCH':
+        data = request.json
+        values = {'route_name': data['route_name']} if 'route_name' in data else {}
+        try:
+            for field in ('departure_from', 'departure_to'):
+                if field in data:
+                    values.update(stop_values(data, field))
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        route = versioned_update(Route, id, values, expected)
+        if route is None:
+            db.session.rollback()
+            return missing_or_stale(Route, id)
+        response = with_etag(jsonify(route.to_dict()), route)
+        db.session.commit()
+        return response
+    elif request.method == 'DELETE':
+        route = Route.query.get_or_404(id)
+        if expected is not None and expected != route.version:
+            return stale(route.version)
+        db.session.delete(route)
+        db.session.commit()
+        return '', 204
+
+# Endpoint to bulk import drivers, buses and routes
+@bp.route('/import', methods=['POST'])
+def bulk_import():
+    if 'file' in request.files:
+        rows = read_csv(request.files['file'].read())
+    elif request.is_json:
+        rows = request.json
+    else:
+        rows = read_csv(request.get_data())
+
+    if not isinstance(rows, list) or not rows:
+        return jsonify({'message': 'No rows to import'}), 400
+
+    try:
+        result = import_timetable(rows)
+    except IntegrityError as e:
+        return jsonify({'message': 'Import failed', 'error': str(e.orig)}), 409
+    return jsonify(result.to_dict()), 201 if not result.errors else 207
+
+@bp.cli.command('import-timetable')
+@click.argument('csv_file', type=click.File('r', encoding='utf-8-sig'))
+def import_timetable_command(csv_file):
+    result = import_timetable(read_csv(csv_file))
+    click.echo(f"Created {result.drivers} drivers, {result.buses} buses, {result.routes} routes")
+    for error in result.errors:
+        click.echo(f"Row {error['row']}: {error['error']}", err=True)
+
+
+# Endpoint to manage recurring schedules
+@bp.route('/schedules', methods=['GET', 'POST'])
+def manage_schedules():
+    if request.method == 'GET':
+        schedules = Schedule.query.all()
+        return listing([schedule.to_dict() for schedule in schedules])
+    elif request.method == 'POST':
+        data = request.json
+        required = ['route_id', 'driver_id', 'number_plate', 'number_of_seats', 'days_of_week',
+                    'departure_time', 'arrival_time', 'price_per_seat', 'start_date']
+        if not all(key in data for key in required):
+            return jsonify({'error': 'Missing data'}), 400
+
+        try:
+            new_schedule = Schedule(
+                route_id=data['route_id'],
+                driver_id=data['driver_id'],
+                number_plate=data['number_plate'],
+                number_of_seats=data['number_of_seats'],
+                days_of_week=parse_days(data['days_of_week']),
+                departure_time=time.fromisoformat(data['departure_time']),
+                arrival_time=time.fromisoformat(data['arrival_time']),
+                price_per_seat=data['price_per_seat'],
+                start_date=date.fromisoformat(data['start_date']),
+                end_date=date.fromisoformat(data['end_date']) if data.get('end_date') else None
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        db.session.add(new_schedule)
+        db.session.commit()
+        materialize(schedule_ids=[new_schedule.id])
+        return jsonify(new_schedule.to_dict()), 201
+
+@bp.route('/schedules/<int:id>', methods=['GET', 'PATCH', 'DELETE'])
+def manage_schedule(id):
+    schedule = Schedule.query.get_or_404(id)
+    if request.method == 'GET':
+        return jsonify(schedule.to_dict())
+    elif request.method == 'PATCH':
+        # Changes apply to departures that have not been generated yet
+        data = request.json
+        try:
+            if 'driver_id' in data:
+                schedule.driver_id = data['driver_id']
+            if 'number_plate' in data:
+                schedule.number_plate = data['number_plate']
+            if 'number_of_seats' in data:
+                schedule.number_of_seats = data['number_of_seats']
+            if 'days_of_week' in data:
+                schedule.days_of_week = parse_days(data['days_of_week'])
+            if 'departure_time' in data:
+                schedule.departure_time = time.fromisoformat(data['departure_time'])
+            if 'arrival_time' in data:
+                schedule.arrival_time = time.fromisoformat(data['arrival_time'])
+            if 'price_per_seat' in data:
+                schedule.price_per_seat = data['price_per_seat']
+            if 'end_date' in data:
+                schedule.end_date = date.fromisoformat(data['end_date']) if data['end_date'] else None
+            if 'active' in data:
+                schedule.active = bool(data['active'])
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
+        db.session.commit()
+        return jsonify(schedule.to_dict())
+    elif request.method == 'DELETE':
+        # Already generated departures stay bookable
+        Bus.query.filter_by(schedule_id=schedule.id).update({'schedule_id': None, 'version': Bus.version + 1})
+        db.session.delete(schedule)
+        db.session.commit()
+        return '', 204
+
+@bp.route('/schedules/generate', methods=['POST'])
+def generate_departures():
+    data = request.get_json(silent=True) or {}
+    try:
+        days = int(data.get('days', DAYS_AHEAD))
+    except (TypeError, ValueError):
+        days = 0
+    if days < 1:
+        return jsonify({'message': 'days must be a positive integer'}), 400
+    if data.get('defer'):
+        job = enqueue('materialize_departures', {'days_ahead': days})
+        db.session.commit()
+        return jsonify(job.to_dict()), 202
+    created = materialize(days_ahead=days)
+    return jsonify({'created': created}), 200
+
+
+@bp.cli.command('generate-departures')
+@click.option('--days', default=DAYS_AHEAD, help='Number of days ahead to materialize.')
+def generate_departures_command(days):
+    created = materialize(days_ahead=days)
+    click.echo(f"Created {created} departures")
+
+
+# Endpoint to plan journeys, including connections
+@bp.route('/journeys', methods=['GET'])
+def plan_journeys():
+    origin = request.args.get('from')
+    destination = request.args.get('to')
+    if not origin or not destination:
+        return jsonify({'message': 'from and to are required'}), 400
+    try:
+        day = date.fromisoformat(request.args['date']) if request.args.get('date') else datetime.now().date()
+    except ValueError:
+        return jsonify({'message': 'date must be YYYY-MM-DD'}), 400
+
+    return jsonify(planner.search(origin, destination, day)), 200
+
+
+# Endpoint to manage stops
+@bp.route('/stops', methods=['GET', 'POST'])
+def manage_stops():
+    if request.method == 'GET':
+        stops = Stop.query.order_by(Stop.name).all()
+        return listing([stop.to_dict() for stop in stops])
+    elif request.method == 'POST':
+        data = request.json
+        try:
+            stop = resolve_stop(data.get('name'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        db.session.commit()
+        return jsonify(stop.to_dict()), 201
+
+@bp.route('/stops/autocomplete', methods=['GET'])
+def autocomplete_stops():
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    return jsonify(stop_index.search(request.args.get('q', ''), limit)), 200
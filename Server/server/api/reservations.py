@@ -0,0 +1,205 @@
+# api/reservations.py
+from flask import Blueprint, current_app, request, jsonify
+from flask_jwt_extended import jwt_required
+from sqlalchemy.exc import IntegrityError
+from models import db, Bus, Booking, BusArchive, BookingArchive
+from bookings import booking_writers, seat_taken, ticket_code
+from admission import admission
+from ratelimit import limiter
+from tickets import signer
+from archive import includes_archive
+from notifications import notify_tickets
+from jobs import reconcile_later
+from concurrency import if_match, with_etag, stale
+from formats import listing
+from api.common import date_range, jwt_identity, optional_user_id
+
+bp = Blueprint('reservations', __name__)
+
+# Endpoint to manage bookings
+@bp.route('/bookings', methods=['POST', 'GET'])
+@limiter.limit('10/minute', key='phone', methods=['POST'])
+# The phone number is the client's to choose; a bot rotating it is still one address
+@limiter.limit('30/minute', methods=['POST'])
+@admission.limit('bookings', methods=['POST'])
+def manage_bookings():
+    if request.method == 'POST':
+        # Refuse before selling a seat whose ticket can't be signed
+        if not signer.configured:
+            return jsonify({'message': 'Ticket signing is not configured'}), 503
+        data = request.json
+        if not all(field in data and data[field] for field in ['bus_id', 'seat_number', 'name', 'idNumber', 'phoneNumber']):
+            return jsonify({'message': 'Missing required fields'}), 400
+
+        if current_app.config['BOOKING_MODE'] == 'actor':
+            try:
+                bus_id = int(data['bus_id'])
+            except (TypeError, ValueError):
+                return jsonify({'message': 'Invalid bus_id'}), 400
+            body, status = booking_writers.submit(bus_id, data, optional_user_id())
+            return jsonify(body), status
+
+        # Check if bus exists
+        bus = Bus.query.get(data['bus_id'])
+        if not bus:
+            return jsonify({'message': 'Bus not found'}), 404
+
+        # Check if seat is already booked
+        existing_booking = Booking.query.filter(Booking.bus_id == data['bus_id'], Booking.seat_number == str(data['seat_number']),
+                                                Booking.status != 'cancelled').first()
+        if existing_booking:
+            return jsonify({'message': 'Seat already booked'}), 409
+
+        # Generate a unique ticket number
+        def generate_ticket():
+            while True:
+                code = ticket_code()
+                existing_booking = Booking.query.filter_by(ticket=code).first()
+                if not existing_booking:
+                    return code
+
+        # Create a new booking
+        new_booking = Booking(
+            bus_id=data['bus_id'],
+            user_id=optional_user_id(),
+            seat_number=data['seat_number'],
+            name=data['name'],
+            idNumber=data['idNumber'],
+            phoneNumber=data['phoneNumber'],
+            status=data['status'],
+            ticket=generate_ticket()  # Generate a unique ticket
+        )
+
+        try:
+            # Enqueueing autoflushes, so a lost race on the seat can surface here as well as at commit
+            db.session.add(new_booking)
+            reconcile_later(bus.id)
+            notify_tickets([new_booking], bus)
+            db.session.commit()
+        except IntegrityError as e:
+            # Another worker booked the seat since the check above
+            db.session.rollback()
+            if not seat_taken(e):
+                raise
+            return jsonify({'message': 'Seat already booked'}), 409
+
+        return jsonify({
+            'ticket': new_booking.ticket,
+            'status': new_booking.status,
+            'qr': signer.issue(new_booking, bus),
+            'message': 'Booking confirmed'
+        }), 201
+    
+    elif request.method == 'GET':
+        try:
+            start, end = date_range()
+        except ValueError:
+            return jsonify({'message': 'from and to must be ISO datetimes'}), 400
+
+        def find(model, departure_time):
+            # "Find my booking" filters, each served by its own index
+            query = model.query
+            if request.args.get('phone'):
+                query = query.filter(model.phoneNumber == request.args['phone'])
+            if request.args.get('id_number'):
+                query = query.filter(model.idNumber == request.args['id_number'])
+            if start:
+                query = query.filter(departure_time >= start)
+            if end:
+                query = query.filter(departure_time < end)
+            return query
+
+        bookings = find(Booking, Bus.departure_time)
+        if start or end:
+            bookings = bookings.join(Bus)
+        archived = find(BookingArchive, BookingArchive.departure_time).all() if includes_archive(start) else []
+        return listing([booking.to_dict() for booking in archived + bookings.all()])
+
+@bp.route('/tickets/<code>', methods=['GET'])
+def get_ticket(code):
+    booking = Booking.query.filter_by(ticket=code.upper()).first_or_404()
+    return jsonify(booking.to_dict()), 200
+
+@bp.route('/my/trips', methods=['GET'])
+@jwt_required()
+def my_trips():
+    try:
+        start, end = date_range()
+    except ValueError:
+        return jsonify({'message': 'from and to must be ISO datetimes'}), 400
+
+    def trips(booking_model, bus_model):
+        query = db.session.query(booking_model, bus_model).join(bus_model, booking_model.bus_id == bus_model.id) \
+            .filter(booking_model.user_id == jwt_identity())
+        if start:
+            query = query.filter(bus_model.departure_time >= start)
+        if end:
+            query = query.filter(bus_model.departure_time < end)
+        return query.order_by(bus_model.departure_time.desc()).all()
+
+    # Older trips than the archive cutoff only when asked for with ?from=
+    rows = trips(Booking, Bus)
+    if includes_archive(start):
+        rows += trips(BookingArchive, BusArchive)
+    return listing([{**booking.to_dict(), 'bus': bus.to_dict()} for booking, bus in rows]), 200
+
+
+@bp.route('/bookings/<int:id>', methods=['GET', 'PATCH', 'DELETE'])
+def manage_booking(id):
+    try:
+        expected = if_match()
+    except ValueError:
+        return jsonify({'message': 'Invalid If-Match header'}), 400
+
+    # Fetch the booking by ID
+    booking = Booking.query.get_or_404(id)
+    
+    if request.method == 'GET':
+        return with_etag(jsonify(booking.to_dict()), booking), 200
+
+    # Seat events and ticket revocation read the old row, so bookings keep the ORM's versioned flush
+    if expected is not None and expected != booking.version:
+        return stale(booking.version)
+
+    elif request.method == 'PATCH':
+        data = request.json
+        if 'seat_number' in data:
+            # Check if seat is already booked
+            existing_booking = Booking.query.filter(Booking.bus_id == booking.bus_id, Booking.seat_number == str(data['seat_number']),
+                                                    Booking.status != 'cancelled').first()
+            if existing_booking:
+                return jsonify({'message': 'Seat already booked'}), 409
+            booking.seat_number = data['seat_number']
+        try:
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            if not seat_taken(e):
+                raise
+            return jsonify({'message': 'Seat already booked'}), 409
+        # The seat is part of the signed ticket, so a seat change needs a new QR
+        return with_etag(jsonify({**booking.to_dict(), 'qr': signer.issue(booking, booking.bus)}), booking), 200
+
+    elif request.method == 'DELETE':
+
+        # Delete the booking from the database
+        db.session.delete(booking)
+        reconcile_later(booking.bus_id)
+        db.session.commit()
+        
+        return '', 204
+
+
+# Online check of a ticket QR string
+@bp.route('/tickets/verify', methods=['POST'])
+def verify_ticket():
+    data = request.get_json(silent=True) or {}
+    try:
+        ticket = signer.decode(data.get('qr') or '')
+    except ValueError as e:
+        return jsonify({'valid': False, 'message': str(e)}), 200
+    booking = Booking.query.filter_by(ticket=ticket['ticket']).first()
+    if not booking or booking.status == 'cancelled' or booking.bus_id != ticket['bus_id'] \
+            or booking.seat_number != ticket['seat_number']:
+        return jsonify({'valid': False, 'message': 'Ticket revoked'}), 200
+    return jsonify({'valid': True, **ticket}), 200
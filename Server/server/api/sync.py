@@ -0,0 +1,20 @@
+# api/sync.py
+from flask import Blueprint, request, jsonify
+from sync import SYNCED, CursorExpired, changes
+
+bp = Blueprint('sync', __name__)
+
+# Rows changed and deleted since a cursor from an earlier call; without one, everything
+@bp.route('/sync', methods=['GET'])
+def sync():
+    tables = request.args['tables'].split(',') if request.args.get('tables') else list(SYNCED)
+    unknown = set(tables) - set(SYNCED)
+    if unknown:
+        return jsonify({'message': f"Unknown tables: {', '.join(sorted(unknown))}"}), 400
+    try:
+        return jsonify(changes(request.args.get('since'), tables)), 200
+    except (ValueError, OverflowError):
+        return jsonify({'message': 'since must be a cursor from an earlier sync'}), 400
+    except CursorExpired:
+        # Deletes that old are forgotten; the client has to fetch everything again
+        return jsonify({'message': 'Cursor expired; sync again without since'}), 410
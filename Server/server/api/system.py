@@ -0,0 +1,84 @@
+# api/system.py
+import click
+from flask import Blueprint, current_app, jsonify
+from models import Job
+from admission import admission
+from archive import archive_departures
+from bulk import CHUNK_SIZE
+from jobs import queue_metrics, run_worker_process
+from outbox import outbox
+from writebehind import write_behind
+
+bp = Blueprint('system', __name__, cli_group=None)
+
+@bp.route('/')
+def index():
+    return 'Welcome to the TRANSITE WISE the Bus Booking App!'
+
+@bp.cli.command('archive-departures')
+@click.option('--chunk-size', default=CHUNK_SIZE, help='Trips moved per transaction.')
+def archive_departures_command(chunk_size):
+    moved = archive_departures(chunk_size=chunk_size)
+    click.echo(f"Archived {moved} departures")
+
+
+@bp.route('/admission/metrics', methods=['GET'])
+def admission_metrics():
+    return jsonify(admission.metrics()), 200
+
+# Status of a deferred job
+@bp.route('/jobs/<int:id>', methods=['GET'])
+def get_job(id):
+    job = Job.query.get_or_404(id)
+    return jsonify(job.to_dict()), 200
+
+@bp.route('/jobs/metrics', methods=['GET'])
+def job_metrics():
+    worker = current_app.extensions.get('job_worker')
+    return jsonify({
+        'queue': queue_metrics(),
+        'worker': worker.metrics() if worker else None
+    }), 200
+
+@bp.cli.command('run-jobs')
+@click.option('--threads', default=8, help='Jobs run concurrently per process.')
+@click.option('--processes', default=1, help='Worker processes to fork.')
+def run_jobs_command(threads, processes):
+    app = current_app._get_current_object()
+    if processes == 1:
+        run_worker_process(app, threads)
+        return
+    import multiprocessing
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=run_worker_process, args=(app, threads)) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+@bp.route('/outbox/metrics', methods=['GET'])
+def outbox_metrics():
+    return jsonify(outbox.metrics()), 200
+
+@bp.route('/write-behind/metrics', methods=['GET'])
+def write_behind_metrics():
+    return jsonify(write_behind.metrics()), 200
+
+@bp.cli.command('relay-outbox')
+@click.option('--interval', default=1.0, help='Seconds between polls once a relay has caught up.')
+@click.option('--once', is_flag=True, help='Publish what is waiting, then exit.')
+def relay_outbox_command(interval, once):
+    if once:
+        for name, relay in outbox.relays.items():
+            delivered = 0
+            while True:
+                count = relay.run_once()
+                delivered += count
+                if count < relay.batch_size:
+                    break
+            click.echo(f"Relayed {delivered} events to {name}")
+        # Run from cron, this is the only purge the outbox gets
+        click.echo(f"Purged {outbox.purge()} events")
+        return
+    for thread in outbox.start(interval):
+        thread.join()
@@ -0,0 +1,180 @@
+# api/users.py
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+from models import db, User, Bus, Booking, Driver, Admin, PersnalDetails, BusArchive, BookingArchive
+from archive import includes_archive
+from formats import listing
+from api.common import date_range
+
+bp = Blueprint('users', __name__)
+
+# Endpoint to manage users
+@bp.route('/users', methods=['GET', 'POST'])
+def manage_users():
+    if request.method == 'GET':
+        users = User.query.all()
+        return listing([user.to_dict() for user in users])
+    elif request.method == 'POST':
+        data = request.json
+        new_user = User(
+            username=data['username'],
+            email=data['email'],
+
+        )
+        new_user.password_hash = data['password']
+        db.session.add(new_user)
+        db.session.commit()
+        return jsonify(new_user.to_dict()), 201
+
+@bp.route('/users/<int:id>', methods=['GET', 'PATCH', 'DELETE'])
+def manage_user(id):
+    user = User.query.get_or_404(id)
+    if request.method == 'GET':
+        return jsonify(user.to_dict())
+    elif request.method == 'PATCH':
+        data = request.json
+        if 'username' in data:
+            user.username = data['username']
+        if 'email' in data:
+            user.email = data['email']
+        if 'role' in data:
+            user.role = data['role']
+        if 'password' in data:
+            user.password_hash = data['password']
+        db.session.commit()
+        return jsonify(user.to_dict())
+    elif request.method == 'DELETE':
+        db.session.delete(user)
+        db.session.commit()
+        return '', 204
+    
+# Endpoint to manage drivers
+@bp.route('/drivers', methods=['GET', 'POST'])
+def manage_drivers():
+    if request.method == 'GET':
+        drivers = Driver.query.all()
+        return listing([driver.to_dict() for driver in drivers])
+    
+    elif request.method == 'POST':
+        data = request.json
+
+        # Validate input data
+        if not all(key in data for key in ['full_name', 'id_number', 'driving_license', 'phone_number']):
+            return jsonify({'error': 'Missing data'}), 400
+
+        # Create new driver
+        new_driver = Driver(
+            full_name=data['full_name'],
+            id_number=data['id_number'],
+            driving_license=data['driving_license'],
+            phone_number=data['phone_number']
+        )
+
+        try:
+            db.session.add(new_driver)
+            db.session.commit()
+            return jsonify(new_driver.to_dict()), 201
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 500
+
+@bp.route('/drivers/<int:id>', methods=['GET', 'PATCH', 'DELETE'])
+def manage_driver(id):
+    driver = Driver.query.get_or_404(id)
+    if request.method == 'GET':
+        return jsonify(driver.to_dict())
+    
+    elif request.method == 'PATCH':
+        data = request.json
+        if 'full_name' in data:
+            driver.full_name = data['full_name']
+        if 'id_number' in data:
+            driver.id_number = data['id_number']
+        if 'driving_license' in data:
+            driver.driving_license = data['driving_license']
+        if 'phone_number' in data:
+            driver.phone_number = data['phone_number']
+        db.session.commit()
+        return jsonify(driver.to_dict())
+    
+    elif request.method == 'DELETE':
+        db.session.delete(driver)
+        db.session.commit()
+        return '', 204
+    
+# A driver's upcoming departures with booked seat counts
+@bp.route('/drivers/<int:id>/itinerary', methods=['GET'])
+def driver_itinerary(id):
+    try:
+        start, end = date_range()
+    except ValueError:
+        return jsonify({'message': 'from and to must be ISO datetimes'}), 400
+    start = start or datetime.now()
+
+    def itinerary(bus_model, booking_model):
+        # Served by the (driver_id, departure_time) index
+        booked = db.func.count(booking_model.id).filter(booking_model.status != 'cancelled')
+        query = db.session.query(bus_model, booked).outerjoin(booking_model, booking_model.bus_id == bus_model.id) \
+            .filter(bus_model.driver_id == id, bus_model.departure_time >= start)
+        if end:
+            query = query.filter(bus_model.departure_time < end)
+        return query.group_by(bus_model.id, bus_model.departure_time).order_by(bus_model.departure_time).all()
+
+    rows = itinerary(Bus, Booking)
+    if includes_archive(start):
+        rows = itinerary(BusArchive, BookingArchive) + rows
+    return listing([{**bus.to_dict(), 'booked': count} for bus, count in rows]), 200
+    
+# Endpoint to manage admins
+@bp.route('/admins', methods=['GET', 'POST'])
+def manage_admins():
+    if request.method == 'GET':
+        admins = Admin.query.all()
+        return listing([admin.to_dict() for admin in admins])
+    elif request.method == 'POST':
+        data = request.json
+        new_admin = Admin(
+            full_name=data['full_name'],
+            id_number=data['id_number'],
+            phone_number=data['phone_number']
+        )
+        db.session.add(new_admin)
+        db.session.commit()
+        return jsonify(new_admin.to_dict()), 201
+    
+@bp.route('/admins/<int:id>', methods=['GET', 'PATCH', 'DELETE'])
+def manage_admin(id):
+    admin = Admin.query.get_or_404(id)
+    if request.method == 'GET':
+        return jsonify(admin.to_dict())
+    elif request.method == 'PATCH':
+        data = request.json
+        if 'full_name' in data:
+            admin.full_name = data['full_name']
+        if 'id_number' in data:
+            admin.id_number = data['id_number']
+        if 'phone_number' in data:
+            admin.phone_number = data['phone_number']
+        db.session.commit()
+        return jsonify(admin.to_dict())
+    elif request.method == 'DELETE':
+        db.session.delete(admin)
+        db.session.commit()
+        return '', 204
+
+# Endpoint to manage Personal Details
+@bp.route('/personaldetails', methods=['GET', 'POST'])
+def manage_personaldetails():
+    if request.method == 'GET':
+        personaldetails = PersnalDetails.query.all()
+        return listing([personaldetail.to_dict() for personaldetail in personaldetails])
+    elif request.method == 'POST':
+        data = request.json
+        new_personaldetail = PersnalDetails(
+            full_name=data['name'],
+            id_number=data['id_number'],
+            phone_number=data['phone_number']
+        )
+        db.session.add(new_personaldetail)
+        db.session.commit()
+        return jsonify(new_personaldetail.to_dict()), 201
@@ -0,0 +1,109 @@
+# archive.py
+import os, threading, time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, insert, select, text
+from models import db, Bus, Booking, Seat, RevokedTicket, BusArchive, BookingArchive, bus_routes
+from bulk import CHUNK_SIZE, mark_bulk_write
+from sync import bury, prune_tombstones
+
+# Trips move to the archive this long after arrival
+ARCHIVE_AFTER = timedelta(days=int(os.getenv('ARCHIVE_AFTER_DAYS', 30)))
+
+
+def cutoff(now=None):
+    # Stored datetimes are naive UTC
+    return (now or datetime.now(timezone.utc).replace(tzinfo=None)) - ARCHIVE_AFTER
+
+
+def includes_archive(start):
+    # Only date ranges reaching back past the cutoff can contain archived trips
+    return start is not None and start < cutoff()
+
+
+def month_start(value):
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(value):
+    return (month_start(value) + timedelta(days=32)).replace(day=1)
+
+
+def ensure_partitions(first, last):
+    """Monthly PostgreSQL partitions of both archive tables covering first..last."""
+    month = month_start(first)
+    while month <= last:
+        following = next_month(month)
+        for table in (BusArchive.__tablename__, BookingArchive.__tablename__):
+            db.session.execute(text(
+                f'CREATE TABLE IF NOT EXISTS {table}_{month:%Y_%m} PARTITION OF {table} '
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"))
+        month = following
+
+
+def archive_chunk(bus_ids):
+    # Copy and delete in the same transaction, so a trip is always in exactly one place
+    buses, bookings = Bus.__table__, Booking.__table__
+    bus_columns = [column.name for column in BusArchive.__table__.c if column.name != 'archived_at']
+    db.session.execute(insert(BusArchive.__table__).from_select(
+        bus_columns, select(*[buses.c[name] for name in bus_columns]).where(buses.c.id.in_(bus_ids))))
+
+    booking_columns = [column.name for column in BookingArchive.__table__.c
+                       if column.name not in ('departure_time', 'archived_at')]
+    db.session.execute(insert(BookingArchive.__table__).from_select(
+        booking_columns + ['departure_time'],
+        select(*[bookings.c[name] for name in booking_columns], buses.c.departure_time)
+        .join(buses, bookings.c.bus_id == buses.c.id).where(buses.c.id.in_(bus_ids))))
+
+    # Archived trips leave /sync like deleted ones
+    bury(bookings, bookings.c.bus_id.in_(bus_ids))
+    bury(buses, buses.c.id.in_(bus_ids))
+    # Seat maps, route links and revocations are only needed while a trip can still be boarded
+    for table in (Seat.__table__, bus_routes, RevokedTicket.__table__, bookings):
+        db.session.execute(delete(table).where(table.c.bus_id.in_(bus_ids)))
+    db.session.execute(delete(buses).where(buses.c.id.in_(bus_ids)))
+    for table in ('buses', 'bookings', 'seats'):
+        mark_bulk_write(db.session, table)
+
+
+def archive_departures(before=None, chunk_size=CHUNK_SIZE):
+    """Moves trips that arrived before `before` into the archive, one chunk per transaction."""
+    before = before or cutoff()
+    postgresql = db.session.get_bind().dialect.name == 'postgresql'
+    moved = 0
+    while True:
+        try:
+            if postgresql:
+                # One archiver at a time across workers
+                db.session.execute(text("SELECT pg_advisory_xact_lock(hashtext('archive_departures'))"))
+            rows = db.session.query(Bus.id, Bus.departure_time).filter(Bus.arrival_time < before) \
+                .order_by(Bus.departure_time).limit(chunk_size).all()
+            if not rows:
+                db.session.commit()
+                return moved
+            if postgresql:
+                ensure_partitions(rows[0].departure_time, rows[-1].departure_time)
+            archive_chunk([id for id, _ in rows])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        moved += len(rows)
+
+
+def start_archiver(app, interval):
+    # Same shape as the timetable generator: a daemon thread per worker
+    def run():
+        while True:
+            with app.app_context():
+                try:
+                    archive_departures()
+                    prune_tombstones()
+                except Exception:
+                    app.logger.exception('Archiving departures failed')
+                finally:
+                    db.session.remove()
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name='departure-archiver', daemon=True)
+    thread.start()
+    return thread
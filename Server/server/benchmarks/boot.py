@@ -0,0 +1,66 @@
+# benchmarks/boot.py
+"""Boot time budget: how long a fresh process takes to import the app and build it.
+
+Each run is a new interpreter, as for a gunicorn worker or a `flask db` command.
+Fails with exit code 1 when the median import or create_app() time is over its
+budget, or when building the app pulled in the Firebase SDK.
+
+    python benchmarks/boot.py
+    python benchmarks/boot.py --runs 10 --import-budget 0.8
+"""
+import argparse, json, os, statistics, subprocess, sys, tempfile
+
+SERVER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Seconds, with headroom over a laptop's numbers
+IMPORT_BUDGET = 1.0
+CREATE_BUDGET = 0.1
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app()
+created = time.perf_counter()
+print(json.dumps({'import': imported - started, 'create': created - imported,
+                  'firebase_loaded': 'firebase_admin' in sys.modules}))
+"""
+
+
+def probe():
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URI', 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'boot.db'))
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=SERVER, env=env, capture_output=True, text=True,
+                            check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--import-budget', type=float, default=IMPORT_BUDGET)
+    parser.add_argument('--create-budget', type=float, default=CREATE_BUDGET)
+    args = parser.parse_args()
+
+    runs = [probe() for _ in range(args.runs)]
+    result = {
+        'import_sec': round(statistics.median(run['import'] for run in runs), 3),
+        'create_sec': round(statistics.median(run['create'] for run in runs), 3),
+        'firebase_loaded': any(run['firebase_loaded'] for run in runs)
+    }
+    print(result)
+
+    failures = []
+    if result['import_sec'] > args.import_budget:
+        failures.append(f"import took {result['import_sec']}s, budget {args.import_budget}s")
+    if result['create_sec'] > args.create_budget:
+        failures.append(f"create_app() took {result['create_sec']}s, budget {args.create_budget}s")
+    if result['firebase_loaded']:
+        failures.append('firebase_admin was imported before the first auth call')
+    for failure in failures:
+        print(f'OVER BUDGET {failure}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# benchmarks/encoding.py
+"""Encode/decode throughput of list responses: jsonify against the binary formats.
+
+Builds bus, booking and seat rows in memory (no database) through the models'
+to_dict(), then times what a list endpoint does to encode them and what a
+consumer does to decode them, with every price and timestamp turned back into
+a number or a datetime as it would be used.
+
+    python benchmarks/encoding.py
+    python benchmarks/encoding.py --rows 50000 --runs 10
+"""
+import argparse, json, os, statistics, sys, tempfile, time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+os.environ.setdefault('DATABASE_URI', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'encoding.db'))
+
+from flask import jsonify
+from app import create_app
+from models import Bus, Booking, Seat
+import formats
+
+app = create_app()
+ANCHOR = datetime(2025, 1, 1, 6)
+
+
+def rows(kind, n):
+    if kind == 'buses':
+        return [Bus(id=i, driver_id=i % 50, number_plate=f'KTS {i:03d}T', number_of_seats=33, seats_available=i % 33,
+                    departure_from='Nairobi', departure_to='Mombasa', departure_from_id=1, departure_to_id=2,
+                    departure_time=ANCHOR + timedelta(hours=i), arrival_time=ANCHOR + timedelta(hours=i + 8),
+                    price_per_seat=Decimal('1450.50'), version=1, created_at=ANCHOR,
+                    updated_at=ANCHOR).to_dict() for i in range(n)]
+    if kind == 'bookings':
+        return [Booking(id=i, bus_id=i // 33, user_id=i, seat_number=str(i % 33 + 1), status='booked',
+                        name=f'Passenger {i}', idNumber=f'{30000000 + i}', phoneNumber=f'0733{i:06d}',
+                        ticket=f'T{i:05d}', version=1, created_at=ANCHOR, updated_at=ANCHOR).to_dict()
+                for i in range(n)]
+    return [Seat(id=i, bus_id=i // 33, seat_number=str(i % 33 + 1), status='available', version=1).to_dict()
+            for i in range(n)]
+
+
+def json_decode(body):
+    # What a consumer has to do with the strings to get numbers and datetimes back
+    for row in json.loads(body):
+        if 'price_per_seat' in row:
+            Decimal(row['price_per_seat'])
+            datetime.fromisoformat(row['departure_time'])
+            datetime.fromisoformat(row['arrival_time'])
+        if row.get('created_at'):
+            datetime.fromisoformat(f"{row['created_at']['date']}T{row['created_at']['time']}")
+
+
+def paths():
+    yield 'json', lambda data: jsonify(data).get_data(), json_decode
+    if formats.msgpack is not None:
+        yield 'msgpack', lambda data: formats.encoders()[formats.MSGPACK]([formats.native(row) for row in data]), \
+            lambda body: formats.msgpack.unpackb(body, timestamp=3)
+    if formats.cbor2 is not None:
+        yield 'cbor', lambda data: formats.encoders()[formats.CBOR]([formats.native(row) for row in data]), \
+            formats.cbor2.loads
+
+
+def timed(function, argument, runs):
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = function(argument)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    results = {}
+    with app.test_request_context():
+        for kind in ('buses', 'bookings', 'seats'):
+            data = rows(kind, args.rows)
+            for name, encode, decode in paths():
+                encode_sec, body = timed(encode, data, args.runs)
+                decode_sec, _ = timed(decode, body, args.runs)
+                results[f'{kind}.{name}'] = {
+                    'bytes': len(body),
+                    'encode_rows_per_sec': round(args.rows / encode_sec),
+                    'decode_rows_per_sec': round(args.rows / decode_sec)
+                }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
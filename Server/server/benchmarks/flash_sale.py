@@ -0,0 +1,96 @@
+# benchmarks/flash_sale.py
+"""Flash-sale benchmark: many clients booking seats on the same bus at once.
+
+Compares the inline per-request booking path with the per-bus group commit
+writer. Point DATABASE_URI at Postgres for representative numbers; without it
+a throwaway SQLite file is used.
+
+    python benchmarks/flash_sale.py --clients 50 --requests 2000
+"""
+import argparse, os, sys, tempfile, threading, time
+from collections import Counter
+from datetime import datetime, timedelta
+from itertools import count
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URI', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'flash_sale.db'))
+
+from app import create_app
+from models import db, Bus, Booking, Driver
+
+app = create_app()
+
+
+def setup(seats):
+    db.drop_all()
+    db.create_all()
+    driver = Driver(full_name='Bench Driver', id_number='B1', driving_license='B1', phone_number='B1')
+    db.session.add(driver)
+    db.session.flush()
+    departure = datetime.now() + timedelta(days=1)
+    bus = Bus(driver_id=driver.id, number_plate='BENCH 1', number_of_seats=seats,
+              departure_from='Nairobi', departure_to='Mombasa', departure_time=departure,
+              arrival_time=departure + timedelta(hours=8), price_per_seat=1500)
+    db.session.add(bus)
+    db.session.commit()
+    return bus.id
+
+
+def run(mode, bus_id, clients, requests, seats):
+    app.config['BOOKING_MODE'] = mode
+    Booking.query.delete()
+    db.session.commit()
+
+    numbers = count()
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def client():
+        http = app.test_client()
+        while True:
+            n = next(numbers)
+            if n >= requests:
+                return
+            # More requests than seats, so later requests fight over taken seats
+            response = http.post('/bookings', json={
+                'bus_id': bus_id, 'seat_number': str(n % seats + 1), 'name': f'Passenger {n}',
+                'idNumber': str(n), 'phoneNumber': f'07{n:08d}', 'status': 'booked'
+            })
+            with lock:
+                statuses[response.status_code] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    booked = Booking.query.filter_by(bus_id=bus_id).count()
+    seats_booked = db.session.query(Booking.seat_number).filter_by(bus_id=bus_id).distinct().count()
+    return {
+        'mode': mode,
+        'seconds': round(elapsed, 3),
+        'requests_per_sec': round(requests / elapsed, 1),
+        'bookings_per_sec': round(statuses[201] / elapsed, 1),
+        'statuses': dict(statuses),
+        'double_booked': booked - seats_booked
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--seats', type=int, default=1000)
+    args = parser.parse_args()
+
+    with app.app_context():
+        bus_id = setup(args.seats)
+        for mode in ('request', 'actor'):
+            print(run(mode, bus_id, args.clients, args.requests, args.seats))
+
+
+if __name__ == '__main__':
+    main()
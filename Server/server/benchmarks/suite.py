@@ -0,0 +1,252 @@
+# benchmarks/suite.py
+"""Endpoint benchmarks: throughput and p50/p95/p99 latency per flow, checked against a baseline.
+
+Seeds the database with seed.py at a fixed scale, drives the app from many
+threads through its test client and writes the results as JSON. When a
+baseline for the scale exists, any flow that got slower (or lost throughput)
+by more than its allowance in thresholds.json (percent, ignoring latency changes
+under slack_ms) fails the run with exit code 1.
+Point DATABASE_URI at Postgres for representative numbers; without it a
+throwaway SQLite file is used.
+
+    python benchmarks/suite.py --scale small
+    python benchmarks/suite.py --scale medium --save-baseline
+    python benchmarks/suite.py --scale medium --flows trip_search,seat_map --clients 32
+"""
+import argparse, json, math, os, platform, random, sys, tempfile, threading, time
+from collections import Counter
+from datetime import datetime, timezone
+from itertools import count
+from types import SimpleNamespace
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+os.environ.setdefault('DATABASE_URI', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'suite.db'))
+
+from app import create_app
+from firebase import FakeAuth
+from models import db, Bus, User
+from seed import drop_all_tables, create_all_tables, seed
+
+# Bookings seeded per scale
+SCALES = {'small': 10000, 'medium': 100000, 'large': 1000000}
+# Seeded trips are laid out around this date, so every run sees the same data
+ANCHOR = datetime(2025, 1, 1)
+SEED = 42
+# Concurrent bookings are spread over this many buses, so most requests fight over seats
+CONTENDED_BUSES = 3
+BASELINES = os.path.join(HERE, 'baselines')
+RESULTS = os.path.join(HERE, 'results')
+# Latencies regress upwards, throughput downwards
+METRICS = {'p50_ms': 1, 'p95_ms': 1, 'p99_ms': 1, 'requests_per_sec': -1}
+
+
+# Measure the handlers, not the limiters or the identity provider
+auth = FakeAuth()
+app = create_app({'RATELIMIT_ENABLED': False, 'ADMISSION_ENABLED': False, 'FIREBASE_AUTH': auth})
+
+
+def sample_data(rng):
+    upcoming = db.session.query(Bus.id, Bus.departure_from, Bus.departure_to, Bus.departure_time, Bus.number_of_seats) \
+        .filter(Bus.departure_time >= ANCHOR).order_by(Bus.id).limit(2000).all()
+    users = db.session.query(User.firebase_uid, User.email).order_by(User.id).limit(2000).all()
+    if not upcoming or not users:
+        raise SystemExit('The database has no upcoming departures or users; run without --no-seed')
+    auth.users.update(users)
+    return SimpleNamespace(buses=upcoming, contended=rng.sample(upcoming, min(CONTENDED_BUSES, len(upcoming))),
+                           users=users)
+
+
+# Each flow picks a request for one iteration: (method, url, json body), plus the statuses that count as success
+def trip_search(rng, data):
+    bus = rng.choice(data.buses)
+    return 'GET', f'/journeys?from={bus.departure_from}&to={bus.departure_to}&date={bus.departure_time.date()}', None
+
+
+def bus_details(rng, data):
+    return 'GET', f'/buses/{rng.choice(data.buses).id}', None
+
+
+def seat_map(rng, data):
+    return 'GET', f'/seats?bus_id={rng.choice(data.buses).id}', None
+
+
+def login(rng, data):
+    user = rng.choice(data.users)
+    return 'POST', '/login', {'uid': user.firebase_uid, 'email': user.email}
+
+
+def book_contended(rng, data):
+    bus = rng.choice(data.contended)
+    n = rng.randrange(10 ** 8)
+    return 'POST', '/bookings', {'bus_id': bus.id, 'seat_number': str(rng.randint(1, bus.number_of_seats)),
+                                 'name': f'Bench {n}', 'idNumber': str(n), 'phoneNumber': f'07{n:08d}',
+                                 'status': 'booked'}
+
+
+# Writes go last so the read flows see the seeded data
+FLOWS = {
+    'trip_search': (trip_search, {200}),
+    'bus_details': (bus_details, {200}),
+    'seat_map': (seat_map, {200}),
+    'login': (login, {200}),
+    'book_contended': (book_contended, {201, 409}),
+}
+
+
+def percentile(ordered, p):
+    # Nearest rank
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+def measure(name, requests, clients, warmup):
+    pick, expected = FLOWS[name]
+    rng = random.Random(f'{SEED}:{name}')
+    with app.app_context():
+        data = sample_data(rng)
+    plan = [pick(rng, data) for _ in range(warmup + requests)]
+
+    http = app.test_client()
+    for method, url, body in plan[:warmup]:
+        http.open(url, method=method, json=body)
+
+    numbers = count(warmup)
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def client():
+        http = app.test_client()
+        while True:
+            n = next(numbers)
+            if n >= len(plan):
+                return
+            method, url, body = plan[n]
+            started = time.perf_counter()
+            response = http.open(url, method=method, json=body)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[response.status_code] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'errors': sum(number for status, number in statuses.items() if status not in expected),
+        'statuses': {str(status): number for status, number in sorted(statuses.items())},
+        'seconds': round(elapsed, 3),
+        'requests_per_sec': round(requests / elapsed, 1),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def compare(results, baseline, thresholds):
+    """Failure messages for flows that erred or regressed beyond their threshold (percent) against the baseline."""
+    failures = []
+    for name, current in results['flows'].items():
+        if current['errors']:
+            failures.append(f"{name}: {current['errors']} unexpected responses {current['statuses']}")
+        previous = baseline['flows'].get(name)
+        if previous is None:
+            continue
+        allowed = dict(thresholds['default'], **thresholds.get('flows', {}).get(name, {}))
+        # Sub-millisecond latencies swing by large percentages from scheduling noise alone
+        slack = allowed.pop('slack_ms', 0)
+        for metric, limit in allowed.items():
+            if not previous.get(metric):
+                continue
+            if metric.endswith('_ms') and current[metric] - previous[metric] <= slack:
+                continue
+            change = (current[metric] - previous[metric]) / previous[metric] * 100
+            if change * METRICS[metric] > limit:
+                failures.append(f'{name} {metric}: {previous[metric]} -> {current[metric]} '
+                                f'({change:+.1f}%, allowed {limit}%)')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--flows', default=','.join(FLOWS), help='Comma separated flows to run.')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=1000, help='Timed requests per flow.')
+    parser.add_argument('--warmup', type=int, default=50, help='Untimed requests per flow before measuring.')
+    parser.add_argument('--no-seed', action='store_true', help='Reuse the data already in the database.')
+    parser.add_argument('--output', help='Results file; defaults to results/<scale>-<timestamp>.json.')
+    parser.add_argument('--baseline', help='Baseline to compare against; defaults to baselines/<scale>.json.')
+    parser.add_argument('--thresholds', default=os.path.join(HERE, 'thresholds.json'))
+    parser.add_argument('--save-baseline', action='store_true', help='Store these results as the new baseline.')
+    args = parser.parse_args()
+
+    flows = args.flows.split(',')
+    unknown = set(flows) - set(FLOWS)
+    if unknown:
+        parser.error(f"unknown flows: {', '.join(sorted(unknown))}")
+
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        if not args.no_seed:
+            drop_all_tables()
+            create_all_tables()
+            seed(SCALES[args.scale], SEED, start=ANCHOR)
+
+    results = {
+        'scale': args.scale,
+        'bookings': SCALES[args.scale],
+        'database': dialect,
+        'clients': args.clients,
+        'python': platform.python_version(),
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'flows': {}
+    }
+    for name in flows:
+        results['flows'][name] = measure(name, args.requests, args.clients, args.warmup)
+        flow = results['flows'][name]
+        print(f"{name:<16} {flow['requests_per_sec']:>9} req/s  p50 {flow['p50_ms']:>8} ms  "
+              f"p95 {flow['p95_ms']:>8} ms  p99 {flow['p99_ms']:>8} ms  {flow['statuses']}")
+
+    output = args.output or os.path.join(
+        RESULTS, f"{args.scale}-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}.json")
+    baseline_path = args.baseline or os.path.join(BASELINES, f'{args.scale}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f'Results written to {output}')
+
+    failures = []
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as file:
+            baseline = json.load(file)
+        with open(args.thresholds) as file:
+            thresholds = json.load(file)
+        if (baseline['scale'], baseline['database']) != (args.scale, dialect):
+            raise SystemExit(f"Baseline {baseline_path} is for {baseline['scale']} on {baseline['database']}, "
+                             f'not {args.scale} on {dialect}')
+        failures = compare(results, baseline, thresholds)
+    else:
+        print(f'No baseline at {baseline_path}; nothing to compare against')
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(baseline_path)), exist_ok=True)
+        with open(baseline_path, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f'Baseline saved to {baseline_path}')
+
+    for failure in failures:
+        print(f'REGRESSION {failure}')
+    sys.exit(1 if failures and not args.save_baseline else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+# bookings.py
+import os, queue, random, string, threading, time
+from sqlalchemy.exc import IntegrityError
+from models import db, Bus, Booking
+from tickets import signer
+from jobs import reconcile_later
+from notifications import notify_tickets
+
+# How long a bus writer waits to gather more requests into one commit
+BATCH_WINDOW = float(os.getenv('BOOKING_BATCH_WINDOW', 0.002))
+MAX_BATCH = 200
+# Writers with nothing to do for this long shut down
+IDLE_TIMEOUT = 30
+REQUEST_TIMEOUT = 10
+
+
+def ticket_code():
+    return ''.join(random.choices(string.digits, k=5) + random.choices(string.ascii_uppercase, k=1))
+
+
+def seat_taken(error):
+    # IntegrityError from the live seat index, rather than a ticket collision
+    return 'seat_number' in str(error.orig)
+
+
+def unique_tickets(count):
+    # One lookup per round instead of one per ticket
+    tickets = set()
+    while len(tickets) < count:
+        candidates = {ticket_code() for _ in range(count - len(tickets))} - tickets
+        taken = {ticket for ticket, in db.session.query(Booking.ticket).filter(Booking.ticket.in_(candidates))}
+        tickets |= candidates - taken
+    return list(tickets)
+
+
+class PendingBooking:
+    def __init__(self, data, user_id=None):
+        self.data = data
+        self.user_id = user_id
+        self.done = threading.Event()
+        self.result = None
+
+    def resolve(self, body, status):
+        self.result = (body, status)
+        self.done.set()
+
+
+def commit_batch(bus_id, batch, retry=True):
+    """Book a batch of requests for one bus in a single transaction."""
+    bus = db.session.get(Bus, bus_id)
+    if not bus:
+        for pending in batch:
+            pending.resolve({'message': 'Bus not found'}, 404)
+        return
+
+    # Seat conflicts within the batch are resolved in memory, first request wins; the
+    # unique index on live seats settles conflicts with other workers at commit
+    seat_numbers = {str(pending.data['seat_number']) for pending in batch}
+    taken = {seat for seat, in db.session.query(Booking.seat_number).filter(
+        Booking.bus_id == bus_id, Booking.seat_number.in_(seat_numbers), Booking.status != 'cancelled')}
+    accepted = []
+    for pending in batch:
+        seat_number = str(pending.data['seat_number'])
+        if seat_number in taken:
+            pending.resolve({'message': 'Seat already booked'}, 409)
+            continue
+        taken.add(seat_number)
+        accepted.append(pending)
+    if not accepted:
+        return
+
+    bookings = [Booking(
+        bus_id=bus_id,
+        user_id=pending.user_id,
+        seat_number=str(pending.data['seat_number']),
+        name=pending.data['name'],
+        idNumber=pending.data['idNumber'],
+        phoneNumber=pending.data['phoneNumber'],
+        status=pending.data.get('status') or 'booked',
+        ticket=ticket
+    ) for pending, ticket in zip(accepted, unique_tickets(len(accepted)))]
+    try:
+        # Enqueueing autoflushes, so a lost race on a seat can surface here as well as at commit
+        db.session.add_all(bookings)
+        reconcile_later(bus_id)
+        notify_tickets(bookings, bus)
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        if not retry:
+            for pending in accepted:
+                if seat_taken(e):
+                    pending.resolve({'message': 'Seat already booked'}, 409)
+                else:
+                    pending.resolve({'message': 'Booking failed', 'error': str(e.orig)}, 500)
+            return
+        # Commit one by one so a single bad row only fails its own request
+        for pending in accepted:
+            commit_batch(bus_id, [pending], retry=False)
+        return
+
+    for pending, booking in zip(accepted, bookings):
+        pending.resolve({
+            'ticket': booking.ticket,
+            'status': booking.status,
+            'qr': signer.issue(booking, bus),
+            'message': 'Booking confirmed'
+        }, 201)
+
+
+class BusWriter:
+    """Single writer for one bus: drains its queue and group commits."""
+
+    def __init__(self, manager, bus_id):
+        self.manager = manager
+        self.bus_id = bus_id
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name=f'booking-writer-{bus_id}', daemon=True)
+
+    def next_batch(self):
+        batch = [self.queue.get(timeout=IDLE_TIMEOUT)]
+        deadline = time.monotonic() + BATCH_WINDOW
+        while len(batch) < MAX_BATCH:
+            try:
+                batch.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while True:
+            try:
+                batch = self.next_batch()
+            except queue.Empty:
+                if self.manager.retire(self):
+                    return
+                continue
+
+            with self.manager.app.app_context():
+                try:
+                    commit_batch(self.bus_id, batch)
+                except Exception as e:
+                    db.session.rollback()
+                    for pending in batch:
+                        if not pending.done.is_set():
+                            pending.resolve({'message': 'Booking failed', 'error': str(e)}, 500)
+
+
+class BookingWriters:
+    """Routes booking requests to one in-process writer per bus."""
+
+    def __init__(self, app=None):
+        self.app = app
+        self.lock = threading.Lock()
+        self.writers = {}
+
+    def init_app(self, app):
+        self.app = app
+
+    def submit(self, bus_id, data, user_id=None):
+        pending = PendingBooking(data, user_id)
+        with self.lock:
+            writer = self.writers.get(bus_id)
+            if writer is None:
+                writer = self.writers[bus_id] = BusWriter(self, bus_id)
+                writer.thread.start()
+            writer.queue.put(pending)
+        if not pending.done.wait(REQUEST_TIMEOUT):
+            return {'message': 'Booking is taking too long, check your ticket later'}, 503
+        return pending.result
+
+    def retire(self, writer):
+        # Under the submit lock, so no request can be queued to a stopped writer
+        with self.lock:
+            if not writer.queue.empty():
+                return False
+            del self.writers[writer.bus_id]
+            return True
+
+
+booking_writers = BookingWriters()
@@ -0,0 +1,56 @@
+# bulk.py
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from models import db
+
+# Rows per multi-row INSERT statement
+CHUNK_SIZE = 500
+
+
+def chunked(values, size=CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def insert_ignore(table, rows):
+    # Multi-row INSERT ... ON CONFLICT DO NOTHING, issued in chunks; returns the rows inserted
+    dialect = db.session.get_bind().dialect.name
+    mark_bulk_write(db.session, table.name)
+    inserted = 0
+    for chunk in chunked(rows):
+        if dialect == 'postgresql':
+            stmt = postgresql.insert(table).values(chunk).on_conflict_do_nothing()
+        elif dialect == 'sqlite':
+            stmt = sqlite.insert(table).values(chunk).on_conflict_do_nothing()
+        else:
+            stmt = table.insert().values(chunk)
+        inserted += db.session.execute(stmt).rowcount
+    return inserted
+
+
+def mark_bulk_write(session, table_name):
+    # Core statements bypass ORM events; listeners check this after commit
+    session.info.setdefault('bulk_tables', set()).add(table_name)
+
+
+def bulk_tables(session):
+    # Tables written with Core inserts in the current transaction
+    return session.info.get('bulk_tables', set())
+
+
+def mark_row_write(session, obj):
+    # One row changed with a Core UPDATE and read back; listeners take its new state before commit
+    session.info.setdefault('row_writes', []).append(obj)
+
+
+def row_writes(session):
+    return session.info.get('row_writes', [])
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def clear_bulk_tables(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('bulk_tables', None)
+        session.info.pop('row_writes', None)
@@ -0,0 +1,109 @@
+# compression.py
+import zlib
+from flask import request
+
+try:
+    import brotli  # optional dependency; without it only gzip is offered
+except ImportError:
+    brotli = None
+
+DEFAULT_MIMETYPES = ['application/json', 'application/msgpack', 'application/cbor', 'text/html', 'text/plain', 'text/csv',
+                     'text/event-stream']
+
+
+class GzipStream:
+    def __init__(self, level):
+        # wbits 31: zlib's deflate with a gzip header and trailer
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class BrotliStream:
+    def __init__(self, quality):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+def stream(chunks, encoder):
+    # Flushed per chunk so each server-sent event reaches the client as soon as it is written
+    for chunk in chunks:
+        data = encoder.compress(chunk) + encoder.flush()
+        if data:
+            yield data
+    yield encoder.finish()
+
+
+class Compression:
+    """Compresses responses with brotli or gzip, whichever the client prefers."""
+
+    def __init__(self, app=None):
+        self.app = app
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('COMPRESS_ENABLED', True)
+        # Smaller bodies cost more to compress than they save
+        app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+        app.config.setdefault('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES)
+        app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+        # Brotli above 5 gets slow for per-request use
+        app.config.setdefault('COMPRESS_BROTLI_QUALITY', 4)
+        app.after_request(self.after_request)
+
+    def encodings(self):
+        return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    def encoder(self, encoding):
+        if encoding == 'br':
+            return BrotliStream(self.app.config['COMPRESS_BROTLI_QUALITY'])
+        return GzipStream(self.app.config['COMPRESS_GZIP_LEVEL'])
+
+    def after_request(self, response):
+        config = self.app.config
+        if not config['COMPRESS_ENABLED'] or response.mimetype not in config['COMPRESS_MIMETYPES']:
+            return response
+        response.vary.add('Accept-Encoding')
+        # Files sent straight from disk, partial content and already encoded bodies stay as they are
+        if response.direct_passthrough or response.status_code < 200 or response.status_code in (204, 206, 304) \
+                or 'Content-Encoding' in response.headers or request.method == 'HEAD':
+            return response
+        encoding = request.accept_encodings.best_match(self.encodings())
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = stream(response.iter_encoded(), self.encoder(encoding))
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < config['COMPRESS_MIN_SIZE']:
+                return response
+            encoder = self.encoder(encoding)
+            response.set_data(encoder.compress(data) + encoder.finish())
+        response.headers['Content-Encoding'] = encoding
+        # A strong ETag promises identical bytes, which a different encoding doesn't have
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+compression = Compression()
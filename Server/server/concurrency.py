@@ -0,0 +1,57 @@
+# concurrency.py
+from flask import request, jsonify
+from sqlalchemy import update
+from models import db
+from bulk import mark_row_write
+
+
+def if_match():
+    """Version from an If-Match header ("3" or W/"3"), None when absent. Raises ValueError if malformed."""
+    value = (request.headers.get('If-Match') or '').strip()
+    if not value or value == '*':
+        return None
+    if value.startswith('W/'):
+        value = value[2:]
+    return int(value.strip('"'))
+
+
+def with_etag(response, obj):
+    response.set_etag(str(obj.version))
+    return response
+
+
+def stale(version):
+    response = jsonify({'message': 'Resource was modified by someone else', 'version': version})
+    response.status_code = 412
+    if version is not None:
+        response.set_etag(str(version))
+    return response
+
+
+def missing_or_stale(model, id):
+    # Only reached when a guarded write matched nothing: tell a stale version apart from a missing row
+    current = db.session.query(model.version).filter(model.id == id).scalar()
+    if current is None:
+        return jsonify({'message': f'{model.__name__} not found'}), 404
+    return stale(current)
+
+
+def versioned_update(model, id, values, version=None):
+    """UPDATE ... WHERE id = ? [AND version = ?] as one statement, bumping the version.
+
+    Returns the updated object, or None when no row matched.
+    """
+    statement = update(model).where(model.id == id).values(**values, version=model.version + 1)
+    if version is not None:
+        statement = statement.where(model.version == version)
+    if db.session.get_bind().dialect.update_returning:
+        obj = db.session.scalars(statement.returning(model),
+                                 execution_options={'populate_existing': True}).one_or_none()
+    # No UPDATE ... RETURNING (MySQL): read the row back only after a successful write
+    elif db.session.execute(statement).rowcount != 1:
+        obj = None
+    else:
+        obj = db.session.get(model, id, populate_existing=True)
+    if obj is not None:
+        mark_row_write(db.session, obj)
+    return obj
@@ -0,0 +1,67 @@
+# conflicts.py
+from collections import namedtuple
+from datetime import datetime
+from heapq import heappush, heappop
+from sqlalchemy import or_
+from models import db, Bus
+
+Departure = namedtuple('Departure', 'id driver_id number_plate departure_time arrival_time')
+
+
+def as_datetime(value):
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
+def sweep(intervals):
+    """Overlapping pairs among (start, end, id) intervals, in O(n log n + overlaps)."""
+    pairs = []
+    active = []  # min-heap of (end, id) for intervals still running
+    for start, end, id in sorted(intervals):
+        while active and active[0][0] <= start:
+            heappop(active)
+        pairs.extend((other, id) for _, other in active)
+        heappush(active, (end, id))
+    return pairs
+
+
+def group_conflicts(buses):
+    # Same driver or same vehicle on the road twice at once
+    conflicts = []
+    for field in ('driver_id', 'number_plate'):
+        groups = {}
+        for bus in buses:
+            groups.setdefault(getattr(bus, field), []).append(bus)
+        for value, group in groups.items():
+            by_id = {bus.id: bus for bus in group}
+            for first, second in sweep((bus.departure_time, bus.arrival_time, bus.id) for bus in group):
+                conflicts.append({
+                    'reason': field,
+                    'value': value,
+                    'bus_ids': sorted([first, second]),
+                    'departures': sorted(by_id[id].departure_time.isoformat() for id in (first, second))
+                })
+    return conflicts
+
+
+def find_conflicts(start, end):
+    """All overlapping departures in a time range."""
+    buses = db.session.query(Bus.id, Bus.driver_id, Bus.number_plate, Bus.departure_time, Bus.arrival_time) \
+        .filter(Bus.departure_time < end, Bus.arrival_time > start).all()
+    return group_conflicts(buses)
+
+
+def conflicts_for(bus_id, driver_id, number_plate, departure_time, arrival_time):
+    """Departures overlapping a new or edited bus, for its driver or its vehicle."""
+    driver_id = int(driver_id)
+    departure_time, arrival_time = as_datetime(departure_time), as_datetime(arrival_time)
+    with db.session.no_autoflush:
+        candidates = db.session.query(Bus.id, Bus.driver_id, Bus.number_plate, Bus.departure_time, Bus.arrival_time) \
+            .filter(or_(Bus.driver_id == driver_id, Bus.number_plate == number_plate),
+                    Bus.departure_time < arrival_time, Bus.arrival_time > departure_time)
+        if bus_id is not None:
+            candidates = candidates.filter(Bus.id != bus_id)
+        candidates = candidates.all()
+    # A new bus has no id yet, 0 stands in for it
+    current = Departure(bus_id or 0, driver_id, number_plate, departure_time, arrival_time)
+    return [conflict for conflict in group_conflicts(candidates + [current])
+            if current.id in conflict['bus_ids']]
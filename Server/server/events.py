@@ -0,0 +1,171 @@
+# events.py
+import json, os, queue, threading
+from itertools import count
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from models import Booking, Seat
+
+# Seconds between keep-alive comments on idle streams
+HEARTBEAT = 15
+# Events buffered per client before a slow client is dropped
+SUBSCRIBER_BUFFER = 100
+
+
+class Subscription:
+    def __init__(self, channel):
+        self.channel = channel
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_BUFFER)
+        self.closed = False
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventHub:
+    """Fans events out to the streams open in this process."""
+
+    def __init__(self, broker=None):
+        self.lock = threading.Lock()
+        self.subscribers = {}
+        self.sequence = count(1)
+        self.broker = broker or LocalBroker()
+        self.broker.attach(self)
+
+    def subscribe(self, channel):
+        subscription = Subscription(channel)
+        with self.lock:
+            self.subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscribers = self.subscribers.get(subscription.channel, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self.subscribers.pop(subscription.channel, None)
+
+    def publish(self, channel, payload):
+        self.broker.publish(channel, payload)
+
+    def dispatch(self, channel, payload):
+        # Called by the broker once per event, whatever the number of streams
+        with self.lock:
+            subscribers = list(self.subscribers.get(channel, ()))
+        message = (next(self.sequence), payload)
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(message)
+            except queue.Full:
+                # The client reconnects and receives a fresh snapshot
+                subscription.closed = True
+                self.unsubscribe(subscription)
+
+
+class LocalBroker:
+    """In-process delivery for a single worker, and the stand-in for tests."""
+
+    def attach(self, hub):
+        self.hub = hub
+
+    def publish(self, channel, payload):
+        self.hub.dispatch(channel, payload)
+
+
+class RedisBroker:
+    """Relays events between workers through Redis pub/sub."""
+
+    def __init__(self, url, prefix='transitewise:'):
+        import redis  # optional dependency, only needed for multi-worker deployments
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def attach(self, hub):
+        self.hub = hub
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(self.prefix + '*')
+        thread = threading.Thread(target=self.listen, args=(pubsub,), name='event-broker', daemon=True)
+        thread.start()
+
+    def listen(self, pubsub):
+        for message in pubsub.listen():
+            channel = message['channel'].decode()[len(self.prefix):]
+            self.hub.dispatch(channel, json.loads(message['data']))
+
+    def publish(self, channel, payload):
+        self.client.publish(self.prefix + channel, json.dumps(payload))
+
+
+def create_broker(url):
+    if url and url.startswith('redis'):
+        return RedisBroker(url)
+    return LocalBroker()
+
+
+hub = EventHub(create_broker(os.getenv('EVENT_BROKER_URL')))
+
+
+def bus_channel(bus_id):
+    return f'bus:{bus_id}'
+
+
+def format_event(sequence, payload):
+    return f"id: {sequence}\nevent: {payload['type']}\ndata: {json.dumps(payload)}\n\n"
+
+
+def stream(subscription, snapshot):
+    yield format_event(0, snapshot)
+    try:
+        while not subscription.closed:
+            message = subscription.get(HEARTBEAT)
+            if message is None:
+                yield ': keep-alive\n\n'
+            else:
+                yield format_event(*message)
+    finally:
+        hub.unsubscribe(subscription)
+
+
+def seat_event(type, bus_id, seat_number, status):
+    return {'type': type, 'bus_id': bus_id, 'seat_number': str(seat_number), 'status': status}
+
+
+def history_value(obj, attribute):
+    history = inspect(obj).attrs[attribute].history
+    return history.deleted[0] if history.deleted else getattr(obj, attribute)
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_seat_events(session, flush_context):
+    events = session.info.setdefault('seat_events', [])
+    for obj in session.new:
+        if isinstance(obj, Booking):
+            events.append(seat_event('booked', obj.bus_id, obj.seat_number, obj.status))
+        elif isinstance(obj, Seat):
+            events.append(seat_event('seat', obj.bus_id, obj.seat_number, obj.status))
+    for obj in session.dirty:
+        state = inspect(obj)
+        if isinstance(obj, Booking) and state.attrs.seat_number.history.has_changes():
+            events.append(seat_event('cancelled', obj.bus_id, history_value(obj, 'seat_number'), 'cancelled'))
+            events.append(seat_event('booked', obj.bus_id, obj.seat_number, obj.status))
+        elif isinstance(obj, Booking) and state.attrs.status.history.has_changes():
+            type = 'cancelled' if obj.status == 'cancelled' else 'booked'
+            events.append(seat_event(type, obj.bus_id, obj.seat_number, obj.status))
+        elif isinstance(obj, Seat) and state.attrs.status.history.has_changes():
+            events.append(seat_event('seat', obj.bus_id, obj.seat_number, obj.status))
+    for obj in session.deleted:
+        if isinstance(obj, Booking):
+            events.append(seat_event('cancelled', obj.bus_id, obj.seat_number, 'cancelled'))
+
+
+@event.listens_for(Session, 'after_commit')
+def publish_seat_events(session):
+    for payload in session.info.pop('seat_events', []):
+        hub.publish(bus_channel(payload['bus_id']), payload)
+
+
+@event.listens_for(Session, 'after_rollback')
+def drop_seat_events(session):
+    session.info.pop('seat_events', None)
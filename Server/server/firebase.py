@@ -0,0 +1,69 @@
+# firebase.py
+import threading, uuid
+from types import SimpleNamespace
+
+
+class FakeAuth:
+    """In-memory stand-in for firebase_admin.auth: uid -> email of known users."""
+
+    class AuthError(Exception):
+        pass
+
+    def __init__(self, users=None):
+        self.users = dict(users or {})
+        self.lock = threading.Lock()
+
+    def create_user(self, email, password):
+        with self.lock:
+            if email in self.users.values():
+                raise self.AuthError(f'{email} already exists')
+            uid = f'fake-{uuid.uuid4().hex[:12]}'
+            self.users[uid] = email
+        return SimpleNamespace(uid=uid, email=email)
+
+    def get_user(self, uid):
+        if uid not in self.users:
+            raise self.AuthError(f'No user record found for {uid}')
+        return SimpleNamespace(uid=uid, email=self.users[uid])
+
+
+class Firebase:
+    """Firebase Admin, set up on the first auth call rather than at startup.
+
+    Workers, migrations and CLI commands that never authenticate don't import
+    the SDK or need credentials.
+    """
+
+    def __init__(self, app=None):
+        self.credentials_path = None
+        self.client = None
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FIREBASE_CREDENTIALS', None)
+        # An object standing in for firebase_admin.auth can be set directly (e.g. a fake in tests)
+        app.config.setdefault('FIREBASE_AUTH', None)
+        self.credentials_path = app.config['FIREBASE_CREDENTIALS']
+        self.client = app.config['FIREBASE_AUTH']
+
+    @property
+    def auth(self):
+        if self.client is None:
+            with self.lock:
+                if self.client is None:
+                    if not self.credentials_path:
+                        raise RuntimeError('FIREBASE_CREDENTIALS is not set')
+                    import firebase_admin
+                    from firebase_admin import auth, credentials
+                    try:
+                        firebase_admin.get_app()
+                    except ValueError:
+                        # Not initialised yet in this process; another app instance may have done it
+                        firebase_admin.initialize_app(credentials.Certificate(self.credentials_path))
+                    self.client = auth
+        return self.client
+
+
+firebase = Firebase()
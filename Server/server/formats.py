@@ -0,0 +1,88 @@
+# formats.py
+from datetime import datetime, timezone
+from decimal import Decimal, ROUND_HALF_UP
+from flask import request, jsonify, current_app
+
+try:
+    import msgpack  # optional dependency; without it the binary formats below aren't offered
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2  # optional dependency
+except ImportError:
+    cbor2 = None
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+CBOR = 'application/cbor'
+# Fields the JSON rows carry as text: ISO strings or {'date', 'time'} pairs for
+# times, str(Decimal) for prices. Binary formats send timestamps and cents instead
+TIMESTAMPS = {'departure_time', 'arrival_time', 'created_at', 'updated_at'}
+PRICES = {'price_per_seat'}
+
+
+def columns(rows):
+    # One array per field: keys are sent once instead of on every row
+    fields = list(rows[0]) if rows else []
+    return {'count': len(rows), 'columns': {field: [row.get(field) for row in rows] for field in fields}}
+
+
+def timestamp(value):
+    if isinstance(value, dict):
+        value = datetime.fromisoformat(f"{value['date']}T{value['time']}")
+    elif isinstance(value, str):
+        # Schedules send a time of day, which has no date to make a timestamp of
+        if 'T' not in value:
+            return value
+        value = datetime.fromisoformat(value)
+    # Stored times are naive UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def cents(value):
+    return int((Decimal(value) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def native(row):
+    """A JSON row with its timestamps as datetimes and prices as integer cents (renamed `<field>_cents`)."""
+    values = {}
+    for field, value in row.items():
+        if value is None:
+            values[field] = None
+        elif field in PRICES:
+            values[f'{field}_cents'] = cents(value)
+        elif field in TIMESTAMPS or isinstance(value, datetime):
+            values[field] = timestamp(value)
+        elif isinstance(value, dict):
+            values[field] = native(value)
+        else:
+            values[field] = value
+    return values
+
+
+def encoders():
+    formats = {}
+    if msgpack is not None:
+        formats[MSGPACK] = lambda body: msgpack.packb(body, datetime=True)
+    if cbor2 is not None:
+        formats[CBOR] = lambda body: cbor2.dumps(body, datetime_as_timestamp=True)
+    return formats
+
+
+def listing(rows):
+    """A list endpoint's rows as JSON, or MessagePack/CBOR when the Accept header prefers them.
+
+    ?format=columns sends the rows column by column in any of them.
+    """
+    formats = encoders()
+    mimetype = request.accept_mimetypes.best_match([JSON, *formats], default=JSON)
+    if mimetype == JSON:
+        response = jsonify(columns(rows) if request.args.get('format') == 'columns' else rows)
+    else:
+        rows = [native(row) for row in rows]
+        body = columns(rows) if request.args.get('format') == 'columns' else rows
+        response = current_app.response_class(formats[mimetype](body), mimetype=mimetype)
+    if formats:
+        response.vary.add('Accept')
+    return response
@@ -0,0 +1,190 @@
+# importer.py
+import csv, io
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import or_, tuple_
+from models import db, Driver, Bus, Route, bus_routes
+from bulk import chunked, insert_ignore
+from stops import normalize, resolve_stops
+
+DRIVER_FIELDS = ['full_name', 'id_number', 'driving_license', 'phone_number']
+BUS_FIELDS = ['number_plate', 'number_of_seats', 'departure_from', 'departure_to',
+              'departure_time', 'arrival_time', 'price_per_seat']
+# JSON rows may send these as numbers; everything else is text, as it is in a CSV
+NUMBER_FIELDS = {'number_of_seats', 'price_per_seat'}
+
+
+class ImportResult:
+    def __init__(self):
+        self.drivers = 0
+        self.buses = 0
+        self.routes = 0
+        self.errors = []
+
+    def add_error(self, row, message):
+        self.errors.append({'row': row, 'error': message})
+
+    def to_dict(self):
+        return {
+            'created': {
+                'drivers': self.drivers,
+                'buses': self.buses,
+                'routes': self.routes
+            },
+            'errors': self.errors
+        }
+
+
+def read_csv(stream):
+    if isinstance(stream, bytes):
+        stream = stream.decode('utf-8-sig')
+    if isinstance(stream, str):
+        stream = io.StringIO(stream)
+    return [{key.strip(): (value or '').strip() for key, value in row.items() if key}
+            for row in csv.DictReader(stream)]
+
+
+def parse_row(row):
+    if not isinstance(row, dict):
+        raise ValueError('Row must be an object of field names to values')
+    missing = [field for field in DRIVER_FIELDS + BUS_FIELDS if row.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+    wrong = [field for field in DRIVER_FIELDS + BUS_FIELDS + ['route_name'] if row.get(field) is not None
+             and not (isinstance(row[field], str) or field in NUMBER_FIELDS
+                      and isinstance(row[field], (int, float)) and not isinstance(row[field], bool))]
+    if wrong:
+        raise ValueError(f"Wrong type for fields: {', '.join(wrong)}")
+    try:
+        number_of_seats = int(row['number_of_seats'])
+        departure_time = datetime.fromisoformat(row['departure_time'])
+        arrival_time = datetime.fromisoformat(row['arrival_time'])
+        price_per_seat = Decimal(str(row['price_per_seat']))
+    except (ValueError, InvalidOperation) as e:
+        raise ValueError(f"Invalid value: {e}")
+    if number_of_seats <= 0:
+        raise ValueError('number_of_seats must be positive')
+    if arrival_time <= departure_time:
+        raise ValueError('arrival_time must be after departure_time')
+
+    driver = {field: row[field] for field in DRIVER_FIELDS}
+    bus = {
+        'number_plate': row['number_plate'],
+        'number_of_seats': number_of_seats,
+        'seats_available': number_of_seats,
+        'departure_from': normalize(row['departure_from']),
+        'departure_to': normalize(row['departure_to']),
+        'departure_time': departure_time,
+        'arrival_time': arrival_time,
+        'price_per_seat': price_per_seat
+    }
+    route = None
+    if row.get('route_name'):
+        route = (row['route_name'], bus['departure_from'], bus['departure_to'])
+    return driver, bus, route
+
+
+def existing_drivers(drivers):
+    # One lookup for every unique driver column in the batch
+    found = {field: {} for field in DRIVER_FIELDS[1:]}
+    id_numbers = {d['id_number'] for d in drivers}
+    licenses = {d['driving_license'] for d in drivers}
+    phones = {d['phone_number'] for d in drivers}
+    if not drivers:
+        return found
+    query = Driver.query.filter(or_(
+        Driver.id_number.in_(id_numbers),
+        Driver.driving_license.in_(licenses),
+        Driver.phone_number.in_(phones)
+    ))
+    for driver in query:
+        for field in found:
+            found[field][getattr(driver, field)] = driver.id_number
+    return found
+
+
+def import_timetable(rows):
+    """Validate and bulk insert drivers, buses and routes from timetable rows."""
+    result = ImportResult()
+    parsed = []
+    for index, row in enumerate(rows, start=1):
+        try:
+            parsed.append((index,) + parse_row(row))
+        except ValueError as e:
+            result.add_error(index, str(e))
+
+    known = existing_drivers([driver for _, driver, _, _ in parsed])
+    plates = {bus['number_plate'] for _, _, bus, _ in parsed}
+    taken_departures = set()
+    for chunk in chunked(plates):
+        taken_departures.update(db.session.query(Bus.number_plate, Bus.departure_time).filter(Bus.number_plate.in_(chunk)))
+
+    new_drivers = {}
+    new_buses = {}
+    bus_driver = {}
+    bus_route = {}
+    routes = set()
+    for index, driver, bus, route in parsed:
+        departure = (bus['number_plate'], bus['departure_time'])
+        if departure in taken_departures or departure in new_buses:
+            result.add_error(index, f"Bus {bus['number_plate']} already departs at {bus['departure_time'].isoformat()}")
+            continue
+
+        # Every unique column must either be free or point at the same driver,
+        # whether that driver is already stored or earlier in this file
+        owners = {known[field].get(driver[field]) for field in known} - {None}
+        if owners - {driver['id_number']}:
+            result.add_error(index, 'Driver details conflict with an existing driver')
+            continue
+        for field in known:
+            known[field][driver[field]] = driver['id_number']
+
+        if not owners:
+            new_drivers[driver['id_number']] = driver
+        new_buses[departure] = bus
+        bus_driver[departure] = driver['id_number']
+        if route:
+            routes.add(route)
+            bus_route[departure] = route
+
+    try:
+        insert_ignore(Driver.__table__, list(new_drivers.values()))
+        driver_ids = {}
+        for chunk in chunked(set(bus_driver.values())):
+            driver_ids.update(db.session.query(Driver.id_number, Driver.id).filter(Driver.id_number.in_(chunk)))
+
+        route_key = tuple_(Route.route_name, Route.departure_from, Route.departure_to)
+        route_ids = {}
+        for chunk in chunked(routes):
+            for route in Route.query.filter(route_key.in_(chunk)):
+                route_ids[(route.route_name, route.departure_from, route.departure_to)] = route.id
+        stop_ids = resolve_stops([bus[field] for bus in new_buses.values() for field in ('departure_from', 'departure_to')])
+        new_routes = [{'route_name': name, 'departure_from': origin, 'departure_to': destination,
+                       'departure_from_id': stop_ids[origin.lower()], 'departure_to_id': stop_ids[destination.lower()]}
+                      for name, origin, destination in routes if (name, origin, destination) not in route_ids]
+        insert_ignore(Route.__table__, new_routes)
+        for chunk in chunked(set(routes) - set(route_ids)):
+            for route in Route.query.filter(route_key.in_(chunk)):
+                route_ids.setdefault((route.route_name, route.departure_from, route.departure_to), route.id)
+
+        for departure, bus in new_buses.items():
+            bus['driver_id'] = driver_ids[bus_driver[departure]]
+            bus['departure_from_id'] = stop_ids[bus['departure_from'].lower()]
+            bus['departure_to_id'] = stop_ids[bus['departure_to'].lower()]
+        insert_ignore(Bus.__table__, list(new_buses.values()))
+        bus_ids = {}
+        for chunk in chunked({plate for plate, _ in new_buses}):
+            query = db.session.query(Bus.number_plate, Bus.departure_time, Bus.id).filter(Bus.number_plate.in_(chunk))
+            bus_ids.update(((plate, departure_time), id) for plate, departure_time, id in query)
+        insert_ignore(bus_routes, [{'bus_id': bus_ids[departure], 'route_id': route_ids[route]}
+                                   for departure, route in bus_route.items()])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    result.errors.sort(key=lambda error: error['row'])
+    result.drivers = len(new_drivers)
+    result.buses = len(new_buses)
+    result.routes = len(new_routes)
+    return result
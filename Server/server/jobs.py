@@ -0,0 +1,244 @@
+# jobs.py
+import os, random, threading, time, uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, case, delete, func, or_, select, update
+from models import db, Bus, Booking, Job
+from bulk import insert_ignore, mark_row_write
+from timetable import materialize, DAYS_AHEAD
+from archive import archive_departures
+
+# Jobs claimed per round trip; one UPDATE claims the lot and one marks them done
+BATCH_SIZE = int(os.getenv('JOBS_BATCH_SIZE', 500))
+POLL_INTERVAL = float(os.getenv('JOBS_POLL_INTERVAL', 0.5))
+# Running jobs whose worker went quiet this long are claimed again
+LOCK_TIMEOUT = timedelta(minutes=5)
+BACKOFF_BASE = 2
+BACKOFF_MAX = 3600
+# Finished jobs are kept this long for status lookups
+RETENTION = timedelta(days=1)
+PURGE_EVERY = 60
+
+# kind -> (function, max_attempts)
+handlers = {}
+
+
+def utcnow():
+    # Stored datetimes are naive UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def job(kind, max_attempts=5):
+    def decorator(function):
+        handlers[kind] = (function, max_attempts)
+        return function
+    return decorator
+
+
+def enqueue(kind, payload=None, key=None, delay=0):
+    """Adds a job to the caller's transaction, so it only runs if the caller commits.
+
+    With a key, at most one job per key waits at a time; later calls are dropped.
+    """
+    current = utcnow()
+    row = {
+        'kind': kind,
+        'payload': payload or {},
+        'key': key,
+        'status': 'pending',
+        'attempts': 0,
+        'max_attempts': handlers[kind][1],
+        'run_at': current + timedelta(seconds=delay),
+        'created_at': current
+    }
+    if key:
+        insert_ignore(Job.__table__, [row])
+        return None
+    new_job = Job(**row)
+    db.session.add(new_job)
+    return new_job
+
+
+def backoff(attempts):
+    # Exponential with jitter so failed batches don't retry in lockstep
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1)) * random.uniform(0.5, 1)
+
+
+def claim(worker_id, limit=BATCH_SIZE):
+    """Marks up to `limit` due jobs as running for this worker and returns them."""
+    current = utcnow()
+    due = or_(and_(Job.status == 'pending', Job.run_at <= current),
+              and_(Job.status == 'running', Job.locked_at < current - LOCK_TIMEOUT))
+    try:
+        # SKIP LOCKED lets workers claim side by side on PostgreSQL; elsewhere FOR UPDATE is dropped
+        # and the repeated `due` condition in the UPDATE keeps two workers off the same job
+        ids = db.session.scalars(select(Job.id).where(due).order_by(Job.run_at).limit(limit)
+                                 .with_for_update(skip_locked=True)).all()
+        if not ids:
+            db.session.commit()
+            return []
+        # Freeing the key lets work arriving from now on queue a fresh job
+        db.session.execute(update(Job).where(Job.id.in_(ids), due).values(
+            status='running', locked_by=worker_id, locked_at=current, attempts=Job.attempts + 1, key=None),
+            execution_options={'synchronize_session': False})
+        claimed = db.session.execute(select(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts)
+                                     .where(Job.id.in_(ids), Job.locked_by == worker_id,
+                                            Job.locked_at == current)).all()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return claimed
+
+
+def finish(worker_id, results):
+    """Records a batch of (job, error) outcomes: successes in one statement, failures one by one."""
+    current = utcnow()
+    done = [claimed.id for claimed, error in results if error is None]
+    try:
+        if done:
+            db.session.execute(update(Job).where(Job.id.in_(done), Job.locked_by == worker_id).values(
+                status='done', finished_at=current, locked_by=None, last_error=None),
+                execution_options={'synchronize_session': False})
+        for claimed, error in results:
+            if error is None:
+                continue
+            values = {'status': 'failed', 'finished_at': current} if claimed.attempts >= claimed.max_attempts \
+                else {'status': 'pending', 'run_at': current + timedelta(seconds=backoff(claimed.attempts))}
+            db.session.execute(update(Job).where(Job.id == claimed.id, Job.locked_by == worker_id)
+                               .values(locked_by=None, last_error=error[:2000], **values),
+                               execution_options={'synchronize_session': False})
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def purge(before):
+    deleted = db.session.execute(delete(Job).where(Job.status == 'done', Job.finished_at < before)).rowcount
+    db.session.commit()
+    return deleted
+
+
+def queue_metrics():
+    counts = db.session.query(Job.kind, Job.status, func.count(Job.id)).group_by(Job.kind, Job.status)
+    oldest = db.session.query(func.min(Job.run_at)).filter(Job.status == 'pending', Job.run_at <= utcnow()).scalar()
+    by_kind = {}
+    for kind, status, count in counts:
+        by_kind.setdefault(kind, {})[status] = count
+    return {'by_kind': by_kind, 'oldest_due': oldest.isoformat() if oldest else None}
+
+
+class Worker:
+    """Claims due jobs in batches and runs them on a thread pool."""
+
+    def __init__(self, app, threads=8, batch_size=BATCH_SIZE, poll_interval=POLL_INTERVAL):
+        self.app = app
+        self.id = uuid.uuid4().hex
+        self.threads = threads
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    def record(self, kind, error, seconds):
+        with self.lock:
+            stats = self.stats.setdefault(kind, {'succeeded': 0, 'failed': 0, 'seconds': 0.0})
+            stats['failed' if error else 'succeeded'] += 1
+            stats['seconds'] += seconds
+
+    def execute(self, claimed):
+        started = time.monotonic()
+        with self.app.app_context():
+            try:
+                if claimed.kind not in handlers:
+                    raise LookupError(f'No handler for job kind {claimed.kind!r}')
+                handlers[claimed.kind][0](**claimed.payload)
+                db.session.commit()
+                error = None
+            except Exception as e:
+                db.session.rollback()
+                error = f'{type(e).__name__}: {e}'
+            finally:
+                db.session.remove()
+        self.record(claimed.kind, error, time.monotonic() - started)
+        return claimed, error
+
+    def run_once(self, pool):
+        with self.app.app_context():
+            try:
+                claimed = claim(self.id, self.batch_size)
+                if claimed:
+                    finish(self.id, list(pool.map(self.execute, claimed)))
+            finally:
+                db.session.remove()
+        return len(claimed)
+
+    def run(self):
+        purged = 0
+        with ThreadPoolExecutor(self.threads, thread_name_prefix=f'job-{self.id[:8]}') as pool:
+            while not self.stopped.is_set():
+                try:
+                    if time.monotonic() - purged > PURGE_EVERY:
+                        with self.app.app_context():
+                            purge(utcnow() - RETENTION)
+                            db.session.remove()
+                        purged = time.monotonic()
+                    if not self.run_once(pool):
+                        self.stopped.wait(self.poll_interval)
+                except Exception:
+                    self.app.logger.exception('Job batch failed')
+                    self.stopped.wait(self.poll_interval)
+
+    def start(self):
+        thread = threading.Thread(target=self.run, name=f'job-worker-{self.id[:8]}', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.stopped.set()
+
+    def metrics(self):
+        with self.lock:
+            return {kind: {**stats, 'average_ms': round(stats['seconds'] / max(stats['succeeded'] + stats['failed'], 1) * 1000, 3)}
+                    for kind, stats in self.stats.items()}
+
+
+def run_worker_process(app, threads):
+    # Each forked process gets its own connection pool
+    with app.app_context():
+        db.engine.dispose(close=False)
+    Worker(app, threads).run()
+
+
+# Seat counts are not touched by the booking path; this job brings them back in line
+RECONCILE_DELAY = 2
+
+
+def reconcile_later(bus_id):
+    enqueue('reconcile_seats', {'bus_id': bus_id}, key=f'reconcile_seats:{bus_id}', delay=RECONCILE_DELAY)
+
+
+@job('reconcile_seats')
+def reconcile_seats(bus_id):
+    booked = select(func.count(Booking.id)).where(Booking.bus_id == bus_id, Booking.status != 'cancelled') \
+        .scalar_subquery()
+    # A counter, not an edit of the bus: leaving version, updated_at and sync_xid alone keeps sales from
+    # failing an admin's If-Match or showing up as bus changes in /sync
+    updated = db.session.execute(update(Bus).where(Bus.id == bus_id).values(
+        seats_available=case((Bus.number_of_seats > booked, Bus.number_of_seats - booked), else_=0),
+        updated_at=Bus.updated_at, sync_xid=Bus.sync_xid)).rowcount
+    if updated:
+        # The journey planner skips sold out departures
+        mark_row_write(db.session, db.session.get(Bus, bus_id, populate_existing=True))
+
+
+@job('materialize_departures', max_attempts=3)
+def materialize_departures(days_ahead=DAYS_AHEAD):
+    materialize(days_ahead)
+
+
+@job('archive_departures', max_attempts=3)
+def archive_old_departures():
+    archive_departures()
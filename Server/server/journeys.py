@@ -0,0 +1,293 @@
+# journeys.py
+import os, threading, time, uuid
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from heapq import heappush, heappop
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import db, Bus
+from bulk import bulk_tables, mark_bulk_write, row_writes
+from events import hub
+
+# Minimum time to change buses at an intermediate stop
+MIN_CONNECTION = timedelta(minutes=int(os.getenv('JOURNEY_MIN_CONNECTION_MINUTES', 20)))
+MAX_LEGS = 3
+# Number of alternative journeys returned for a day
+MAX_OPTIONS = 5
+CACHE_SIZE = 2048
+# Days of departures kept in memory, least recently searched dropped first
+DAYS_CACHED = 60
+# Loaded days and results are read again after this long, so changes committed by
+# other processes show up even without a shared event broker
+TTL = 300
+# Other workers hear which buses a commit changed on this channel of the event hub
+CHANNEL = 'journeys'
+
+
+def stop_key(name):
+    return name.strip().lower()
+
+
+def as_datetime(value):
+    # Handlers assign the raw request strings to Bus columns
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
+class Departure:
+    __slots__ = ('departure_time', 'arrival_time', 'bus_id', 'departure_from', 'departure_to',
+                 'price_per_seat', 'seats_available')
+
+    def __init__(self, bus_id, departure_from, departure_to, departure_time, arrival_time, price_per_seat, seats_available):
+        self.bus_id = bus_id
+        self.departure_from = departure_from
+        self.departure_to = departure_to
+        self.departure_time = departure_time
+        self.arrival_time = arrival_time
+        self.price_per_seat = price_per_seat
+        self.seats_available = seats_available
+
+    def sort_key(self):
+        return (self.departure_time, self.bus_id)
+
+    def __lt__(self, other):
+        return self.sort_key() < other.sort_key()
+
+    def to_dict(self):
+        return {
+            'bus_id': self.bus_id,
+            'departure_from': self.departure_from,
+            'departure_to': self.departure_to,
+            'departure_time': self.departure_time.isoformat(),
+            'arrival_time': self.arrival_time.isoformat(),
+            'price_per_seat': str(self.price_per_seat),
+            'seats_available': self.seats_available
+        }
+
+
+class JourneyPlanner:
+    """Earliest-arrival search over departures grouped per day and origin stop."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.days = OrderedDict()  # day -> (loaded at, {origin stop key: [Departure sorted by departure_time]})
+        self.index = {}  # bus_id -> Departure, for incremental updates
+        self.cache = OrderedDict()  # (origin, destination, day) -> (computed at, journeys)
+        # Tells this process's own broadcasts apart from other workers'
+        self.name = uuid.uuid4().hex
+        self.subscription = None
+
+    def reset(self):
+        with self.lock:
+            self.days.clear()
+            self.index.clear()
+            self.cache.clear()
+
+    def load_day(self, day):
+        entry = self.days.get(day)
+        if entry is not None and time.monotonic() - entry[0] < TTL:
+            self.days.move_to_end(day)
+            return entry[1]
+        self.drop_day(day)
+        start = datetime.combine(day, datetime.min.time())
+        rows = db.session.query(
+            Bus.id, Bus.departure_from, Bus.departure_to, Bus.departure_time,
+            Bus.arrival_time, Bus.price_per_seat, Bus.seats_available
+        ).filter(Bus.departure_time >= start, Bus.departure_time < start + timedelta(days=1))
+        stops = {}
+        for row in rows:
+            departure = Departure(*row)
+            stops.setdefault(stop_key(departure.departure_from), []).append(departure)
+            self.index[departure.bus_id] = departure
+        for departures in stops.values():
+            departures.sort()
+        self.days[day] = (time.monotonic(), stops)
+        while len(self.days) > DAYS_CACHED:
+            self.drop_day(next(iter(self.days)))
+        return stops
+
+    def drop_day(self, day):
+        entry = self.days.pop(day, None)
+        if entry is None:
+            return
+        for departures in entry[1].values():
+            for departure in departures:
+                if self.index.get(departure.bus_id) is departure:
+                    del self.index[departure.bus_id]
+        self.evict(day)
+
+    def remove(self, bus_id):
+        departure = self.index.pop(bus_id, None)
+        if departure is None:
+            return
+        day = departure.departure_time.date()
+        departures = self.days[day][1].get(stop_key(departure.departure_from), []) if day in self.days else []
+        position = bisect_left(departures, departure)
+        if position < len(departures) and departures[position] is departure:
+            del departures[position]
+        self.evict(day)
+
+    def update(self, departure):
+        # Buses only matter to days already loaded; others are read on demand
+        self.remove(departure.bus_id)
+        day = departure.departure_time.date()
+        if day in self.days:
+            insort(self.days[day][1].setdefault(stop_key(departure.departure_from), []), departure)
+            self.index[departure.bus_id] = departure
+        self.evict(day)
+
+    def apply(self, changes):
+        """Applies committed bus changes (bus_id -> Departure, or None when deleted) and tells other workers."""
+        with self.lock:
+            for bus_id, departure in changes.items():
+                if departure is None:
+                    self.remove(bus_id)
+                else:
+                    self.update(departure)
+        days = sorted({departure.departure_time.date().isoformat() for departure in changes.values() if departure})
+        hub.publish(CHANNEL, {'origin': self.name, 'buses': list(changes), 'days': days})
+
+    def changed_everywhere(self):
+        """After a bulk write: drops everything here and in other workers."""
+        self.reset()
+        hub.publish(CHANNEL, {'origin': self.name, 'reset': True})
+
+    def receive(self):
+        # Called with self.lock held: catch up on changes other workers committed
+        if self.subscription is None or self.subscription.closed:
+            if self.subscription is not None:
+                # Dropped for falling behind; some changes were missed
+                self.reset()
+            self.subscription = hub.subscribe(CHANNEL)
+        while (message := self.subscription.get(0)) is not None:
+            payload = message[1]
+            if payload['origin'] == self.name:
+                continue
+            if payload.get('reset'):
+                self.reset()
+                continue
+            # The old departure is wherever this process last saw the bus; the new one is reloaded
+            for bus_id in payload['buses']:
+                self.remove(bus_id)
+            for day in payload['days']:
+                self.drop_day(date.fromisoformat(day))
+
+    def evict(self, day):
+        # Searches for a day also use the next day's departures
+        for key in [key for key in self.cache if key[2] in (day, day - timedelta(days=1))]:
+            del self.cache[key]
+
+    def departures_from(self, stop, after, until):
+        day = after.date()
+        while day <= until.date():
+            departures = self.load_day(day).get(stop, [])
+            position = bisect_left(departures, Departure(0, None, None, after, None, None, None))
+            for departure in departures[position:]:
+                if departure.departure_time >= until:
+                    return
+                yield departure
+            day += timedelta(days=1)
+
+    def earliest_arrival(self, origin, destination, start, until):
+        best = {origin: start}
+        legs = {origin: []}
+        queue = [(start, origin)]
+        while queue:
+            time, stop = heappop(queue)
+            if stop == destination:
+                return legs[stop]
+            if time > best[stop] or len(legs[stop]) >= MAX_LEGS:
+                continue
+            ready = time if stop == origin else time + MIN_CONNECTION
+            # Nothing leaving after the best known arrival can improve on it
+            limit = min(until, best.get(destination, until))
+            for departure in self.departures_from(stop, ready, limit):
+                if departure.seats_available <= 0:
+                    continue
+                target = stop_key(departure.departure_to)
+                if departure.arrival_time < best.get(target, until):
+                    best[target] = departure.arrival_time
+                    legs[target] = legs[stop] + [departure]
+                    heappush(queue, (departure.arrival_time, target))
+        return None
+
+    def search(self, origin, destination, day):
+        origin, destination = stop_key(origin), stop_key(destination)
+        key = (origin, destination, day)
+        with self.lock:
+            self.receive()
+            if key in self.cache:
+                computed, result = self.cache[key]
+                if time.monotonic() - computed < TTL:
+                    self.cache.move_to_end(key)
+                    return result
+                del self.cache[key]
+
+            journeys = []
+            start = datetime.combine(day, datetime.min.time())
+            until = start + timedelta(days=2)
+            # Each option departs after the previous option's first leg
+            while len(journeys) < MAX_OPTIONS and start < until - timedelta(days=1):
+                legs = self.earliest_arrival(origin, destination, start, until)
+                if not legs:
+                    break
+                journeys.append(legs)
+                start = legs[0].departure_time + timedelta(seconds=1)
+
+            result = [{
+                'departure_time': legs[0].departure_time.isoformat(),
+                'arrival_time': legs[-1].arrival_time.isoformat(),
+                'transfers': len(legs) - 1,
+                'price': str(sum(leg.price_per_seat for leg in legs)),
+                'legs': [leg.to_dict() for leg in legs]
+            } for legs in journeys]
+            self.cache[key] = (time.monotonic(), result)
+            if len(self.cache) > CACHE_SIZE:
+                self.cache.popitem(last=False)
+            return result
+
+
+planner = JourneyPlanner()
+
+
+def snapshot(session, obj):
+    # Taken while the bus's state is still readable; applied once the transaction commits
+    try:
+        session.info.setdefault('journey_changes', {})[obj.id] = Departure(
+            obj.id, obj.departure_from, obj.departure_to, as_datetime(obj.departure_time),
+            as_datetime(obj.arrival_time), Decimal(str(obj.price_per_seat)), int(obj.seats_available))
+    except (TypeError, ValueError):
+        mark_bulk_write(session, 'buses')
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_bus_changes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Bus) and obj.id is not None:
+            snapshot(session, obj)
+    for obj in session.deleted:
+        if isinstance(obj, Bus):
+            session.info.setdefault('journey_changes', {})[obj.id] = None
+
+
+@event.listens_for(Session, 'before_commit')
+def collect_bus_updates(session):
+    # Buses changed with a Core UPDATE (versioned_update) never pass through a flush
+    for obj in row_writes(session):
+        if isinstance(obj, Bus):
+            snapshot(session, obj)
+
+
+@event.listens_for(Session, 'after_commit')
+def apply_bus_changes(session):
+    changes = session.info.pop('journey_changes', {})
+    if 'buses' in bulk_tables(session):
+        planner.changed_everywhere()
+    elif changes:
+        planner.apply(changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def drop_bus_changes(session):
+    session.info.pop('journey_changes', None)
@@ -0,0 +1,57 @@
+"""added schedules
+
+Revision ID: 3b7e91c4d2a0
+Revises: 097ca610c2ca
+Create Date: 2026-10-19 09:12:40.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7e91c4d2a0'
+down_revision = '097ca610c2ca'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('schedules',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('route_id', sa.Integer(), nullable=False),
+    sa.Column('driver_id', sa.Integer(), nullable=False),
+    sa.Column('number_plate', sa.String(length=20), nullable=False),
+    sa.Column('number_of_seats', sa.Integer(), nullable=False),
+    sa.Column('days_of_week', sa.String(length=7), nullable=False),
+    sa.Column('departure_time', sa.Time(), nullable=False),
+    sa.Column('arrival_time', sa.Time(), nullable=False),
+    sa.Column('price_per_seat', sa.Numeric(), nullable=False),
+    sa.Column('start_date', sa.Date(), nullable=False),
+    sa.Column('end_date', sa.Date(), nullable=True),
+    sa.Column('generated_until', sa.Date(), nullable=True),
+    sa.Column('active', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['driver_id'], ['drivers.id'], name=op.f('fk_schedules_driver_id_drivers')),
+    sa.ForeignKeyConstraint(['route_id'], ['routes.id'], name=op.f('fk_schedules_route_id_routes')),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # A plate now runs many departures, so uniqueness moves to (plate, departure time)
+    with op.batch_alter_table('buses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('schedule_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(batch_op.f('fk_buses_schedule_id_schedules'), 'schedules', ['schedule_id'], ['id'])
+        batch_op.drop_constraint('buses_number_plate_key', type_='unique')
+        batch_op.create_unique_constraint('uq_buses_number_plate_departure_time', ['number_plate', 'departure_time'])
+        batch_op.create_unique_constraint('uq_buses_schedule_id_departure_time', ['schedule_id', 'departure_time'])
+
+
+def downgrade():
+    with op.batch_alter_table('buses', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_buses_schedule_id_departure_time', type_='unique')
+        batch_op.drop_constraint('uq_buses_number_plate_departure_time', type_='unique')
+        batch_op.create_unique_constraint('buses_number_plate_key', ['number_plate'])
+        batch_op.drop_constraint(batch_op.f('fk_buses_schedule_id_schedules'), type_='foreignkey')
+        batch_op.drop_column('schedule_id')
+
+    op.drop_table('schedules')
@@ -0,0 +1,42 @@
+"""unique lower stop names
+
+Revision ID: b4d8f1a6c3e7
+Revises: a3c7e5f9b2d4
+Create Date: 2026-10-20 09:41:12.508317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4d8f1a6c3e7'
+down_revision = 'a3c7e5f9b2d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Stops created concurrently before this index may differ only in case; keep the oldest of each
+    for table in ('buses', 'routes'):
+        for column in ('departure_from_id', 'departure_to_id'):
+            op.execute(f"""
+                UPDATE {table} SET {column} = (
+                    SELECT MIN(keep.id) FROM stops AS keep, stops AS dup
+                    WHERE dup.id = {table}.{column} AND LOWER(keep.name) = LOWER(dup.name)
+                )
+                WHERE {column} IS NOT NULL
+            """)
+    op.execute("""
+        DELETE FROM stops WHERE id NOT IN (SELECT MIN(id) FROM stops GROUP BY LOWER(name))
+    """)
+
+    with op.batch_alter_table('stops', schema=None) as batch_op:
+        batch_op.drop_constraint('stops_name_key', type_='unique')
+    op.create_index('uq_stops_lower_name', 'stops', [sa.text('lower(name)')], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_stops_lower_name', table_name='stops')
+    with op.batch_alter_table('stops', schema=None) as batch_op:
+        batch_op.create_unique_constraint('stops_name_key', ['name'])
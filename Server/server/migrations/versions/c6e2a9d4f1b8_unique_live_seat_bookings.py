@@ -0,0 +1,36 @@
+"""unique live seat bookings
+
+Revision ID: c6e2a9d4f1b8
+Revises: b4d8f1a6c3e7
+Create Date: 2026-10-20 10:17:38.902145
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6e2a9d4f1b8'
+down_revision = 'b4d8f1a6c3e7'
+branch_labels = None
+depends_on = None
+
+LIVE = sa.text("status <> 'cancelled'")
+
+
+def upgrade():
+    # Double bookings made before the index are passengers holding tickets; leave them to a person
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT bus_id, seat_number, count(*) FROM bookings WHERE status <> 'cancelled' "
+        "GROUP BY bus_id, seat_number HAVING count(*) > 1"
+    )).fetchall()
+    if duplicates:
+        seats = ', '.join(f'bus {bus_id} seat {seat}' for bus_id, seat, _ in duplicates[:20])
+        raise RuntimeError(f'Cancel or move the double bookings first ({len(duplicates)} seats): {seats}')
+
+    op.create_index('uq_bookings_bus_id_seat_number_live', 'bookings', ['bus_id', 'seat_number'], unique=True,
+                    postgresql_where=LIVE, sqlite_where=LIVE)
+
+
+def downgrade():
+    op.drop_index('uq_bookings_bus_id_seat_number_live', table_name='bookings')
@@ -0,0 +1,63 @@
+"""added stops
+
+Revision ID: e4a9c6b1f382
+Revises: c58d2f0e6a17
+Create Date: 2026-10-19 12:05:47.264410
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a9c6b1f382'
+down_revision = 'c58d2f0e6a17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stops',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for table in ('buses', 'routes'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('departure_from_id', sa.Integer(), nullable=True))
+            batch_op.add_column(sa.Column('departure_to_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key(batch_op.f(f'fk_{table}_departure_from_id_stops'), 'stops', ['departure_from_id'], ['id'])
+            batch_op.create_foreign_key(batch_op.f(f'fk_{table}_departure_to_id_stops'), 'stops', ['departure_to_id'], ['id'])
+
+    # Backfill one stop per distinct name, ignoring case and surrounding spaces
+    op.execute("""
+        INSERT INTO stops (name, created_at)
+        SELECT MIN(TRIM(name)), CURRENT_TIMESTAMP FROM (
+            SELECT departure_from AS name FROM buses
+            UNION SELECT departure_to FROM buses
+            UNION SELECT departure_from FROM routes
+            UNION SELECT departure_to FROM routes
+        ) AS names
+        WHERE TRIM(name) <> ''
+        GROUP BY LOWER(TRIM(name))
+    """)
+    for table in ('buses', 'routes'):
+        for column in ('departure_from', 'departure_to'):
+            op.execute(f"""
+                UPDATE {table} SET {column}_id = (
+                    SELECT stops.id FROM stops WHERE LOWER(stops.name) = LOWER(TRIM({table}.{column}))
+                )
+            """)
+
+
+def downgrade():
+    for table in ('routes', 'buses'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_constraint(batch_op.f(f'fk_{table}_departure_to_id_stops'), type_='foreignkey')
+            batch_op.drop_constraint(batch_op.f(f'fk_{table}_departure_from_id_stops'), type_='foreignkey')
+            batch_op.drop_column('departure_to_id')
+            batch_op.drop_column('departure_from_id')
+
+    op.drop_table('stops')
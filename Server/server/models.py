@@ -1,8 +1,10 @@
 # models.py
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import MetaData, func
+from sqlalchemy import DDL, MetaData, BigInteger, event, func
 from datetime import datetime, timezone
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.sql.functions import FunctionElement
 from flask_bcrypt import Bcrypt
 import random, string
 
@@ -15,6 +17,24 @@ metadata = MetaData(naming_convention={
 db = SQLAlchemy(metadata=metadata)
 bcrypt = Bcrypt()
 
+
+class current_xid(FunctionElement):
+    """Id of the transaction writing the row, which sync.py orders changes by."""
+    type = BigInteger()
+    inherit_cache = True
+
+
+@compiles(current_xid)
+def compile_current_xid(element, compiler, **kw):
+    # SQLite has no transaction ids; sync.py orders by updated_at there
+    return 'NULL'
+
+
+@compiles(current_xid, 'postgresql')
+def compile_current_xid_postgresql(element, compiler, **kw):
+    # 64 bit, so it never wraps around (PostgreSQL 13+)
+    return 'pg_current_xact_id()::text::bigint'
+
 # Association table for the many-to-many relationship between Bus and Route
 bus_routes = db.Table('bus_routes', metadata,
                       db.Column('bus_id', db.Integer, db.ForeignKey('buses.id'), primary_key=True),
@@ -58,10 +78,18 @@ class Driver(db.Model):
     driving_license = db.Column(db.String(20), unique=True, nullable=False)
     phone_number = db.Column(db.String(20), unique=True, nullable=False)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    sync_xid = db.Column(db.BigInteger, default=current_xid(), onupdate=current_xid())
 
     #Relationships
     buses = db.relationship('Bus', backref='driver', lazy=True)
 
+    # Changes since a sync cursor
+    __table_args__ = (
+        db.Index('ix_drivers_updated_at', 'updated_at'),
+        db.Index('ix_drivers_sync_xid', 'sync_xid'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -98,21 +126,42 @@ class Bus(db.Model):
     __tablename__ = 'buses'
     id = db.Column(db.Integer, primary_key=True)
     driver_id = db.Column(db.Integer, db.ForeignKey('drivers.id'), nullable=False)
-    number_plate = db.Column(db.String(20), unique=True, nullable=False)
+    schedule_id = db.Column(db.Integer, db.ForeignKey('schedules.id'), nullable=True)
+    number_plate = db.Column(db.String(20), nullable=False)
     number_of_seats = db.Column(db.Integer, nullable=False)
     seats_available = db.Column(db.Integer, nullable=False)
     departure_from = db.Column(db.String(20), nullable = False )
     departure_to = db.Column(db.String(20), nullable = False)
+    departure_from_id = db.Column(db.Integer, db.ForeignKey('stops.id'), nullable=True)
+    departure_to_id = db.Column(db.Integer, db.ForeignKey('stops.id'), nullable=True)
     departure_time = db.Column(db.DateTime, nullable=False)
     arrival_time = db.Column(db.DateTime, nullable=False)
     price_per_seat = db.Column(db.Numeric, nullable=False)
+    version = db.Column(db.Integer, nullable=False, server_default='1')
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    sync_xid = db.Column(db.BigInteger, default=current_xid(), onupdate=current_xid())
+
+    # Flushes check and bump the version, concurrent edits fail instead of overwriting.
+    # seats_available is kept current with plain UPDATEs that leave version alone
+    __mapper_args__ = {'version_id_col': version}
 
     #Relationships
     bookings = db.relationship('Booking', backref='bus', lazy=True)
     seats = db.relationship('Seat', backref='bus', lazy=True)
     routes = db.relationship('Route', secondary=bus_routes, backref='buses', lazy=True)
+    origin = db.relationship('Stop', foreign_keys=[departure_from_id], lazy=True)
+    destination = db.relationship('Stop', foreign_keys=[departure_to_id], lazy=True)
+
+    # A vehicle can run many departures, but only one at a given time
+    __table_args__ = (
+        db.UniqueConstraint('number_plate', 'departure_time', name='uq_buses_number_plate_departure_time'),
+        db.UniqueConstraint('schedule_id', 'departure_time', name='uq_buses_schedule_id_departure_time'),
+        db.Index('ix_buses_departure_time', 'departure_time'),
+        db.Index('ix_buses_driver_id_departure_time', 'driver_id', 'departure_time'),
+        db.Index('ix_buses_updated_at', 'updated_at'),
+        db.Index('ix_buses_sync_xid', 'sync_xid'),
+    )
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -122,14 +171,18 @@ class Bus(db.Model):
         return {
             'id': self.id,
             'driver_id': self.driver_id,
+            'schedule_id': self.schedule_id,
             'number_plate': self.number_plate,
             'number_of_seats': self.number_of_seats,
             'seats_available': self.seats_available,
             'departure_from': self.departure_from,
             'departure_to': self.departure_to,
+            'departure_from_id': self.departure_from_id,
+            'departure_to_id': self.departure_to_id,
             'departure_time': self.departure_time.isoformat(),
             'arrival_time': self.arrival_time.isoformat(),
             'price_per_seat': str(self.price_per_seat),
+            'version': self.version,
             'created_at': {
                 'date': self.created_at.strftime('%Y-%m-%d'),
                 'time': self.created_at.strftime('%H:%M:%S')
@@ -149,13 +202,20 @@ class Seat(db.Model):
     seat_number = db.Column(db.String(10), nullable=False)
     status = db.Column(db.String(20), nullable=False)
     bus_id = db.Column(db.Integer, db.ForeignKey('buses.id'), nullable=False)
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+
+    __table_args__ = (
+        db.Index('ix_seats_bus_id', 'bus_id'),
+    )
+    __mapper_args__ = {'version_id_col': version}
 
     def to_dict(self):
         return {
             'id': self.id,
             'seat_number': self.seat_number,
             'status': self.status,
-            'bus_id': self.bus_id
+            'bus_id': self.bus_id,
+            'version': self.version
         }
     
     def __repr__(self):
@@ -190,6 +250,12 @@ class ContactUs(db.Model):
     email = db.Column(db.String(255), nullable=False)
     message = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Provisional id handed out by writebehind.py; replaying a spool file skips rows already in
+    submission_id = db.Column(db.String(32), nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('submission_id', name='uq_contactus_submission_id'),
+    )
 
     def to_dict(self):
         return {
@@ -205,6 +271,7 @@ class Booking(db.Model):
     __tablename__ = 'bookings'
     id = db.Column(db.Integer, primary_key=True)
     bus_id = db.Column(db.Integer, db.ForeignKey('buses.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     seat_number = db.Column(db.String, nullable=False)
     status = db.Column(db.String(50), nullable=False, default='booked')  # 'booked', 'cancelled'
     name = db.Column(db.String(80), nullable=False)
@@ -212,18 +279,38 @@ class Booking(db.Model):
     phoneNumber = db.Column(db.String(20), nullable=False)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    sync_xid = db.Column(db.BigInteger, default=current_xid(), onupdate=current_xid())
     ticket = db.Column(db.String(6), unique=True, nullable=False, default='')
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
 
+    #Relationships
+    user = db.relationship('User', backref='bookings', lazy=True)
+
+    # Passenger lookups by phone, ID number and account
+    __table_args__ = (
+        db.Index('ix_bookings_phoneNumber', 'phoneNumber'),
+        db.Index('ix_bookings_idNumber', 'idNumber'),
+        db.Index('ix_bookings_user_id', 'user_id'),
+        db.Index('ix_bookings_updated_at', 'updated_at'),
+        db.Index('ix_bookings_sync_xid', 'sync_xid'),
+        # One live booking per seat, whichever worker takes the request
+        db.Index('uq_bookings_bus_id_seat_number_live', 'bus_id', 'seat_number', unique=True,
+                 postgresql_where=db.text("status <> 'cancelled'"), sqlite_where=db.text("status <> 'cancelled'")),
+    )
 
     def to_dict(self):
         return {
             'id': self.id,
             'bus_id': self.bus_id,
+            'user_id': self.user_id,
             'name': self.name,
             'idNumber': self.idNumber,
             'phoneNumber': self.phoneNumber,
             'seat_number': self.seat_number,
             'status': self.status,
+            'version': self.version,
             'created_at': {
                 'date': self.created_at.strftime('%Y-%m-%d'),
                 'time': self.created_at.strftime('%H:%M:%S')
@@ -239,9 +326,10 @@ class Booking(db.Model):
         return f"<Booking(id={self.id}, bus_id={self.bus_id}, name='{self.name}', idNumber='{self.idNumber}', phoneNumber='{self.phoneNumber}', seat_number={self.seat_number}, status='{self.status}', ticket='{self.ticket}')>"
 
     def book_seat(self):
-        bus = Bus.query.get(self.bus_id)
-        if bus and bus.seats_available > 0:
-            bus.seats_available -= 1
+        # Outside the bus's version, so a sale never conflicts with an edit of the bus
+        taken = db.session.execute(db.update(Bus).where(Bus.id == self.bus_id, Bus.seats_available > 0).values(
+            seats_available=Bus.seats_available - 1, updated_at=Bus.updated_at, sync_xid=Bus.sync_xid)).rowcount
+        if taken:
             db.session.add(self)
             db.session.commit()
         else:
@@ -256,6 +344,16 @@ class Review(db.Model):
     rating = db.Column(db.Integer, nullable=False)  # '1-5'
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    submission_id = db.Column(db.String(32), nullable=True)
+
+    # Keyset pages newest first, overall or within a rating; full-text search indexes are after RatingSummary
+    __table_args__ = (
+        db.UniqueConstraint('submission_id', name='uq_reviews_submission_id'),
+        # rating_summary only has columns for 1 to 5 stars
+        db.CheckConstraint('rating BETWEEN 1 AND 5', name='ck_reviews_rating'),
+        db.Index('ix_reviews_created_at_id', 'created_at', 'id'),
+        db.Index('ix_reviews_rating_created_at_id', 'rating', 'created_at', 'id'),
+    )
 
     def to_dict(self):
         return {
@@ -277,19 +375,143 @@ class Review(db.Model):
     def __repr__(self):
         return f"<Review(id={self.id}, name='{self.name}', email='{self.email}', review='{self.review}', rating={self.rating})>"
 
+# Totals over every review, kept current by the triggers below; a single row with id 1
+class RatingSummary(db.Model):
+    __tablename__ = 'rating_summary'
+    id = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    stars_1 = db.Column(db.Integer, nullable=False, default=0)
+    stars_2 = db.Column(db.Integer, nullable=False, default=0)
+    stars_3 = db.Column(db.Integer, nullable=False, default=0)
+    stars_4 = db.Column(db.Integer, nullable=False, default=0)
+    stars_5 = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'average': round(self.total / self.count, 2) if self.count else None,
+            'histogram': {str(stars): getattr(self, f'stars_{stars}') for stars in range(1, 6)}
+        }
+
+    def __repr__(self):
+        return f"<RatingSummary(count={self.count}, total={self.total})>"
+
+
+# Triggers and search indexes live with their tables rather than with ratings.py and search.py,
+# so every create_all builds them, seed.py and the benchmarks included
+RATING_SUMMARY_ID = 1
+
+
+def summary_changes(sign, row, cast=''):
+    # SET clause adding (or removing) one review's rating
+    return ', '.join([f'count = count {sign} 1', f'total = total {sign} {row}.rating'] +
+                     [f'stars_{stars} = stars_{stars} {sign} ({row}.rating = {stars}){cast}' for stars in range(1, 6)])
+
+
+# Only inserts create the row, so emptying both tables in any order leaves nothing behind
+ENSURE_ROW = (f'INSERT INTO rating_summary (id, count, total, stars_1, stars_2, stars_3, stars_4, stars_5) '
+              f'VALUES ({RATING_SUMMARY_ID}, 0, 0, 0, 0, 0, 0, 0) ON CONFLICT DO NOTHING')
+
+SQLITE_TRIGGERS = [
+    f"""CREATE TRIGGER reviews_summary_insert AFTER INSERT ON reviews BEGIN
+        {ENSURE_ROW};
+        UPDATE rating_summary SET {summary_changes('+', 'NEW')} WHERE id = {RATING_SUMMARY_ID};
+    END""",
+    f"""CREATE TRIGGER reviews_summary_delete AFTER DELETE ON reviews BEGIN
+        UPDATE rating_summary SET {summary_changes('-', 'OLD')} WHERE id = {RATING_SUMMARY_ID};
+    END""",
+    f"""CREATE TRIGGER reviews_summary_update AFTER UPDATE OF rating ON reviews BEGIN
+        UPDATE rating_summary SET {summary_changes('-', 'OLD')} WHERE id = {RATING_SUMMARY_ID};
+        UPDATE rating_summary SET {summary_changes('+', 'NEW')} WHERE id = {RATING_SUMMARY_ID};
+    END"""
+]
+
+POSTGRESQL_TRIGGERS = [
+    f"""CREATE OR REPLACE FUNCTION reviews_summary() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE rating_summary SET {summary_changes('-', 'OLD', '::int')} WHERE id = {RATING_SUMMARY_ID};
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            {ENSURE_ROW};
+            UPDATE rating_summary SET {summary_changes('+', 'NEW', '::int')} WHERE id = {RATING_SUMMARY_ID};
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    """CREATE TRIGGER reviews_summary AFTER INSERT OR DELETE OR UPDATE OF rating ON reviews
+    FOR EACH ROW EXECUTE FUNCTION reviews_summary()"""
+]
+
+for statement in SQLITE_TRIGGERS:
+    event.listen(Review.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+for statement in POSTGRESQL_TRIGGERS:
+    event.listen(Review.__table__, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+
+
+def search_statements(table, column):
+    fts = f'{table}_fts'
+    return [
+        # Porter stemming, like the english text search configuration
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({column}, content='{table}', content_rowid='id', "
+        f"tokenize='porter unicode61')",
+        f"""CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts} (rowid, {column}) VALUES (NEW.id, NEW.{column});
+        END""",
+        f"""CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {column}) VALUES ('delete', OLD.id, OLD.{column});
+        END""",
+        f"""CREATE TRIGGER {fts}_update AFTER UPDATE OF {column} ON {table} BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {column}) VALUES ('delete', OLD.id, OLD.{column});
+            INSERT INTO {fts} (rowid, {column}) VALUES (NEW.id, NEW.{column});
+        END"""
+    ]
+
+
+for model, column in [(Review, 'review'), (ContactUs, 'message')]:
+    table = model.__tablename__
+    event.listen(model.__table__, 'after_create', DDL(
+        f"CREATE INDEX ix_{table}_{column}_search ON {table} USING gin (to_tsvector('english', {column}))")
+        .execute_if(dialect='postgresql'))
+    for statement in search_statements(table, column):
+        event.listen(model.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+    # The FTS table isn't in the metadata, so it would outlive drop_all
+    event.listen(model.__table__, 'after_drop', DDL(f'DROP TABLE IF EXISTS {table}_fts').execute_if(dialect='sqlite'))
+
+
 class Route(db.Model):
     __tablename__ = 'routes'
     id = db.Column(db.Integer, primary_key=True)
     route_name = db.Column(db.String(100), nullable=False)
     departure_from = db.Column(db.String(100), nullable=False)
     departure_to = db.Column(db.String(100), nullable=False)
+    departure_from_id = db.Column(db.Integer, db.ForeignKey('stops.id'), nullable=True)
+    departure_to_id = db.Column(db.Integer, db.ForeignKey('stops.id'), nullable=True)
+    version = db.Column(db.Integer, nullable=False, server_default='1')
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
+    sync_xid = db.Column(db.BigInteger, default=current_xid(), onupdate=current_xid())
+
+    __mapper_args__ = {'version_id_col': version}
+    __table_args__ = (
+        db.Index('ix_routes_updated_at', 'updated_at'),
+        db.Index('ix_routes_sync_xid', 'sync_xid'),
+    )
+
+    #Relationships
+    origin = db.relationship('Stop', foreign_keys=[departure_from_id], lazy=True)
+    destination = db.relationship('Stop', foreign_keys=[departure_to_id], lazy=True)
+
     def to_dict(self):
         return {
             'id': self.id,
             'route_name': self.route_name,
+            'departure_from_id': self.departure_from_id,
+            'departure_to_id': self.departure_to_id,
+            'version': self.version,
             'created_at': {
                 'date': self.created_at.strftime('%Y-%m-%d'),
                 'time': self.created_at.strftime('%H:%M:%S')
@@ -302,3 +524,303 @@ class Route(db.Model):
 
     def __repr__(self):
         return f"<Route(id={self.id}, route_name='{self.route_name}, departure_from={self.departure_from}, departure_to={self.departure_to}')>"
+
+class Schedule(db.Model):
+    __tablename__ = 'schedules'
+    id = db.Column(db.Integer, primary_key=True)
+    route_id = db.Column(db.Integer, db.ForeignKey('routes.id'), nullable=False)
+    driver_id = db.Column(db.Integer, db.ForeignKey('drivers.id'), nullable=False)
+    number_plate = db.Column(db.String(20), nullable=False)
+    number_of_seats = db.Column(db.Integer, nullable=False)
+    days_of_week = db.Column(db.String(7), nullable=False, default='1111111')  # Monday first, '1' runs that day
+    departure_time = db.Column(db.Time, nullable=False)
+    arrival_time = db.Column(db.Time, nullable=False)  # earlier than departure_time means next day
+    price_per_seat = db.Column(db.Numeric, nullable=False)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=True)
+    generated_until = db.Column(db.Date, nullable=True)
+    active = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+    #Relationships
+    route = db.relationship('Route', backref='schedules', lazy=True)
+    buses = db.relationship('Bus', backref='schedule', lazy=True)
+
+    def runs_on(self, day):
+        return self.days_of_week[day.weekday()] == '1'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'route_id': self.route_id,
+            'driver_id': self.driver_id,
+            'number_plate': self.number_plate,
+            'number_of_seats': self.number_of_seats,
+            'days_of_week': self.days_of_week,
+            'departure_time': self.departure_time.strftime('%H:%M:%S'),
+            'arrival_time': self.arrival_time.strftime('%H:%M:%S'),
+            'price_per_seat': str(self.price_per_seat),
+            'start_date': self.start_date.isoformat(),
+            'end_date': self.end_date.isoformat() if self.end_date else None,
+            'generated_until': self.generated_until.isoformat() if self.generated_until else None,
+            'active': self.active
+        }
+
+    def __repr__(self):
+        return f"<Schedule(id={self.id}, route_id={self.route_id}, number_plate='{self.number_plate}', days_of_week='{self.days_of_week}', departure_time='{self.departure_time}')>"
+
+class Stop(db.Model):
+    __tablename__ = 'stops'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    __table_args__ = (
+        # 'Nairobi' and 'nairobi' are one stop
+        db.Index('uq_stops_lower_name', func.lower(name), unique=True),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name
+        }
+
+    def __repr__(self):
+        return f"<Stop(id={self.id}, name='{self.name}')>"
+
+class RevokedTicket(db.Model):
+    __tablename__ = 'revoked_tickets'
+    id = db.Column(db.Integer, primary_key=True)
+    ticket = db.Column(db.String(6), nullable=False)
+    bus_id = db.Column(db.Integer, nullable=False)
+    revoked_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        db.Index('ix_revoked_tickets_bus_id', 'bus_id'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'ticket': self.ticket,
+            'bus_id': self.bus_id,
+            'revoked_at': self.revoked_at.isoformat() if self.revoked_at else None
+        }
+
+    def __repr__(self):
+        return f"<RevokedTicket(id={self.id}, ticket='{self.ticket}', bus_id={self.bus_id})>"
+
+# Hard deletes from the tables /sync serves, so clients can drop rows they hold
+class Tombstone(db.Model):
+    __tablename__ = 'tombstones'
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(50), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    sync_xid = db.Column(db.BigInteger, default=current_xid())
+
+    __table_args__ = (
+        db.Index('ix_tombstones_table_name_deleted_at', 'table_name', 'deleted_at'),
+        db.Index('ix_tombstones_table_name_sync_xid', 'table_name', 'sync_xid'),
+    )
+
+    def __repr__(self):
+        return f"<Tombstone(id={self.id}, table_name='{self.table_name}', row_id={self.row_id})>"
+
+# One row: the newest transaction whose tombstones were pruned; older sync cursors have missed deletes
+class SyncHorizon(db.Model):
+    __tablename__ = 'sync_horizon'
+    id = db.Column(db.Integer, primary_key=True)
+    pruned_xid = db.Column(db.BigInteger, nullable=False)
+
+# Booking and bus changes waiting for outbox.py's relays, written in the mutation's transaction
+class OutboxEvent(db.Model):
+    __tablename__ = 'outbox_events'
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(50), nullable=False)  # 'booking.created', 'bus.updated', ...
+    aggregate_id = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'topic': self.topic,
+            'aggregate_id': self.aggregate_id,
+            'payload': self.payload,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f"<OutboxEvent(id={self.id}, topic='{self.topic}', aggregate_id={self.aggregate_id})>"
+
+# How far each relay has published; events up to `position` are delivered
+class OutboxCheckpoint(db.Model):
+    __tablename__ = 'outbox_checkpoints'
+    sink = db.Column(db.String(50), primary_key=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f"<OutboxCheckpoint(sink='{self.sink}', position={self.position})>"
+
+# Token bucket for a rate every process shares, e.g. a notification provider's messages per second
+class RateBucket(db.Model):
+    __tablename__ = 'rate_buckets'
+    name = db.Column(db.String(50), primary_key=True)
+    tokens = db.Column(db.Float, nullable=False)
+    # Seconds since the epoch
+    refilled = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f"<RateBucket(name='{self.name}', tokens={self.tokens})>"
+
+# Departed trips moved out of the live tables by archive.py. On PostgreSQL both tables are
+# range partitioned by departure month; the archiver creates partitions as it needs them.
+class BusArchive(db.Model):
+    __tablename__ = 'buses_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    departure_time = db.Column(db.DateTime, primary_key=True)
+    driver_id = db.Column(db.Integer, nullable=False)
+    schedule_id = db.Column(db.Integer, nullable=True)
+    number_plate = db.Column(db.String(20), nullable=False)
+    number_of_seats = db.Column(db.Integer, nullable=False)
+    seats_available = db.Column(db.Integer, nullable=False)
+    departure_from = db.Column(db.String(20), nullable=False)
+    departure_to = db.Column(db.String(20), nullable=False)
+    departure_from_id = db.Column(db.Integer, nullable=True)
+    departure_to_id = db.Column(db.Integer, nullable=True)
+    arrival_time = db.Column(db.DateTime, nullable=False)
+    price_per_seat = db.Column(db.Numeric, nullable=False)
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, server_default=func.now())
+
+    __table_args__ = (
+        db.Index('ix_buses_archive_driver_id_departure_time', 'driver_id', 'departure_time'),
+        {'postgresql_partition_by': 'RANGE (departure_time)'},
+    )
+
+    def to_dict(self):
+        return {**Bus.to_dict(self), 'archived': True}
+
+    def __repr__(self):
+        return f"<BusArchive(id={self.id}, number_plate='{self.number_plate}', departure_time='{self.departure_time}')>"
+
+class BookingArchive(db.Model):
+    __tablename__ = 'bookings_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    # Copied from the bus so bookings partition the same way
+    departure_time = db.Column(db.DateTime, primary_key=True)
+    bus_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=True)
+    seat_number = db.Column(db.String, nullable=False)
+    status = db.Column(db.String(50), nullable=False)
+    name = db.Column(db.String(80), nullable=False)
+    idNumber = db.Column(db.String(20), nullable=False)
+    phoneNumber = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    ticket = db.Column(db.String(6), nullable=False)
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+    archived_at = db.Column(db.DateTime, server_default=func.now())
+
+    __table_args__ = (
+        db.Index('ix_bookings_archive_bus_id', 'bus_id'),
+        db.Index('ix_bookings_archive_phoneNumber', 'phoneNumber'),
+        db.Index('ix_bookings_archive_idNumber', 'idNumber'),
+        db.Index('ix_bookings_archive_user_id', 'user_id'),
+        db.Index('ix_bookings_archive_ticket', 'ticket'),
+        {'postgresql_partition_by': 'RANGE (departure_time)'},
+    )
+
+    def to_dict(self):
+        return {**Booking.to_dict(self), 'archived': True}
+
+    def __repr__(self):
+        return f"<BookingArchive(id={self.id}, bus_id={self.bus_id}, ticket='{self.ticket}')>"
+
+# Deferred work for jobs.py; workers claim due rows in batches
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    # While a job waits, enqueueing another with the same key is a no-op
+    key = db.Column(db.String(100), nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'running', 'done', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False)
+    locked_by = db.Column(db.String(36), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('key', name='uq_jobs_key'),
+        db.Index('ix_jobs_status_run_at', 'status', 'run_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'payload': self.payload,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_at': self.run_at.isoformat() if self.run_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def __repr__(self):
+        return f"<Job(id={self.id}, kind='{self.kind}', status='{self.status}', attempts={self.attempts})>"
+
+# Outgoing SMS and email, sent in batches by notifications.py
+class Notification(db.Model):
+    __tablename__ = 'notifications'
+    id = db.Column(db.Integer, primary_key=True)
+    channel = db.Column(db.String(20), nullable=False)  # 'sms', 'email'
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(120), nullable=True)
+    body = db.Column(db.Text, nullable=False)
+    bus_id = db.Column(db.Integer, nullable=True)
+    # Sending the same message twice is a no-op, e.g. one delay notice per phone number
+    dedupe_key = db.Column(db.String(150), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'sending', 'sent', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    provider_id = db.Column(db.String(100), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('dedupe_key', name='uq_notifications_dedupe_key'),
+        db.Index('ix_notifications_channel_status', 'channel', 'status'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'channel': self.channel,
+            'recipient': self.recipient,
+            'subject': self.subject,
+            'body': self.body,
+            'bus_id': self.bus_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'provider_id': self.provider_id,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
+
+    def __repr__(self):
+        return f"<Notification(id={self.id}, channel='{self.channel}', recipient='{self.recipient}', status='{self.status}')>"
@@ -0,0 +1,218 @@
+# notifications.py
+import hashlib, logging, threading, time, uuid
+from datetime import timedelta
+from sqlalchemy import and_, or_, select, update
+from models import db, Booking, User, Notification, RateBucket
+from bulk import insert_ignore
+from jobs import enqueue, job, utcnow
+
+# Rows sent per gateway call unless the gateway says otherwise
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 5
+# A dispatch job sends for this long, then hands over to a fresh job
+DISPATCH_BUDGET = 10
+# Claimed rows whose dispatcher died are sent again after this long
+CLAIM_TIMEOUT = timedelta(minutes=5)
+# Failed sends wait this long before the next attempt
+RETRY_DELAY = timedelta(seconds=30)
+DEFAULT_RATE_LIMITS = {'sms': 30, 'email': 10}  # messages per second
+
+logger = logging.getLogger(__name__)
+
+
+class FakeGateway:
+    """Keeps sent messages in memory; `fail` makes sends to those recipients fail."""
+
+    batch_size = BATCH_SIZE
+
+    def __init__(self, fail=()):
+        self.sent = []
+        self.calls = 0
+        self.fail = set(fail)
+        self.lock = threading.Lock()
+
+    def send_batch(self, messages):
+        # -> [(notification id, provider id or None, error or None)]
+        results = []
+        with self.lock:
+            self.calls += 1
+            for message in messages:
+                if message.recipient in self.fail:
+                    results.append((message.id, None, 'Recipient rejected'))
+                else:
+                    self.sent.append(message)
+                    results.append((message.id, f'fake-{uuid.uuid4().hex[:12]}', None))
+        return results
+
+
+class LogGateway(FakeGateway):
+    """Logs messages instead of sending them, for development."""
+
+    def send_batch(self, messages):
+        for message in messages:
+            logger.info('%s to %s: %s', message.channel, message.recipient, message.body)
+        return super().send_batch(messages)
+
+
+GATEWAYS = {'fake': FakeGateway, 'log': LogGateway}
+
+
+class RateLimit:
+    """Token bucket in the database, shared by every dispatcher in every worker process."""
+
+    def __init__(self, name, rate):
+        self.name = name
+        self.rate = rate
+
+    def acquire(self, count):
+        bucket = db.session.get(RateBucket, self.name, with_for_update=True)
+        if bucket is None:
+            insert_ignore(RateBucket.__table__, [{'name': self.name, 'tokens': self.rate, 'refilled': time.time()}])
+            bucket = db.session.get(RateBucket, self.name, with_for_update=True, populate_existing=True)
+        now = time.time()
+        # Tokens go negative: each caller reserves its share, then waits out the debt it leaves
+        bucket.tokens = min(self.rate, bucket.tokens + max(now - bucket.refilled, 0) * self.rate) - count
+        bucket.refilled = now
+        debt = -bucket.tokens
+        # The row lock lasts for the reservation only, not the wait
+        db.session.commit()
+        if debt > 0:
+            time.sleep(debt / self.rate)
+
+
+class Notifier:
+    def __init__(self, app=None):
+        self.gateways = {}
+        self.limits = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # Gateway names per channel, or gateway instances set directly (e.g. a FakeGateway in tests)
+        app.config.setdefault('NOTIFICATION_GATEWAYS', {'sms': 'log', 'email': 'log'})
+        app.config.setdefault('NOTIFICATION_RATE_LIMITS', {})
+        for channel, gateway in app.config['NOTIFICATION_GATEWAYS'].items():
+            self.gateways[channel] = GATEWAYS[gateway]() if isinstance(gateway, str) else gateway
+        rates = dict(DEFAULT_RATE_LIMITS, **app.config['NOTIFICATION_RATE_LIMITS'])
+        self.limits = {channel: RateLimit(f'notifications:{channel}', rate) for channel, rate in rates.items()}
+
+    def gateway(self, channel):
+        return self.gateways[channel]
+
+
+notifier = Notifier()
+
+
+def queue(rows):
+    """Adds notifications to the caller's transaction, skipping already queued dedupe keys."""
+    if not rows:
+        return
+    created = utcnow()
+    insert_ignore(Notification.__table__, [dict(row, status='pending', attempts=0, created_at=created)
+                                           for row in rows])
+    for channel in {row['channel'] for row in rows}:
+        enqueue('dispatch_notifications', {'channel': channel}, key=f'dispatch_notifications:{channel}')
+
+
+def ticket_message(booking, bus):
+    return (f"TransiteWise ticket {booking.ticket}: seat {booking.seat_number} on {bus.number_plate}, "
+            f"{bus.departure_from} to {bus.departure_to}, departs {bus.departure_time:%d %b %H:%M}.")
+
+
+def notify_tickets(bookings, bus):
+    """Queues the ticket SMS, and an email for bookings made from an account."""
+    emails = {}
+    user_ids = {booking.user_id for booking in bookings if booking.user_id}
+    if user_ids:
+        emails = dict(db.session.query(User.id, User.email).filter(User.id.in_(user_ids)))
+    rows = []
+    for booking in bookings:
+        body = ticket_message(booking, bus)
+        rows.append({'channel': 'sms', 'recipient': booking.phoneNumber, 'body': body, 'bus_id': bus.id,
+                     'dedupe_key': f'ticket:{booking.ticket}:sms'})
+        if emails.get(booking.user_id):
+            rows.append({'channel': 'email', 'recipient': emails[booking.user_id], 'subject': 'Your ticket',
+                         'body': body, 'bus_id': bus.id, 'dedupe_key': f'ticket:{booking.ticket}:email'})
+    queue(rows)
+
+
+def announce(bus, message):
+    """Fans a notice out to every passenger of a bus from one manifest query. Returns the number queued."""
+    digest = hashlib.sha1(message.encode()).hexdigest()[:12]
+    passengers = db.session.query(Booking.phoneNumber, User.email) \
+        .outerjoin(User, Booking.user_id == User.id) \
+        .filter(Booking.bus_id == bus.id, Booking.status != 'cancelled')
+    rows = {}
+    # Keyed by recipient, so a phone with several seats gets one message
+    for phone, email in passengers:
+        key = f'announcement:{bus.id}:{digest}:sms:{phone}'
+        rows[key] = {'channel': 'sms', 'recipient': phone, 'body': message, 'bus_id': bus.id, 'dedupe_key': key}
+        if email:
+            key = f'announcement:{bus.id}:{digest}:email:{email}'
+            rows[key] = {'channel': 'email', 'recipient': email, 'subject': f'Update on {bus.number_plate}',
+                         'body': message, 'bus_id': bus.id, 'dedupe_key': key}
+    queue(list(rows.values()))
+    return len(rows)
+
+
+def claim(channel, limit):
+    current = utcnow()
+    due = and_(Notification.channel == channel,
+               or_(and_(Notification.status == 'pending',
+                        or_(Notification.claimed_at.is_(None), Notification.claimed_at < current - RETRY_DELAY)),
+                   and_(Notification.status == 'sending', Notification.claimed_at < current - CLAIM_TIMEOUT)))
+    ids = db.session.scalars(select(Notification.id).where(due).order_by(Notification.id).limit(limit)
+                             .with_for_update(skip_locked=True)).all()
+    if not ids:
+        return []
+    db.session.execute(update(Notification).where(Notification.id.in_(ids), due)
+                       .values(status='sending', claimed_at=current, attempts=Notification.attempts + 1),
+                       execution_options={'synchronize_session': False})
+    # Plain rows, so gateways can read them after the commit without a refresh per message
+    claimed = db.session.execute(select(Notification.id, Notification.channel, Notification.recipient,
+                                        Notification.subject, Notification.body, Notification.attempts)
+                                 .where(Notification.id.in_(ids), Notification.status == 'sending',
+                                        Notification.claimed_at == current)).all()
+    db.session.commit()
+    return claimed
+
+
+def record(claimed, results):
+    current = utcnow()
+    attempts = {message.id: message.attempts for message in claimed}
+    sent = {id: provider_id for id, provider_id, error in results if error is None}
+    if sent:
+        db.session.execute(update(Notification), [
+            {'id': id, 'status': 'sent', 'provider_id': provider_id, 'sent_at': current, 'last_error': None}
+            for id, provider_id in sent.items()])
+    failed = [(id, error) for id, _, error in results if error is not None]
+    if failed:
+        db.session.execute(update(Notification), [
+            {'id': id, 'status': 'failed' if attempts[id] >= MAX_ATTEMPTS else 'pending', 'last_error': error}
+            for id, error in failed])
+    db.session.commit()
+    return len(failed)
+
+
+@job('dispatch_notifications')
+def dispatch_notifications(channel):
+    gateway = notifier.gateway(channel)
+    limit = notifier.limits.get(channel)
+    deadline = time.monotonic() + DISPATCH_BUDGET
+    while time.monotonic() < deadline:
+        claimed = claim(channel, gateway.batch_size)
+        if not claimed:
+            return
+        if limit:
+            limit.acquire(len(claimed))
+        try:
+            results = gateway.send_batch(claimed)
+        except Exception as e:
+            results = [(message.id, None, f'{type(e).__name__}: {e}') for message in claimed]
+        if record(claimed, results):
+            # Failed rows go back to pending and are picked up by this retry once RETRY_DELAY has passed.
+            # Claims skip them until then, so messages to other recipients keep going out
+            enqueue('dispatch_notifications', {'channel': channel}, key=f'dispatch_notifications:{channel}:retry',
+                    delay=RETRY_DELAY.total_seconds())
+            db.session.commit()
+    enqueue('dispatch_notifications', {'channel': channel}, key=f'dispatch_notifications:{channel}')
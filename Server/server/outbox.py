@@ -0,0 +1,261 @@
+# outbox.py
+"""Booking and bus changes for downstream systems, through a transactional outbox.
+
+A flush that creates, changes or deletes a booking or a bus writes an
+OutboxEvent in the same transaction, so an event exists exactly when the change
+committed. Nothing is recorded unless the outbox is enabled, since without a
+relay no checkpoint ever moves and no event could be purged. Relays tail the table in id order and publish batches to a sink,
+saving their position after each batch: a crash between the two sends the
+batch again (at-least-once), so consumers dedupe on the event id.
+"""
+import json, os, threading, time
+from collections import deque
+from datetime import timedelta
+from sqlalchemy import delete, event, func, inspect, insert
+from sqlalchemy.orm import Session
+from models import db, Booking, Bus, OutboxEvent, OutboxCheckpoint
+from events import hub
+from jobs import utcnow
+
+BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 500))
+NDJSON_PATH = os.getenv('OUTBOX_NDJSON_PATH', 'outbox.ndjson')
+# An id missing this long belongs to a transaction that rolled back, not one still committing
+GAP_TIMEOUT = float(os.getenv('OUTBOX_GAP_TIMEOUT', 10))
+# Events every sink has passed are deleted after this long
+RETENTION = timedelta(days=int(os.getenv('OUTBOX_RETENTION_DAYS', 7)))
+PURGE_EVERY = 300
+# Seconds of history behind events_per_sec
+RATE_WINDOW = 60
+# Counters and bookkeeping columns that change on their own; not news downstream
+QUIET_COLUMNS = {'seats_available', 'version', 'updated_at'}
+
+
+class NdjsonSink:
+    """Appends one JSON object per line to a file, synced to disk before the checkpoint moves."""
+
+    def __init__(self, path=NDJSON_PATH):
+        self.path = path
+
+    def publish(self, events):
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.writelines(json.dumps(outbox_event, separators=(',', ':')) + '\n' for outbox_event in events)
+            file.flush()
+            os.fsync(file.fileno())
+
+
+class HubSink:
+    """Publishes each event on its topic's channel of the event hub: in process, or Redis when configured."""
+
+    def __init__(self, prefix='outbox.'):
+        self.prefix = prefix
+
+    def publish(self, events):
+        for outbox_event in events:
+            hub.publish(self.prefix + outbox_event['topic'], outbox_event)
+
+
+class MemorySink:
+    """Keeps published events in memory; `fail` makes publishing raise, as a broker outage would."""
+
+    def __init__(self):
+        self.events = []
+        self.fail = False
+
+    def publish(self, events):
+        if self.fail:
+            raise ConnectionError('Sink unavailable')
+        self.events.extend(events)
+
+
+SINKS = {'ndjson': NdjsonSink, 'hub': HubSink, 'memory': MemorySink}
+
+
+def changed_columns(obj):
+    state = inspect(obj)
+    return {attr.key for attr in state.mapper.column_attrs if state.attrs[attr.key].history.has_changes()}
+
+
+def topic(obj, session):
+    kind = 'booking' if isinstance(obj, Booking) else 'bus'
+    if obj in session.new:
+        return f'{kind}.created'
+    if obj in session.deleted:
+        return f'{kind}.deleted'
+    changed = changed_columns(obj)
+    if kind == 'booking' and 'status' in changed and obj.status == 'cancelled':
+        return 'booking.cancelled'
+    return f'{kind}.updated' if changed - QUIET_COLUMNS else None
+
+
+def record(topic, obj):
+    """Adds an event to the caller's transaction, for changes made with Core statements rather than a flush."""
+    if not outbox.enabled:
+        return
+    db.session.add(OutboxEvent(topic=topic, aggregate_id=obj.id, payload=obj.to_dict(), created_at=utcnow()))
+
+
+@event.listens_for(Session, 'after_flush')
+def record_changes(session, flush_context):
+    if not outbox.enabled:
+        return
+    # Ids are assigned by now; the rows go in on the flush's own connection and transaction
+    created = utcnow()
+    rows = []
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        name = topic(obj, session) if isinstance(obj, (Booking, Bus)) else None
+        if name:
+            rows.append({'topic': name, 'aggregate_id': obj.id, 'payload': obj.to_dict(), 'created_at': created})
+    if rows:
+        session.connection().execute(insert(OutboxEvent.__table__), rows)
+
+
+class Relay:
+    """Moves events from the outbox to one sink, from where its checkpoint says it got to."""
+
+    def __init__(self, app, name, sink, batch_size=BATCH_SIZE):
+        self.app = app
+        self.name = name
+        self.sink = sink
+        self.batch_size = batch_size
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+        # id -> when it was first seen missing
+        self.gaps = {}
+        self.batches = deque()
+        self.stats = {'delivered': 0, 'batches': 0, 'failures': 0, 'last_error': None, 'publish_seconds': 0.0}
+
+    def deliverable(self, position, events):
+        # Events after an id that may still commit would be delivered out of order, or the id skipped
+        now = time.monotonic()
+        expected, ready = position + 1, []
+        for outbox_event in events:
+            missing = range(expected, outbox_event.id)
+            if any(now - self.gaps.setdefault(id, now) < GAP_TIMEOUT for id in missing):
+                break
+            for id in missing:
+                self.gaps.pop(id, None)
+            ready.append(outbox_event)
+            expected = outbox_event.id + 1
+        return ready
+
+    def run_once(self):
+        """Publishes one batch; returns how many events were delivered."""
+        with self.app.app_context():
+            try:
+                # The row lock keeps a second relay for the same sink (another worker) waiting
+                checkpoint = db.session.get(OutboxCheckpoint, self.name, with_for_update=True)
+                if checkpoint is None:
+                    checkpoint = OutboxCheckpoint(sink=self.name, position=0)
+                    db.session.add(checkpoint)
+                events = self.deliverable(checkpoint.position, OutboxEvent.query
+                                          .filter(OutboxEvent.id > checkpoint.position)
+                                          .order_by(OutboxEvent.id).limit(self.batch_size).all())
+                if events:
+                    started = time.monotonic()
+                    self.sink.publish([outbox_event.to_dict() for outbox_event in events])
+                    self.record(len(events), time.monotonic() - started)
+                    checkpoint.position = events[-1].id
+                    checkpoint.updated_at = utcnow()
+                db.session.commit()
+                return len(events)
+            except Exception as e:
+                db.session.rollback()
+                with self.lock:
+                    self.stats['failures'] += 1
+                    self.stats['last_error'] = f'{type(e).__name__}: {e}'
+                raise
+            finally:
+                db.session.remove()
+
+    def record(self, count, seconds):
+        with self.lock:
+            now = time.monotonic()
+            self.batches.append((now, count))
+            while self.batches and self.batches[0][0] < now - RATE_WINDOW:
+                self.batches.popleft()
+            self.stats['delivered'] += count
+            self.stats['batches'] += 1
+            self.stats['publish_seconds'] += seconds
+
+    def run(self, interval):
+        while not self.stopped.is_set():
+            try:
+                if self.run_once() < self.batch_size:
+                    self.stopped.wait(interval)
+            except Exception:
+                self.app.logger.exception('Outbox relay %s failed', self.name)
+                self.stopped.wait(interval)
+
+    def start(self, interval):
+        thread = threading.Thread(target=self.run, args=(interval,), name=f'outbox-{self.name}', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.stopped.set()
+
+    def metrics(self):
+        with self.lock:
+            now = time.monotonic()
+            recent = sum(count for at, count in self.batches if at >= now - RATE_WINDOW)
+            return {**self.stats, 'publish_seconds': round(self.stats['publish_seconds'], 3),
+                    'events_per_sec': round(recent / RATE_WINDOW, 2)}
+
+
+class Outbox:
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.relays = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # Relay name -> sink name, or a sink instance set directly (e.g. in tests)
+        app.config.setdefault('OUTBOX_SINKS', {'ndjson': 'ndjson'})
+        app.config.setdefault('OUTBOX_ENABLED', False)
+        self.app = app
+        self.enabled = bool(app.config['OUTBOX_ENABLED'])
+        self.relays = {name: Relay(app, name, SINKS[sink]() if isinstance(sink, str) else sink)
+                       for name, sink in app.config['OUTBOX_SINKS'].items()}
+
+    def relay(self, name):
+        return self.relays[name]
+
+    def start(self, interval):
+        threading.Thread(target=self.purge_loop, name='outbox-purge', daemon=True).start()
+        return [relay.start(interval) for relay in self.relays.values()]
+
+    def purge_loop(self):
+        while True:
+            time.sleep(PURGE_EVERY)
+            with self.app.app_context():
+                try:
+                    self.purge()
+                except Exception:
+                    self.app.logger.exception('Purging the outbox failed')
+                finally:
+                    db.session.remove()
+
+    def purge(self):
+        """Deletes old events that every configured sink has been sent."""
+        positions = db.session.query(OutboxCheckpoint.position) \
+            .filter(OutboxCheckpoint.sink.in_(self.relays)).all()
+        if len(positions) < len(self.relays):
+            return 0
+        passed = min(position for position, in positions)
+        before = utcnow() - RETENTION
+        deleted = db.session.execute(delete(OutboxEvent).where(OutboxEvent.id <= passed,
+                                                               OutboxEvent.created_at < before)).rowcount
+        db.session.commit()
+        return deleted
+
+    def metrics(self):
+        latest = db.session.query(func.max(OutboxEvent.id)).scalar() or 0
+        positions = dict(db.session.query(OutboxCheckpoint.sink, OutboxCheckpoint.position))
+        return {name: {**relay.metrics(), 'position': positions.get(name, 0),
+                       'lag': latest - positions.get(name, 0)}
+                for name, relay in self.relays.items()}
+
+
+outbox = Outbox()
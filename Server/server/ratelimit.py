@@ -0,0 +1,201 @@
+# ratelimit.py
+import math, os, threading, time
+from functools import wraps
+from flask import request, jsonify
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_limit(value):
+    # '10/minute' -> (10, 60)
+    count, period = value.split('/')
+    return int(count), PERIODS[period.strip()]
+
+
+def sliding_count(previous, current, now, period):
+    # Previous window weighted by how much of it still overlaps the sliding window
+    return previous * (1 - (now % period) / period) + current
+
+
+def retry_after(previous, count, limit, now, period):
+    remaining = period - now % period
+    if not previous:
+        return math.ceil(remaining)
+    # Time for the previous window's weight to decay below the limit
+    return max(1, math.ceil(min((count - limit + 1) * period / previous, remaining)))
+
+
+class MemoryBackend:
+    """Per-process counters: key -> [window, current count, previous count]."""
+
+    PURGE_EVERY = 10000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.hits = 0
+
+    def hit(self, hits, now):
+        """Counts a request against every (key, limit, period) in hits, or against none if one is full."""
+        with self.lock:
+            entries, rejected, wait = [], False, 0
+            for key, limit, period in hits:
+                window = int(now // period)
+                entry = self.counters.get(key)
+                if entry is None or entry[0] < window - 1:
+                    entry = [window, 0, 0]
+                elif entry[0] == window - 1:
+                    entry = [window, 0, entry[1]]
+                count = sliding_count(entry[2], entry[1], now, period)
+                if count >= limit:
+                    rejected = True
+                    wait = max(wait, retry_after(entry[2], count, limit, now, period))
+                entries.append((key, entry))
+            if rejected:
+                return False, wait
+            for key, entry in entries:
+                entry[1] += 1
+                self.counters[key] = entry
+
+            self.hits += 1
+            if self.hits % self.PURGE_EVERY == 0:
+                self.purge(now)
+        return True, 0
+
+    def purge(self, now):
+        # Entries older than the previous window no longer count towards anything
+        for key in [key for key, entry in self.counters.items()
+                    if entry[0] < int(now // int(key.split(':', 1)[0])) - 1]:
+            del self.counters[key]
+
+
+# Counts the hit only when every limit allows it, in one round trip: rejected requests don't keep a client
+# locked out. KEYS are (current, previous) window pairs and ARGV (weight, limit, expiry) triples, one per limit
+REDIS_HIT = """
+local allowed = 1
+local counts = {}
+for i = 1, #KEYS / 2 do
+    local current = tonumber(redis.call('GET', KEYS[2 * i - 1]) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[2 * i]) or '0')
+    counts[2 * i - 1] = current
+    counts[2 * i] = previous
+    if previous * tonumber(ARGV[3 * i - 2]) + current >= tonumber(ARGV[3 * i - 1]) then
+        allowed = 0
+    end
+end
+if allowed == 1 then
+    for i = 1, #KEYS / 2 do
+        redis.call('INCR', KEYS[2 * i - 1])
+        redis.call('EXPIRE', KEYS[2 * i - 1], ARGV[3 * i])
+    end
+end
+table.insert(counts, 1, allowed)
+return counts
+"""
+
+
+class RedisBackend:
+    """Counters shared by every worker through Redis."""
+
+    def __init__(self, url, prefix='transitewise:ratelimit:'):
+        import redis  # optional dependency, only needed for multi-worker deployments
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.script = self.client.register_script(REDIS_HIT)
+
+    def hit(self, hits, now):
+        keys, args = [], []
+        for key, limit, period in hits:
+            window = int(now // period)
+            keys += [f'{self.prefix}{key}:{window}', f'{self.prefix}{key}:{window - 1}']
+            args += [1 - (now % period) / period, limit, period * 2]
+        allowed, *counts = self.script(keys=keys, args=args)
+        if allowed:
+            return True, 0
+        wait = 0
+        for (key, limit, period), current, previous in zip(hits, counts[::2], counts[1::2]):
+            count = sliding_count(previous, current, now, period)
+            if count >= limit:
+                wait = max(wait, retry_after(previous, count, limit, now, period))
+        return False, wait
+
+
+def client_ip():
+    # Behind a reverse proxy this is the client's address only when TRUSTED_PROXIES is set (see app.py)
+    return request.remote_addr or 'unknown'
+
+
+def client_identity():
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except (JWTExtendedException, PyJWTError):
+        identity = None
+    return f'user:{identity}' if identity is not None else client_ip()
+
+
+def client_phone():
+    data = request.get_json(silent=True) or {}
+    phone = data.get('phoneNumber') or data.get('phone_number')
+    return f'phone:{phone}' if phone else client_ip()
+
+
+KEY_FUNCTIONS = {'ip': client_ip, 'identity': client_identity, 'phone': client_phone}
+
+
+class RateLimiter:
+    def __init__(self, app=None):
+        self.backend = MemoryBackend()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('RATELIMIT_ENABLED', True)
+        app.config.setdefault('RATELIMIT_STORAGE_URL', os.getenv('RATELIMIT_STORAGE_URL'))
+        # Per route overrides, e.g. {'login': '5/minute'}; limits keyed on something
+        # other than the IP are named with the key too, e.g. {'manage_bookings:phone': '5/minute'}
+        app.config.setdefault('RATE_LIMITS', {})
+        if app.config['RATELIMIT_STORAGE_URL']:
+            self.backend = RedisBackend(app.config['RATELIMIT_STORAGE_URL'])
+
+    def limit(self, default, key='ip', methods=None):
+        """Limits a view per client; stack several to limit one view on more than one key.
+
+        Stacked limits are checked together, so a request one of them rejects counts against none.
+        """
+        def decorator(view):
+            # Directly stacked limits merge into one wrapper around the original view
+            target = getattr(view, 'rate_limited_view', view)
+            name = target.__name__ if key == 'ip' else f'{target.__name__}:{key}'
+            limits = [(name, default, KEY_FUNCTIONS[key], methods)] + getattr(view, 'rate_limits', [])
+
+            @wraps(target)
+            def wrapper(*args, **kwargs):
+                if not self.app.config['RATELIMIT_ENABLED']:
+                    return target(*args, **kwargs)
+
+                hits = []
+                for limit_name, limit_default, key_function, limit_methods in limits:
+                    if limit_methods and request.method not in limit_methods:
+                        continue
+                    limit, period = parse_limit(self.app.config['RATE_LIMITS'].get(limit_name, limit_default))
+                    hits.append((f'{period}:{limit_name}:{key_function()}', limit, period))
+                if hits:
+                    allowed, wait = self.backend.hit(hits, time.time())
+                    if not allowed:
+                        response = jsonify({'message': 'Too many requests, try again later'})
+                        response.status_code = 429
+                        response.headers['Retry-After'] = str(wait)
+                        return response
+                return target(*args, **kwargs)
+            wrapper.rate_limits = limits
+            wrapper.rate_limited_view = target
+            return wrapper
+        return decorator
+
+
+limiter = RateLimiter()
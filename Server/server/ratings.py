@@ -0,0 +1,13 @@
+# ratings.py
+"""The rating summary, maintained by triggers on reviews (see models.py).
+
+Every write path (the ORM, write-behind batches, manual SQL) keeps it current,
+so GET /reviews/summary reads one row instead of aggregating the table. The
+migration that adds the triggers backfills the row from the existing reviews.
+"""
+from models import db, RatingSummary, RATING_SUMMARY_ID as SUMMARY_ID
+
+
+def summary():
+    row = db.session.get(RatingSummary, SUMMARY_ID, populate_existing=True)
+    return (row or RatingSummary(count=0, total=0, stars_1=0, stars_2=0, stars_3=0, stars_4=0, stars_5=0)).to_dict()
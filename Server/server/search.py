@@ -0,0 +1,39 @@
+# search.py
+"""Full-text search over review texts and contact messages.
+
+PostgreSQL matches against GIN indexes on to_tsvector('english', ...); SQLite,
+for local runs and tests, uses FTS5 tables kept in step by triggers. Both are
+created along with the tables in models.py. Other databases fall back to an
+unindexed substring match.
+"""
+from sqlalchemy import func, literal_column, text
+from models import db, Review, ContactUs
+
+# kind -> (model, text column)
+SEARCHABLE = {'reviews': (Review, 'review'), 'contact': (ContactUs, 'message')}
+# A literal rather than a bound parameter, so the expression matches the index's
+LANGUAGE = literal_column("'english'")
+
+
+def fts5_query(terms):
+    # Every word as a quoted string: all must appear, and FTS5 operators in the input are taken literally
+    return ' '.join('"' + word.replace('"', '""') + '"' for word in terms.split())
+
+
+def search(kind, terms, limit):
+    """Rows of SEARCHABLE[kind] matching `terms`, best match first."""
+    model, column = SEARCHABLE[kind]
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        vector = func.to_tsvector(LANGUAGE, getattr(model, column))
+        query = func.websearch_to_tsquery(LANGUAGE, terms)
+        return model.query.filter(vector.op('@@')(query)) \
+            .order_by(func.ts_rank(vector, query).desc(), model.id.desc()).limit(limit).all()
+    if dialect == 'sqlite':
+        fts = f'{model.__tablename__}_fts'
+        ids = db.session.execute(text(f'SELECT rowid FROM {fts} WHERE {fts} MATCH :query ORDER BY rank LIMIT :limit'),
+                                 {'query': fts5_query(terms), 'limit': limit}).scalars().all()
+        rows = {row.id: row for row in model.query.filter(model.id.in_(ids))}
+        return [rows[id] for id in ids if id in rows]
+    return model.query.filter(getattr(model, column).contains(terms, autoescape=True)) \
+        .order_by(model.id.desc()).limit(limit).all()
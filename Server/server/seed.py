@@ -1,8 +1,16 @@
+"""Drops and recreates the tables, then fills them with a synthetic, reproducible data set.
+
+    python seed.py                          # 10k bookings
+    python seed.py --bookings 1000000 --seed 7 --start 2024-06-01
+    python seed.py --empty                  # tables only, like before
+"""
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import MetaData
+from sqlalchemy import MetaData, text
 from dotenv import load_dotenv
-import os
+from datetime import datetime, timedelta
+from math import asin, ceil, cos, radians, sin, sqrt
+import argparse, csv, io, os, random, string, time
+from models import db, User, Driver, Stop, Route, Bus, Seat, Booking, Review, bus_routes
 
 load_dotenv()
 
@@ -10,7 +18,37 @@ app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URI')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-db = SQLAlchemy(app)
+db.init_app(app)
+
+# Towns served, with coordinates for travel times and fares
+TOWNS = [
+    ('Nairobi', -1.286, 36.817), ('Mombasa', -4.043, 39.668), ('Kisumu', -0.091, 34.768),
+    ('Nakuru', -0.303, 36.080), ('Eldoret', 0.514, 35.270), ('Thika', -1.033, 37.069),
+    ('Malindi', -3.217, 40.117), ('Kitale', 1.015, 35.006), ('Garissa', -0.453, 39.646),
+    ('Kakamega', 0.282, 34.752), ('Nyeri', -0.420, 36.947), ('Machakos', -1.517, 37.263),
+    ('Meru', 0.047, 37.649), ('Embu', -0.531, 37.450), ('Kericho', -0.368, 35.283),
+    ('Naivasha', -0.717, 36.433), ('Voi', -3.396, 38.556), ('Kisii', -0.681, 34.766),
+    ('Nanyuki', 0.017, 37.074), ('Bungoma', 0.563, 34.561), ('Lamu', -2.272, 40.902),
+    ('Isiolo', 0.354, 37.582), ('Narok', -1.078, 35.860), ('Busia', 0.460, 34.111)
+]
+FIRST_NAMES = ['Wanjiru', 'Kamau', 'Achieng', 'Otieno', 'Njeri', 'Mwangi', 'Akinyi', 'Ochieng', 'Wambui', 'Kiprop',
+               'Chebet', 'Mutua', 'Nyambura', 'Kiplagat', 'Atieno', 'Omondi', 'Wairimu', 'Kibet', 'Moraa', 'Barasa',
+               'Amina', 'Hassan', 'Faith', 'Brian', 'Mercy', 'Kevin', 'Grace', 'Dennis', 'Joy', 'Collins']
+LAST_NAMES = ['Kariuki', 'Odhiambo', 'Mutiso', 'Kimani', 'Wafula', 'Cheruiyot', 'Ndungu', 'Onyango', 'Maina',
+              'Rotich', 'Njoroge', 'Owino', 'Kiprono', 'Muthoni', 'Nyongesa', 'Gitau', 'Okoth', 'Langat', 'Mohamed',
+              'Korir', 'Waweru', 'Juma', 'Kemboi', 'Ouma', 'Githinji']
+REVIEWS = ['Comfortable seats and we left on time.', 'Driver was careful, would travel again.',
+           'Bus was late by an hour.', 'Clean bus but the AC was not working.', 'Booking was quick and easy.',
+           'Too many stops along the way.', 'Friendly crew, smooth ride.', 'Great value for the price.']
+# Matatu, minibus and coach layouts
+CAPACITIES = [14, 33, 49]
+# Average share of seats sold on a departure
+LOAD_FACTOR = 0.75
+CANCELLED = 0.04
+SPEED_KMH = 60
+FARE_PER_KM = 4
+CHUNK = 50000
+
 
 def drop_all_tables():
     # Use the current app's engine to connect to the database
@@ -29,7 +67,242 @@ def create_all_tables():
     db.create_all()
     print("All tables have been created.")
 
+
+def distance_km(a, b):
+    (_, lat1, lon1), (_, lat2, lon2) = a, b
+    lat1, lon1, lat2, lon2 = map(radians, (lat1, lon1, lat2, lon2))
+    h = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    # Roads are roughly a third longer than the great circle
+    return 6371 * 2 * asin(sqrt(h)) * 1.3
+
+
+def plate(index):
+    # KAA 000A, KAA 001A, ... distinct for the first 17 million vehicles
+    number, rest = index % 1000, index // 1000
+    suffix, rest = string.ascii_uppercase[rest % 26], rest // 26
+    second, rest = string.ascii_uppercase[rest % 26], rest // 26
+    return f'K{string.ascii_uppercase[rest % 26]}{second} {number:03d}{suffix}'
+
+
+def ticket(index):
+    # Distinct six character codes for up to 36^6 bookings, scrambled so they don't look sequential
+    alphabet = string.digits + string.ascii_uppercase
+    value = (index * 1299721 + 7) % 36 ** 6
+    code = ''
+    for _ in range(6):
+        value, digit = divmod(value, 36)
+        code += alphabet[digit]
+    return code
+
+
+class Fleet:
+    """Deterministic synthetic data sized around a number of bookings."""
+
+    def __init__(self, bookings, seed=42, days=60, start=None):
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.bookings = bookings
+        self.days = days
+        # Most departures in the past, the rest bookable
+        self.start = (start or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)) \
+            - timedelta(days=days * 3 // 4)
+        self.buses = ceil(bookings / (sum(CAPACITIES) / len(CAPACITIES) * LOAD_FACTOR)) + 1
+        # Each vehicle departs at most every other day, long enough for the longest trip,
+        # so plates and drivers never overlap
+        self.vehicles = max(ceil(self.buses / (days // 2)), min(self.buses, 50))
+        self.users = max(bookings // 10, 10)
+        self.reviews = max(bookings // 50, 10)
+        self.now = start or datetime.now()
+        self.route_list = [(origin, destination) for origin in range(len(TOWNS))
+                           for destination in range(len(TOWNS)) if origin != destination]
+        self.plan = self.plan_departures()
+        self.counts = self.sold()
+
+    def name(self):
+        return f'{self.random.choice(FIRST_NAMES)} {self.random.choice(LAST_NAMES)}'
+
+    def phone(self, index):
+        return f'07{index:08d}'
+
+    def stops(self):
+        for id, (name, _, _) in enumerate(TOWNS, 1):
+            yield (id, name, self.now)
+
+    def routes(self):
+        for id, (origin, destination) in enumerate(self.route_list, 1):
+            yield (id, f'{TOWNS[origin][0]} - {TOWNS[destination][0]}', TOWNS[origin][0], TOWNS[destination][0],
+                   origin + 1, destination + 1, self.now, self.now)
+
+    def drivers(self):
+        for id in range(1, self.vehicles + 1):
+            yield (id, self.name(), f'{20000000 + id}', f'DL{id:07d}', self.phone(id), self.now)
+
+    def users_rows(self):
+        for id in range(1, self.users + 1):
+            yield (id, f'user{id}', f'user{id}@example.com', f'seed-{id:010d}', self.now, self.now)
+
+    def plan_departures(self):
+        # (bus id, vehicle, route index, capacity, departure, arrival, fare) per departure
+        plan = []
+        trips_per_vehicle = ceil(self.buses / self.vehicles)
+        # Nairobi is the hub: half the departures start or end there
+        hub_routes = [index for index, (origin, destination) in enumerate(self.route_list) if 0 in (origin, destination)]
+        for id in range(1, self.buses + 1):
+            vehicle, trip = (id - 1) % self.vehicles, (id - 1) // self.vehicles
+            day = trip * self.days // trips_per_vehicle
+            route = self.random.choice(hub_routes) if self.random.random() < 0.5 \
+                else self.random.randrange(len(self.route_list))
+            origin, destination = self.route_list[route]
+            km = distance_km(TOWNS[origin], TOWNS[destination])
+            departure = self.start + timedelta(days=day, hours=self.random.randint(5, 22),
+                                               minutes=self.random.choice((0, 15, 30, 45)))
+            arrival = departure + timedelta(minutes=int(km / SPEED_KMH * 60) + 30)
+            fare = max(200, round(km * FARE_PER_KM / 50) * 50)
+            plan.append((id, vehicle, route, self.random.choice(CAPACITIES), departure, arrival, fare))
+        return plan
+
+    def sold(self):
+        # Seats sold per bus, adding up to exactly the requested bookings
+        counts = [min(capacity, int(capacity * self.random.uniform(0.5, 1))) for _, _, _, capacity, _, _, _ in self.plan]
+        extra = self.bookings - sum(counts)
+        for index, (_, _, _, capacity, _, _, _) in enumerate(self.plan):
+            if extra == 0:
+                break
+            change = min(capacity - counts[index], extra) if extra > 0 else -min(counts[index], -extra)
+            counts[index] += change
+            extra -= change
+        return counts
+
+    def sales(self, bus_id, capacity, sold):
+        """[(seat number, cancelled)] for a bus.
+
+        Its own generator per bus, so buses, seat maps and bookings agree without keeping every seat in memory.
+        """
+        generator = random.Random(self.seed * 1000003 + bus_id)
+        seats = generator.sample(range(1, capacity + 1), sold)
+        return [(seat, generator.random() < CANCELLED) for seat in seats]
+
+    def departures(self):
+        for (id, vehicle, route, capacity, departure, arrival, fare), sold in zip(self.plan, self.counts):
+            origin, destination = self.route_list[route]
+            active = sum(not cancelled for _, cancelled in self.sales(id, capacity, sold))
+            yield (id, vehicle + 1, plate(vehicle), capacity, capacity - active, TOWNS[origin][0],
+                   TOWNS[destination][0], origin + 1, destination + 1, departure, arrival, fare, 1, self.now, self.now)
+
+    def bus_routes_rows(self):
+        for id, _, route, _, _, _, _ in self.plan:
+            yield (id, route + 1)
+
+    def seats(self):
+        for (id, _, _, capacity, _, _, _), sold in zip(self.plan, self.counts):
+            taken = {seat for seat, cancelled in self.sales(id, capacity, sold) if not cancelled}
+            for number in range(1, capacity + 1):
+                yield (id, str(number), 'booked' if number in taken else 'available', 1)
+
+    def bookings_rows(self):
+        index = 0
+        for (id, _, _, capacity, departure, _, _), sold in zip(self.plan, self.counts):
+            booked_at = departure - timedelta(days=self.random.randint(0, 14))
+            for seat, cancelled in self.sales(id, capacity, sold):
+                index += 1
+                passenger = self.random.randrange(self.users * 5)
+                user_id = passenger + 1 if passenger < self.users and self.random.random() < 0.6 else None
+                yield (index, id, user_id, str(seat), 'cancelled' if cancelled else 'booked', self.name(),
+                       f'{30000000 + passenger}', self.phone(passenger), booked_at, booked_at, ticket(index), 1)
+
+    def reviews_rows(self):
+        for id in range(1, self.reviews + 1):
+            user = self.random.randrange(self.users) + 1
+            rating = self.random.choices((1, 2, 3, 4, 5), weights=(1, 2, 5, 10, 12))[0]
+            created = self.start + timedelta(minutes=self.random.randrange(self.days * 24 * 60))
+            yield (id, self.name(), f'user{user}@example.com', self.random.choice(REVIEWS), rating, created, created)
+
+
+def copy_rows(connection, table, columns, rows):
+    # PostgreSQL COPY, streamed in chunks
+    cursor = connection.connection.cursor()
+    while True:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        count = 0
+        for row in rows:
+            writer.writerow(['\\N' if value is None else value for value in row])
+            count += 1
+            if count == CHUNK:
+                break
+        if not count:
+            return
+        buffer.seek(0)
+        cursor.copy_expert(f'COPY {table.name} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv, NULL \'\\N\')', buffer)
+        if count < CHUNK:
+            return
+
+
+def insert_rows(connection, table, columns, rows):
+    # executemany of multi-row chunks for every other database
+    batch = []
+    for row in rows:
+        batch.append(dict(zip(columns, row)))
+        if len(batch) == CHUNK:
+            connection.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        connection.execute(table.insert(), batch)
+
+
+def load(connection, table, columns, rows):
+    started = time.perf_counter()
+    if connection.dialect.name == 'postgresql':
+        copy_rows(connection, table, columns, rows)
+    else:
+        insert_rows(connection, table, columns, rows)
+    print(f"{table.name}: {time.perf_counter() - started:.1f}s")
+
+
+def seed(bookings, seed=42, days=60, start=None):
+    fleet = Fleet(bookings, seed, days, start)
+    tables = [
+        (Stop.__table__, ['id', 'name', 'created_at'], fleet.stops),
+        (Route.__table__, ['id', 'route_name', 'departure_from', 'departure_to', 'departure_from_id',
+                           'departure_to_id', 'created_at', 'updated_at'], fleet.routes),
+        (Driver.__table__, ['id', 'full_name', 'id_number', 'driving_license', 'phone_number', 'created_at'],
+         fleet.drivers),
+        (User.__table__, ['id', 'username', 'email', 'firebase_uid', 'created_at', 'updated_at'], fleet.users_rows),
+        (Bus.__table__, ['id', 'driver_id', 'number_plate', 'number_of_seats', 'seats_available', 'departure_from',
+                         'departure_to', 'departure_from_id', 'departure_to_id', 'departure_time', 'arrival_time',
+                         'price_per_seat', 'version', 'created_at', 'updated_at'], fleet.departures),
+        (bus_routes, ['bus_id', 'route_id'], fleet.bus_routes_rows),
+        (Seat.__table__, ['bus_id', 'seat_number', 'status', 'version'], fleet.seats),
+        (Booking.__table__, ['id', 'bus_id', 'user_id', 'seat_number', 'status', 'name', 'idNumber', 'phoneNumber',
+                             'created_at', 'updated_at', 'ticket', 'version'], fleet.bookings_rows),
+        (Review.__table__, ['id', 'name', 'email', 'review', 'rating', 'created_at', 'updated_at'],
+         fleet.reviews_rows),
+    ]
+    started = time.perf_counter()
+    with db.engine.begin() as connection:
+        for table, columns, rows in tables:
+            load(connection, table, columns, rows())
+        if connection.dialect.name == 'postgresql':
+            # Explicit ids leave the sequences behind
+            for table, columns, _ in tables:
+                if columns[0] == 'id':
+                    connection.execute(text(f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                                            f"(SELECT COALESCE(MAX(id), 1) FROM {table.name}))"))
+    print(f"Seeded {bookings} bookings on {fleet.buses} departures in {time.perf_counter() - started:.1f}s")
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bookings', type=int, default=10000, help='Number of bookings to generate.')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same data.')
+    parser.add_argument('--days', type=int, default=60, help='Days of departures, three quarters in the past.')
+    parser.add_argument('--start', type=datetime.fromisoformat, default=None,
+                        help='Anchor date (YYYY-MM-DD) instead of today, for identical data on every run.')
+    parser.add_argument('--empty', action='store_true', help='Only recreate the tables.')
+    args = parser.parse_args()
+
     with app.app_context():
         drop_all_tables()
         create_all_tables()
+        if not args.empty:
+            seed(args.bookings, args.seed, args.days, args.start)
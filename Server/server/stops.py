@@ -0,0 +1,145 @@
+# stops.py
+import threading, uuid
+from bisect import bisect_left
+from sqlalchemy import event, func
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from models import db, Stop
+from bulk import bulk_tables, chunked, insert_ignore
+from events import hub
+
+# Stop changes are announced here so every worker drops its index
+CHANNEL = 'stops'
+
+
+def normalize(name):
+    return ' '.join(name.split())
+
+
+def resolve_stop(name):
+    # Matches existing stops case-insensitively so 'nairobi ' reuses 'Nairobi'
+    name = normalize(name or '')
+    if not name:
+        raise ValueError('Stop name is required')
+    query = Stop.query.filter(func.lower(Stop.name) == name.lower())
+    stop = query.first()
+    if stop is None:
+        # The unique index on lower(name) turns a concurrent request's insert of the same stop into a no-op
+        insert_ignore(Stop.__table__, [{'name': name}])
+        stop = query.first()
+    return stop
+
+
+def resolve_stops(names):
+    """Bulk resolve_stop: returns {lowercase name: Stop id}, inserting missing stops."""
+    wanted = {}
+    for name in names:
+        name = normalize(name)
+        wanted.setdefault(name.lower(), name)
+
+    def lookup(keys):
+        found = {}
+        for chunk in chunked(keys):
+            query = db.session.query(func.lower(Stop.name), Stop.id).filter(func.lower(Stop.name).in_(chunk))
+            found.update(query)
+        return found
+
+    ids = lookup(wanted)
+    missing = [key for key in wanted if key not in ids]
+    if missing:
+        insert_ignore(Stop.__table__, [{'name': wanted[key]} for key in missing])
+        ids.update(lookup(missing))
+    return ids
+
+
+class StopIndex:
+    """Sorted (token, stop) entries answering prefix queries with a binary search."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = None
+        # Tells this process's own broadcasts apart from other workers'
+        self.name = uuid.uuid4().hex
+        self.subscription = None
+
+    def init_app(self, app):
+        # Loaded at startup rather than by the first autocomplete request
+        with app.app_context():
+            try:
+                with self.lock:
+                    self.receive()
+                    self.entries = self.load()
+            except SQLAlchemyError:
+                # No stops table until the migrations have run; loaded on first use instead
+                app.logger.info('Stop index not loaded at startup', exc_info=True)
+            finally:
+                db.session.remove()
+
+    def invalidate(self):
+        self.entries = None
+
+    def changed(self):
+        """After stops were committed: drops the index here and in other workers."""
+        self.invalidate()
+        hub.publish(CHANNEL, {'origin': self.name})
+
+    def receive(self):
+        # Called with self.lock held
+        if self.subscription is None or self.subscription.closed:
+            # Not listening until now, or dropped for falling behind: changes may have been missed
+            self.subscription = hub.subscribe(CHANNEL)
+            self.entries = None
+        while (message := self.subscription.get(0)) is not None:
+            if message[1]['origin'] != self.name:
+                self.entries = None
+
+    def load(self):
+        entries = []
+        for id, name in db.session.query(Stop.id, Stop.name):
+            key = name.lower()
+            entries.append((key, id, name))
+            # Later words too, so 'cbd' finds 'Nairobi CBD'
+            for token in key.split()[1:]:
+                entries.append((token, id, name))
+        entries.sort()
+        return entries
+
+    def search(self, prefix, limit=10):
+        with self.lock:
+            self.receive()
+            if self.entries is None:
+                self.entries = self.load()
+            entries = self.entries
+
+        prefix = normalize(prefix).lower()
+        if not prefix:
+            return []
+        results = {}
+        position = bisect_left(entries, (prefix,))
+        while position < len(entries) and len(results) < limit:
+            token, id, name = entries[position]
+            if not token.startswith(prefix):
+                break
+            results.setdefault(id, name)
+            position += 1
+        return [{'id': id, 'name': name} for id, name in results.items()]
+
+
+stop_index = StopIndex()
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_stop_changes(session, flush_context):
+    if any(isinstance(obj, Stop) for obj in list(session.new) + list(session.dirty) + list(session.deleted)):
+        session.info['stops_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def refresh_stop_index(session):
+    if session.info.pop('stops_changed', False) or 'stops' in bulk_tables(session):
+        stop_index.changed()
+
+
+@event.listens_for(Session, 'after_rollback')
+def drop_stop_changes(session):
+    session.info.pop('stops_changed', None)
@@ -0,0 +1,137 @@
+# sync.py
+"""Rows changed since a client's cursor, for offline copies of the timetable and bookings.
+
+On PostgreSQL the cursor is a transaction id. Every synced row records the id of
+the transaction that last wrote it (sync_xid), and a sync serves the rows written
+by transactions below its snapshot's xmin: all of those have finished, and any
+transaction still in flight has a higher id. The cursor is that xmin, so the next
+sync starts exactly where this one stopped, however long a transaction took to
+commit and whatever the workers' clocks say.
+
+SQLite has one writer at a time and is used for development and tests; there the
+cursor is updated_at, served once it is SETTLE old.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, event, insert, literal, select, text, func
+from sqlalchemy.orm import Session
+from models import db, Bus, Booking, Driver, Route, Tombstone, SyncHorizon
+
+SYNCED = {'buses': Bus, 'bookings': Booking, 'drivers': Driver, 'routes': Route}
+# SQLite only: changes younger than this aren't served yet, so a transaction still committing
+# with an earlier updated_at isn't skipped
+SETTLE = timedelta(seconds=float(os.getenv('SYNC_SETTLE_SECONDS', 2)))
+# Tombstones are pruned after this; older cursors have to start over with a full sync
+RETENTION = timedelta(days=int(os.getenv('TOMBSTONE_RETENTION_DAYS', 30)))
+EPOCH = datetime(1970, 1, 1)
+
+
+class CursorExpired(Exception):
+    pass
+
+
+def utcnow():
+    # Stored datetimes are naive UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def to_cursor(value):
+    # Microseconds since the epoch: monotonic, and exact in a JavaScript number
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def from_cursor(cursor):
+    return EPOCH + timedelta(microseconds=int(cursor))
+
+
+def by_transaction():
+    return db.session.get_bind().dialect.name == 'postgresql'
+
+
+def snapshot_xmin():
+    # The oldest transaction still running when this one's snapshot was taken
+    return db.session.execute(text('SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint')).scalar()
+
+
+def clock(model):
+    # The column changes are ordered by
+    if by_transaction():
+        return model.sync_xid
+    return model.deleted_at if model is Tombstone else model.updated_at
+
+
+def window(since):
+    """The cursor to send next, and a filter on clock() for the changes after `since` served now."""
+    if by_transaction():
+        until = snapshot_xmin()
+        if since is None:
+            return until, None
+        start = int(since)
+        horizon = db.session.query(SyncHorizon.pruned_xid).scalar()
+        # A cursor beyond xmin was not issued by this database (e.g. a time-based one from before sync_xid)
+        if start > until or (horizon is not None and start <= horizon):
+            raise CursorExpired()
+        return until, lambda column: column.between(start, until - 1)
+
+    until = utcnow() - SETTLE
+    if since is None:
+        return to_cursor(until), None
+    start = from_cursor(since)
+    if start < utcnow() - RETENTION:
+        raise CursorExpired()
+    return to_cursor(max(until, start)), lambda column: (column > start) & (column <= until)
+
+
+def changes(since=None, tables=SYNCED):
+    """Rows of `tables` changed and ids deleted after the cursor `since`, plus the cursor to send next time.
+
+    Without `since` every row is sent (a full sync) and there is nothing to delete.
+    Raises ValueError for a malformed cursor and CursorExpired for one older than
+    the tombstones kept.
+    """
+    cursor, changed = window(since)
+
+    rows, deleted = {}, {}
+    for name in tables:
+        model = SYNCED[name]
+        query = model.query
+        if changed is not None:
+            query = query.filter(changed(clock(model)))
+        rows[name] = [row.to_dict() for row in query.order_by(model.id)]
+        if changed is not None:
+            deleted[name] = [id for id, in db.session.query(Tombstone.row_id).filter(
+                Tombstone.table_name == name, changed(clock(Tombstone)))
+                .order_by(Tombstone.id)]
+    return {'cursor': cursor, 'full': since is None, 'changes': rows, 'deleted': deleted}
+
+
+def bury(table, condition):
+    """Tombstones for the rows of `table` matching `condition`, ahead of a bulk delete."""
+    db.session.execute(insert(Tombstone.__table__).from_select(
+        ['table_name', 'row_id', 'deleted_at'],
+        select(literal(table.name), table.c.id, literal(utcnow())).where(condition)))
+
+
+def prune_tombstones(before=None):
+    pruned = Tombstone.deleted_at < (before or utcnow() - RETENTION)
+    if by_transaction():
+        # Cursors up to the newest pruned transaction would miss its deletes
+        newest = db.session.query(func.max(Tombstone.sync_xid)).filter(pruned).scalar()
+        if newest is not None:
+            horizon = db.session.get(SyncHorizon, 1, with_for_update=True)
+            if horizon is None:
+                db.session.add(SyncHorizon(id=1, pruned_xid=newest))
+            else:
+                horizon.pruned_xid = max(horizon.pruned_xid, newest)
+    deleted = db.session.execute(delete(Tombstone).where(pruned)).rowcount
+    db.session.commit()
+    return deleted
+
+
+@event.listens_for(Session, 'before_flush')
+def record_deletes(session, flush_context, instances):
+    # Written in the same transaction as the delete
+    for obj in session.deleted:
+        name = getattr(obj, '__tablename__', None)
+        if name in SYNCED:
+            session.add(Tombstone(table_name=name, row_id=obj.id, deleted_at=utcnow()))
@@ -0,0 +1,141 @@
+# tests/conftest.py
+"""Builds the schema once per run and rolls every test back to a SAVEPOINT.
+
+Tests run against TEST_DATABASE_URI (Postgres for anything close to
+production), or a throwaway SQLite file. TEST_SCHEMA=migrations builds the
+schema with the Alembic chain instead of db.metadata (Postgres only; the early
+migrations don't run on SQLite).
+
+    python -m pytest -q
+    TEST_DATABASE_URI=postgresql://localhost/bus_test TEST_SCHEMA=migrations python -m pytest -q
+"""
+import os, tempfile
+import pytest
+from flask_migrate import upgrade
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from app import create_app
+from models import db
+from firebase import FakeAuth
+from notifications import FakeGateway
+from outbox import MemorySink
+from journeys import planner
+from stops import stop_index
+
+
+class BoundSession(Session):
+    """Uses the test's connection rather than picking an engine per model."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        return self.bind
+
+
+def sqlite_savepoints(engine):
+    # pysqlite starts transactions on its own terms, which breaks SAVEPOINT;
+    # hand transaction control to SQLAlchemy instead. IMMEDIATE takes the write
+    # lock up front, so threads in live_db tests wait their turn rather than
+    # failing to upgrade a read lock
+    @event.listens_for(engine, 'connect')
+    def connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, 'begin')
+    def begin(connection):
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+
+def reset_caches():
+    # Both are filled from the database and outlive a rolled back test
+    planner.reset()
+    stop_index.invalidate()
+
+
+@pytest.fixture(scope='session')
+def app():
+    uri = os.getenv('TEST_DATABASE_URI') or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'tests.db')
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'SECRET_KEY': 'test',
+        'JWT_SECRET_KEY': 'test',
+        'RATELIMIT_ENABLED': False,
+        'ADMISSION_ENABLED': False,
+        'FIREBASE_AUTH': FakeAuth(),
+        'NOTIFICATION_GATEWAYS': {'sms': FakeGateway(), 'email': FakeGateway()},
+        'OUTBOX_ENABLED': True,
+        'OUTBOX_SINKS': {'memory': MemorySink()},
+        'WRITE_BEHIND_MAX_DELAY': None,
+        'WRITE_BEHIND_SPOOL': tempfile.mkdtemp(),
+        'TIMETABLE_INTERVAL': None,
+        'ARCHIVE_INTERVAL': None,
+        'JOB_WORKER_THREADS': None
+    })
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            sqlite_savepoints(db.engine)
+        db.drop_all()
+        if os.getenv('TEST_SCHEMA') == 'migrations':
+            upgrade()
+        else:
+            db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def session(app):
+    """db.session for one test; everything it commits is rolled back afterwards.
+
+    Every session in the test, including the ones requests open, shares one
+    connection, so this is for single threaded tests; see `live_db`.
+    """
+    with app.app_context():
+        connection = db.engine.connect()
+        transaction = connection.begin()
+        original = db.session
+        # commit() in the code under test releases a SAVEPOINT instead of committing
+        db.session = db._make_scoped_session({'class_': BoundSession, 'bind': connection,
+                                               'join_transaction_mode': 'create_savepoint'})
+        try:
+            yield db.session
+        finally:
+            db.session.remove()
+            db.session = original
+            transaction.rollback()
+            connection.close()
+            reset_caches()
+
+
+@pytest.fixture
+def live_db(app):
+    """Real commits on separate pooled connections, for tests running threads; tables are emptied afterwards."""
+    with app.app_context():
+        try:
+            yield db.session
+        finally:
+            db.session.remove()
+            with db.engine.begin() as connection:
+                for table in reversed(db.metadata.sorted_tables):
+                    connection.execute(table.delete())
+            reset_caches()
+
+
+@pytest.fixture
+def client(app, session):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth(app):
+    auth = app.config['FIREBASE_AUTH']
+    yield auth
+    auth.users.clear()
+
+
+@pytest.fixture
+def gateways(app):
+    gateways = app.config['NOTIFICATION_GATEWAYS']
+    yield gateways
+    for gateway in gateways.values():
+        gateway.sent.clear()
@@ -0,0 +1,87 @@
+# tests/factories.py
+"""Rows with just enough filled in; pass keyword arguments to override any column.
+
+Each factory adds and flushes, so the row has an id and requests in the same
+test can see it.
+"""
+from datetime import date, datetime, time, timedelta
+from itertools import count
+from models import db, User, Driver, Admin, Stop, Route, Bus, Seat, Booking, Review, Schedule
+
+sequence = count(1)
+
+
+def persist(obj):
+    db.session.add(obj)
+    db.session.flush()
+    return obj
+
+
+def make_user(**values):
+    n = next(sequence)
+    return persist(User(**{'username': f'user{n}', 'email': f'user{n}@example.com',
+                           'firebase_uid': f'uid-{n}', **values}))
+
+
+def make_driver(**values):
+    n = next(sequence)
+    return persist(Driver(**{'full_name': f'Driver {n}', 'id_number': f'D{n}', 'driving_license': f'DL{n}',
+                             'phone_number': f'0711{n:06d}', **values}))
+
+
+def make_admin(**values):
+    n = next(sequence)
+    return persist(Admin(**{'full_name': f'Admin {n}', 'id_number': f'A{n}', 'phone_number': f'0722{n:06d}',
+                            **values}))
+
+
+def make_stop(**values):
+    return persist(Stop(**{'name': f'Stop {next(sequence)}', **values}))
+
+
+def make_route(origin=None, destination=None, **values):
+    origin = origin or make_stop()
+    destination = destination or make_stop()
+    return persist(Route(**{'route_name': f'{origin.name} - {destination.name}', 'departure_from': origin.name,
+                            'departure_to': destination.name, 'origin': origin, 'destination': destination,
+                            **values}))
+
+
+def make_bus(driver=None, origin=None, destination=None, departure_time=None, seats=33, **values):
+    origin = origin or make_stop()
+    destination = destination or make_stop()
+    departure_time = departure_time or datetime.now().replace(microsecond=0) + timedelta(days=1)
+    return persist(Bus(**{'driver_id': (driver or make_driver()).id, 'number_plate': f'KTS {next(sequence):03d}T',
+                          'number_of_seats': seats, 'seats_available': seats, 'departure_from': origin.name,
+                          'departure_to': destination.name, 'origin': origin, 'destination': destination,
+                          'departure_time': departure_time, 'arrival_time': departure_time + timedelta(hours=6),
+                          'price_per_seat': 1500, **values}))
+
+
+def make_seats(bus, status='available'):
+    seats = [Seat(bus_id=bus.id, seat_number=str(number), status=status)
+             for number in range(1, bus.number_of_seats + 1)]
+    db.session.add_all(seats)
+    db.session.flush()
+    return seats
+
+
+def make_booking(bus=None, **values):
+    n = next(sequence)
+    bus = bus or make_bus()
+    return persist(Booking(**{'bus_id': bus.id, 'seat_number': '1', 'status': 'booked', 'name': f'Passenger {n}',
+                              'idNumber': f'{30000000 + n}', 'phoneNumber': f'0733{n:06d}', 'ticket': f'T{n:05d}',
+                              **values}))
+
+
+def make_review(**values):
+    n = next(sequence)
+    return persist(Review(**{'name': f'Reviewer {n}', 'email': f'reviewer{n}@example.com',
+                             'review': 'Smooth ride.', 'rating': 5, **values}))
+
+
+def make_schedule(route=None, driver=None, **values):
+    return persist(Schedule(**{'route_id': (route or make_route()).id, 'driver_id': (driver or make_driver()).id,
+                               'number_plate': f'KTS {next(sequence):03d}S', 'number_of_seats': 33,
+                               'days_of_week': '1111111', 'departure_time': time(8), 'arrival_time': time(14),
+                               'price_per_seat': 1500, 'start_date': date.today(), **values}))
@@ -0,0 +1,43 @@
+# tests/test_admission.py
+import pytest
+from admission import DEFAULT_LIMITS, Gate, MemoryWaitingRoom
+
+
+def gate(**limits):
+    return Gate('bookings', **dict(DEFAULT_LIMITS, **limits))
+
+
+def test_waiting_room_token_jumps_the_line_once():
+    bookings = gate()
+    position = bookings.issue_position()
+    assert not bookings.redeem(position)
+    bookings.room.serving = position
+    assert bookings.redeem(position)
+    assert not bookings.redeem(position)
+
+
+def test_unadmitted_token_can_try_again():
+    bookings = gate()
+    bookings.room.serving = position = bookings.issue_position()
+    assert bookings.redeem(position)
+    bookings.unredeem(position)
+    assert bookings.redeem(position)
+
+
+@pytest.mark.parametrize('limits', [{'rate': 0}, {'concurrency': 0}])
+def test_limits_must_be_positive(limits):
+    with pytest.raises(ValueError):
+        gate(**limits)
+
+
+def test_workers_sharing_a_room_honour_each_others_tokens():
+    # Stands in for RedisWaitingRoom: one room behind two workers' gates
+    room = MemoryWaitingRoom()
+    first, second = gate(room=room), gate(room=room)
+    position = first.issue_position()
+    assert second.id == first.id
+    assert first.acquire()
+    first.release()
+    assert second.serving == position
+    assert second.redeem(position)
+    assert not first.redeem(position)
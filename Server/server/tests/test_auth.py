@@ -0,0 +1,53 @@
+# tests/test_auth.py
+from flask_jwt_extended import create_access_token
+from tests.factories import make_admin, make_booking, make_driver, make_user
+
+
+def test_signup_then_login(client, auth):
+    response = client.post('/signup', json={'username': 'wanjiru', 'email': 'wanjiru@example.com',
+                                            'password': 'secret123'})
+    assert response.status_code == 201
+    uid = next(iter(auth.users))
+    response = client.post('/login', json={'uid': uid, 'email': 'wanjiru@example.com'})
+    assert response.status_code == 200
+    assert response.json['user']['name'] == 'wanjiru'
+
+
+def test_login_unknown_to_firebase(client, auth):
+    assert client.post('/login', json={'uid': 'nobody', 'email': 'nobody@example.com'}).status_code == 401
+
+
+def test_login_without_local_account(client, auth):
+    auth.users['uid-only-in-firebase'] = 'ghost@example.com'
+    response = client.post('/login', json={'uid': 'uid-only-in-firebase', 'email': 'ghost@example.com'})
+    assert response.status_code == 404
+
+
+def test_current_user(client, auth):
+    user = make_user()
+    auth.users[user.firebase_uid] = user.email
+    token = client.post('/login', json={'uid': user.firebase_uid, 'email': user.email}).json['token']
+    response = client.get('/current_user', headers={'Authorization': f'Bearer {token}'})
+    assert response.json['email'] == user.email
+
+
+def test_current_driver_and_admin(app, client):
+    driver, admin = make_driver(), make_admin()
+    with app.app_context():
+        tokens = {'/current_driver': create_access_token(identity=str(driver.id)),
+                  '/current_admin': create_access_token(identity=str(admin.id))}
+    for path, token in tokens.items():
+        response = client.get(path, headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 200
+    assert response.json['full_name'] == admin.full_name
+
+
+def test_my_trips(client, auth):
+    user = make_user()
+    auth.users[user.firebase_uid] = user.email
+    token = client.post('/login', json={'uid': user.firebase_uid, 'email': user.email}).json['token']
+    mine, _ = make_booking(user_id=user.id), make_booking()
+    response = client.get('/my/trips', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    assert [trip['id'] for trip in response.json] == [mine.id]
+    assert response.json[0]['bus']['id'] == mine.bus_id
@@ -0,0 +1,88 @@
+# tests/test_bookings.py
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy.exc import IntegrityError
+from models import Booking, Job, Notification
+from api import reservations
+from tests.factories import make_bus, make_booking, make_user
+
+
+def booking(bus, seat='1', phone='0700000001'):
+    return {'bus_id': bus.id, 'seat_number': seat, 'name': 'Amina Hassan', 'idNumber': '30111222',
+            'phoneNumber': phone, 'status': 'booked'}
+
+
+def test_book_a_seat(client, session):
+    bus = make_bus()
+    response = client.post('/bookings', json=booking(bus))
+    assert response.status_code == 201
+    assert session.query(Booking).filter_by(ticket=response.json['ticket']).one().bus_id == bus.id
+
+
+def test_seat_already_booked(client):
+    bus = make_bus()
+    make_booking(bus, seat_number='3')
+    assert client.post('/bookings', json=booking(bus, seat='3')).status_code == 409
+
+
+def test_booking_queues_ticket_sms_and_seat_count(client, session):
+    bus = make_bus()
+    response = client.post('/bookings', json=booking(bus, phone='0700000042'))
+    sms = session.query(Notification).filter_by(dedupe_key=f"ticket:{response.json['ticket']}:sms").one()
+    assert sms.recipient == '0700000042'
+    assert session.query(Job).filter_by(kind='reconcile_seats').count() == 1
+
+
+def test_find_bookings_by_phone(client):
+    bus = make_bus()
+    make_booking(bus, phoneNumber='0799999999')
+    make_booking(bus, seat_number='2')
+    response = client.get('/bookings?phone=0799999999')
+    assert [row['phoneNumber'] for row in response.json] == ['0799999999']
+
+
+def test_stale_if_match_on_cancel(client):
+    existing = make_booking()
+    response = client.delete(f'/bookings/{existing.id}', headers={'If-Match': '"7"'})
+    assert response.status_code == 412
+
+
+def test_database_allows_one_live_booking_per_seat(session):
+    bus = make_bus()
+    make_booking(bus, seat_number='4', status='cancelled')
+    make_booking(bus, seat_number='4')
+    with pytest.raises(IntegrityError):
+        make_booking(bus, seat_number='4')
+
+
+def test_cancelled_seat_can_be_booked_again(client):
+    bus = make_bus()
+    make_booking(bus, seat_number='5', status='cancelled')
+    assert client.post('/bookings', json=booking(bus, seat='5')).status_code == 201
+
+
+def test_seat_taken_after_the_check_is_a_conflict(client, session, monkeypatch):
+    bus = make_bus()
+    codes = iter(['T90001', 'T90002'])
+
+    def racing_ticket_code():
+        # Another worker books the seat between the check and the insert
+        if not session.query(Booking).filter_by(bus_id=bus.id).count():
+            make_booking(bus, seat_number='1')
+        return next(codes)
+
+    monkeypatch.setattr(reservations, 'ticket_code', racing_ticket_code)
+    assert client.post('/bookings', json=booking(bus)).status_code == 409
+
+
+def test_booking_with_token_is_linked_to_the_account(app, client, session):
+    user = make_user()
+    with app.test_request_context():
+        token = create_access_token(identity=str(user.id))
+    response = client.post('/bookings', json=booking(make_bus()), headers={'Authorization': f'Bearer {token}'})
+    assert session.query(Booking).filter_by(ticket=response.json['ticket']).one().user_id == user.id
+
+
+def test_booking_with_bad_token_stays_anonymous(client, session):
+    response = client.post('/bookings', json=booking(make_bus()), headers={'Authorization': 'Bearer not-a-token'})
+    assert session.query(Booking).filter_by(ticket=response.json['ticket']).one().user_id is None
@@ -0,0 +1,111 @@
+# tests/test_buses.py
+from datetime import timedelta
+from models import Bus, Stop
+from events import hub
+from jobs import reconcile_seats
+from stops import CHANNEL as STOPS_CHANNEL
+from tests.factories import make_booking, make_bus, make_driver, make_seats, make_stop
+
+
+def test_get_sends_version_as_etag(client):
+    bus = make_bus()
+    response = client.get(f'/buses/{bus.id}')
+    assert response.headers['ETag'] == f'"{bus.version}"'
+
+
+def test_patch_with_current_version(client, session):
+    bus = make_bus()
+    response = client.patch(f'/buses/{bus.id}', json={'price_per_seat': 2000}, headers={'If-Match': '"1"'})
+    assert response.status_code == 200
+    assert response.json['version'] == 2
+    assert session.get(Bus, bus.id, populate_existing=True).price_per_seat == 2000
+
+
+def test_patch_with_stale_version(client):
+    bus = make_bus()
+    client.patch(f'/buses/{bus.id}', json={'price_per_seat': 2000})
+    response = client.patch(f'/buses/{bus.id}', json={'price_per_seat': 2500}, headers={'If-Match': '"1"'})
+    assert response.status_code == 412
+    assert response.headers['ETag'] == '"2"'
+
+
+def test_patch_missing_bus(client):
+    assert client.patch('/buses/999999', json={'price_per_seat': 2000}).status_code == 404
+
+
+def test_overlapping_departures_for_same_driver(client):
+    driver = make_driver()
+    first = make_bus(driver=driver)
+    second = make_bus(driver=driver, departure_time=first.departure_time + timedelta(hours=1))
+    make_bus(departure_time=first.departure_time)
+    response = client.get('/buses/conflicts', query_string={'from': (first.departure_time - timedelta(days=1)).isoformat()})
+    assert response.status_code == 200
+    assert [(conflict['reason'], conflict['bus_ids']) for conflict in response.json] == \
+        [('driver_id', sorted([first.id, second.id]))]
+
+
+def test_seat_map_for_one_bus(client):
+    bus = make_bus(seats=14)
+    make_seats(bus)
+    make_seats(make_bus(seats=33))
+    response = client.get(f'/seats?bus_id={bus.id}')
+    assert len(response.json) == 14
+
+
+def test_generate_departures_rejects_bad_days(client):
+    for days in ('soon', None, 0):
+        assert client.post('/schedules/generate', json={'days': days}).status_code == 400
+
+
+def test_stop_names_differing_in_case_are_one_stop(client, session):
+    origin = make_stop(name='Nairobi')
+    response = client.post('/routes', json={'route_name': 'Express', 'departure_from': ' nairobi ',
+                                            'departure_to': 'Mombasa'})
+    assert response.status_code == 201
+    assert response.json['departure_from_id'] == origin.id
+    assert session.query(Stop).filter(Stop.name.in_(['Nairobi', 'nairobi'])).all() == [origin]
+
+
+def test_blank_stop_name_is_rejected(client):
+    response = client.post('/routes', json={'route_name': 'Nowhere', 'departure_from': ' ', 'departure_to': 'Mombasa'})
+    assert response.status_code == 400
+
+
+def test_seat_count_leaves_the_version_alone(client, session):
+    bus = make_bus(seats=10)
+    make_booking(bus, seat_number='1')
+    make_booking(bus, seat_number='2', status='cancelled')
+    reconcile_seats(bus.id)
+    bus = session.get(Bus, bus.id, populate_existing=True)
+    assert (bus.seats_available, bus.version) == (9, 1)
+    response = client.patch(f'/buses/{bus.id}', json={'price_per_seat': 2000}, headers={'If-Match': '"1"'})
+    assert response.status_code == 200
+
+
+def timetable_row(**values):
+    return {'full_name': 'Otieno Ouma', 'id_number': '31234567', 'driving_license': 'DL-1001',
+            'phone_number': '0712000111', 'number_plate': 'KDA 100A', 'number_of_seats': 33,
+            'departure_from': 'Nairobi', 'departure_to': 'Kisumu', 'departure_time': '2030-01-01T08:00:00',
+            'arrival_time': '2030-01-01T14:00:00', 'price_per_seat': 1500, **values}
+
+
+def test_import_reports_malformed_rows(client, session):
+    rows = [timetable_row(), ['KDA 100A', 33], timetable_row(departure_time=800), timetable_row(arrival_time=None),
+            timetable_row(number_of_seats=True), None]
+    response = client.post('/import', json=rows)
+    assert response.status_code == 207
+    assert response.json['created']['buses'] == 1
+    assert [error['row'] for error in response.json['errors']] == [2, 3, 4, 5, 6]
+    assert response.json['errors'][1]['error'] == 'Wrong type for fields: departure_time'
+
+
+def test_stop_autocomplete_follows_other_workers(client, session):
+    stop = make_stop(name='Nairobi CBD')
+    session.commit()
+    assert client.get('/stops/autocomplete?q=cbd').json == [{'id': stop.id, 'name': 'Nairobi CBD'}]
+    # Flushed without a commit: this worker isn't told, as if another worker had added it
+    session.add(Stop(name='Kisumu'))
+    session.flush()
+    assert client.get('/stops/autocomplete?q=kis').json == []
+    hub.publish(STOPS_CHANNEL, {'origin': 'another-worker'})
+    assert [stop['name'] for stop in client.get('/stops/autocomplete?q=kis').json] == ['Kisumu']
@@ -0,0 +1,53 @@
+# tests/test_compression.py
+import gzip, zlib
+from compression import GzipStream, stream
+from tests.factories import make_bus, make_review
+
+
+def test_large_listing_is_gzipped(client):
+    for _ in range(20):
+        make_review()
+    response = client.get('/reviews', headers={'Accept-Encoding': 'br;q=0.5, gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert len(gzip.decompress(response.data)) > len(response.data)
+
+
+def test_small_body_left_alone(client):
+    make_review()
+    response = client.get('/reviews', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_client_without_gzip(client):
+    for _ in range(20):
+        make_review()
+    response = client.get('/reviews', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in response.headers
+    assert len(response.json) == 20
+
+
+def test_etag_becomes_weak(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'COMPRESS_MIN_SIZE', 0)
+    bus = make_bus()
+    response = client.get(f'/buses/{bus.id}', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['ETag'] == 'W/"1"'
+    # The weak form is accepted back in If-Match
+    assert client.patch(f'/buses/{bus.id}', json={'price_per_seat': 10}, headers={'If-Match': 'W/"1"'}).status_code == 200
+
+
+def test_stream_flushes_every_chunk():
+    decompressor = zlib.decompressobj(31)
+    events = [b'data: {"seat": "1"}\n\n', b'data: {"seat": "2"}\n\n']
+    chunks = stream(iter(events), GzipStream(6))
+    # Each event can be decoded before the next one is written
+    for event in events:
+        assert decompressor.decompress(next(chunks)) == event
+
+
+def test_columns_format(client):
+    first, second = make_review(rating=4), make_review(rating=2)
+    response = client.get('/reviews?format=columns')
+    assert response.json['count'] == 2
+    assert response.json['columns']['id'] == [first.id, second.id]
+    assert response.json['columns']['rating'] == [4, 2]
@@ -0,0 +1,44 @@
+# tests/test_concurrency.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from models import Booking, Job
+from jobs import claim, enqueue
+from tests.factories import make_bus
+
+
+def test_group_commit_never_double_books(app, live_db, monkeypatch):
+    monkeypatch.setitem(app.config, 'BOOKING_MODE', 'actor')
+    bus_id = make_bus(seats=10).id
+    live_db.commit()
+
+    def book(n):
+        return app.test_client().post('/bookings', json={
+            'bus_id': bus_id, 'seat_number': str(n % 10 + 1), 'name': f'Passenger {n}', 'idNumber': str(n),
+            'phoneNumber': f'07{n:08d}', 'status': 'booked'}).status_code
+
+    with ThreadPoolExecutor(8) as pool:
+        statuses = list(pool.map(book, range(40)))
+
+    assert statuses.count(201) == 10
+    assert statuses.count(409) == 30
+    seats = [seat for seat, in live_db.query(Booking.seat_number).filter_by(bus_id=bus_id)]
+    assert sorted(seats, key=int) == [str(n) for n in range(1, 11)]
+
+
+def test_workers_claim_disjoint_jobs(app, live_db):
+    for n in range(200):
+        enqueue('reconcile_seats', {'bus_id': n})
+    live_db.commit()
+    barrier = threading.Barrier(4)
+
+    def work(worker_id):
+        with app.app_context():
+            barrier.wait()
+            return [job.id for job in claim(worker_id, 100)]
+
+    with ThreadPoolExecutor(4) as pool:
+        claimed = [ids for ids in pool.map(work, [f'worker-{n}' for n in range(4)])]
+
+    ids = [id for batch in claimed for id in batch]
+    assert len(ids) == len(set(ids)) == 200
+    assert live_db.query(Job).filter_by(status='running').count() == 200
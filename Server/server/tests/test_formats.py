@@ -0,0 +1,53 @@
+# tests/test_formats.py
+from datetime import datetime, timezone
+import pytest
+from formats import native
+from tests.factories import make_bus, make_booking, make_seats
+
+msgpack = pytest.importorskip('msgpack')
+
+
+def test_json_by_default(client):
+    make_bus()
+    response = client.get('/buses', headers={'Accept': '*/*'})
+    assert response.mimetype == 'application/json'
+    assert 'Accept' in response.headers['Vary']
+
+
+def test_buses_as_msgpack(client):
+    bus = make_bus(departure_time=datetime(2030, 5, 1, 8, 30), price_per_seat='1450.50')
+    response = client.get('/buses', headers={'Accept': 'application/msgpack'})
+    assert response.mimetype == 'application/msgpack'
+    [row] = msgpack.unpackb(response.data, timestamp=3)
+    assert row['id'] == bus.id
+    assert row['price_per_seat_cents'] == 145050
+    assert 'price_per_seat' not in row
+    assert row['departure_time'] == datetime(2030, 5, 1, 8, 30, tzinfo=timezone.utc)
+
+
+def test_seats_as_msgpack_columns(client):
+    bus = make_bus(seats=3)
+    make_seats(bus)
+    response = client.get(f'/seats?bus_id={bus.id}&format=columns', headers={'Accept': 'application/msgpack'})
+    body = msgpack.unpackb(response.data)
+    assert body['count'] == 3
+    assert body['columns']['seat_number'] == ['1', '2', '3']
+
+
+def test_json_preferred_by_quality(client):
+    make_booking()
+    response = client.get('/bookings', headers={'Accept': 'application/msgpack;q=0.5, application/json'})
+    assert response.mimetype == 'application/json'
+
+
+def test_native_row():
+    row = native({'price_per_seat': '12.345', 'created_at': {'date': '2030-01-02', 'time': '03:04:05'},
+                  'departure_time': '08:00:00', 'bus': {'arrival_time': '2030-01-02T10:00:00'}, 'note': None})
+    assert row == {
+        'price_per_seat_cents': 1235,
+        'created_at': datetime(2030, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+        # A schedule's time of day has no date, so stays as it is
+        'departure_time': '08:00:00',
+        'bus': {'arrival_time': datetime(2030, 1, 2, 10, tzinfo=timezone.utc)},
+        'note': None
+    }
@@ -0,0 +1,26 @@
+# tests/test_harness.py
+from models import Bus, Driver
+from tests.factories import make_bus, make_driver
+
+
+def test_commits_are_rolled_back(session):
+    make_driver(full_name='Kept only for this test')
+    session.commit()
+    assert Driver.query.filter_by(full_name='Kept only for this test').count() == 1
+
+
+def test_previous_test_left_nothing(session):
+    assert Driver.query.filter_by(full_name='Kept only for this test').count() == 0
+
+
+def test_requests_see_factory_rows(client):
+    bus = make_bus()
+    response = client.get(f'/buses/{bus.id}')
+    assert response.status_code == 200
+    assert response.json['number_plate'] == bus.number_plate
+
+
+def test_request_commits_are_rolled_back_too(client, session):
+    bus = make_bus()
+    assert client.delete(f'/buses/{bus.id}').status_code == 204
+    assert session.get(Bus, bus.id) is None
@@ -0,0 +1,42 @@
+# tests/test_journeys.py
+from datetime import date, timedelta
+from decimal import Decimal
+from events import hub
+from journeys import planner, CHANNEL, DAYS_CACHED
+from tests.factories import make_bus
+
+
+def test_patch_updates_only_the_departure(client, session):
+    bus = make_bus()
+    session.commit()
+    other_day = bus.departure_time.date() + timedelta(days=3)
+    planner.search('nowhere', 'elsewhere', other_day)
+    client.get('/journeys', query_string={'from': bus.departure_from, 'to': bus.departure_to,
+                                          'date': bus.departure_time.date().isoformat()})
+    response = client.patch(f'/buses/{bus.id}', json={'price_per_seat': 900})
+    assert response.status_code == 200
+    # The other day's departures aren't thrown away
+    assert other_day in planner.days
+    journeys = client.get('/journeys', query_string={'from': bus.departure_from, 'to': bus.departure_to,
+                                                     'date': bus.departure_time.date().isoformat()}).json
+    assert Decimal(journeys[0]['price']) == 900
+
+
+def test_loaded_days_are_bounded(session):
+    start = date(2030, 1, 1)
+    for offset in range(DAYS_CACHED + 5):
+        planner.search('nowhere', 'elsewhere', start + timedelta(days=offset))
+    assert len(planner.days) == DAYS_CACHED
+    assert start not in planner.days
+
+
+def test_changes_from_another_worker_drop_their_day(session):
+    bus = make_bus()
+    session.commit()
+    day = bus.departure_time.date()
+    planner.search(bus.departure_from, bus.departure_to, day)
+    assert day in planner.days
+    hub.publish(CHANNEL, {'origin': 'another-worker', 'buses': [bus.id], 'days': [day.isoformat()]})
+    planner.search('nowhere', 'elsewhere', day + timedelta(days=5))
+    assert day not in planner.days
+    assert bus.id not in planner.index
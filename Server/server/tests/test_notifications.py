@@ -0,0 +1,27 @@
+# tests/test_notifications.py
+import notifications
+from models import Job, Notification
+from notifications import RateLimit, dispatch_notifications
+
+
+def test_rate_limit_is_shared_between_processes(session, monkeypatch):
+    waits = []
+    monkeypatch.setattr(notifications.time, 'sleep', waits.append)
+    # One bucket per process, as each worker builds its own notifier
+    first, second = RateLimit('notifications:sms', 10), RateLimit('notifications:sms', 10)
+    first.acquire(10)
+    second.acquire(10)
+    assert waits and 0.9 < waits[0] <= 1
+
+
+def test_refused_recipient_does_not_hold_up_the_others(session, gateways, monkeypatch):
+    sms = gateways['sms']
+    monkeypatch.setattr(sms, 'batch_size', 1)
+    monkeypatch.setattr(sms, 'fail', {'0700000001'})
+    notifications.queue([{'channel': 'sms', 'recipient': recipient, 'body': 'Your bus leaves at 8',
+                          'dedupe_key': f'test:{recipient}'} for recipient in ('0700000001', '0700000002')])
+    dispatch_notifications('sms')
+    assert [message.recipient for message in sms.sent] == ['0700000002']
+    refused = session.query(Notification).filter_by(recipient='0700000001').one()
+    assert (refused.status, refused.last_error) == ('pending', 'Recipient rejected')
+    assert session.query(Job).filter_by(key='dispatch_notifications:sms:retry').count() == 1
@@ -0,0 +1,106 @@
+# tests/test_outbox.py
+import json
+import pytest
+from datetime import timedelta
+import outbox as outbox_module
+from models import OutboxEvent, OutboxCheckpoint
+from jobs import utcnow
+from outbox import outbox, NdjsonSink, Relay
+from tests.factories import make_bus, make_booking
+from tests.test_bookings import booking
+
+
+@pytest.fixture
+def relay(app, session):
+    relay = outbox.relay('memory')
+    yield relay
+    relay.sink.events.clear()
+    relay.sink.fail = False
+    relay.gaps.clear()
+
+
+def topics(session):
+    return [(event.topic, event.aggregate_id) for event in session.query(OutboxEvent).order_by(OutboxEvent.id)]
+
+
+def test_booking_writes_event_in_same_transaction(client, session):
+    bus = make_bus()
+    response = client.post('/bookings', json=booking(bus))
+    event = session.query(OutboxEvent).filter_by(topic='booking.created').one()
+    assert event.payload['ticket'] == response.json['ticket']
+    assert event.payload['bus_id'] == bus.id
+
+
+def test_bus_changes(client, session):
+    bus = make_bus()
+    client.patch(f'/buses/{bus.id}', json={'price_per_seat': 2000})
+    # Seat counts move with every booking; the booking events already carry that
+    client.patch(f'/buses/{bus.id}', json={'seats_available': 5})
+    client.delete(f'/buses/{bus.id}')
+    assert topics(session) == [('bus.created', bus.id), ('bus.updated', bus.id), ('bus.deleted', bus.id)]
+
+
+def test_cancel_and_delete_booking(client, session):
+    booking_row = make_booking()
+    booking_row.status = 'cancelled'
+    session.flush()
+    client.delete(f'/bookings/{booking_row.id}')
+    assert topics(session)[-3:] == [('booking.created', booking_row.id), ('booking.cancelled', booking_row.id),
+                                    ('booking.deleted', booking_row.id)]
+
+
+def test_relay_publishes_and_checkpoints(relay, session):
+    bus = make_bus()
+    make_booking(bus)
+    assert relay.run_once() == 2
+    assert [event['topic'] for event in relay.sink.events] == ['bus.created', 'booking.created']
+    assert session.get(OutboxCheckpoint, 'memory').position == relay.sink.events[-1]['id']
+    assert relay.run_once() == 0
+    assert relay.metrics()['delivered'] == 2
+
+
+def test_failed_publish_is_sent_again(relay):
+    make_bus()
+    relay.sink.fail = True
+    with pytest.raises(ConnectionError):
+        relay.run_once()
+    relay.sink.fail = False
+    assert relay.run_once() == 1
+    assert relay.metrics()['failures'] == 1
+
+
+def test_relay_waits_on_gap_until_timeout(relay, session, monkeypatch):
+    first = make_bus()
+    # An id skipped by a transaction that has not committed, or rolled back
+    position = session.query(OutboxEvent.id).scalar()
+    session.add(OutboxEvent(id=position + 2, topic='bus.updated', aggregate_id=first.id, payload={}))
+    session.flush()
+    assert relay.run_once() == 1
+    monkeypatch.setattr(outbox_module, 'GAP_TIMEOUT', 0)
+    assert relay.run_once() == 1
+    assert [event['id'] for event in relay.sink.events] == [position, position + 2]
+
+
+def test_ndjson_sink(app, session, tmp_path):
+    path = tmp_path / 'outbox.ndjson'
+    bus = make_bus()
+    assert Relay(app, 'file', NdjsonSink(str(path))).run_once() == 1
+    [line] = path.read_text().splitlines()
+    assert json.loads(line)['payload']['id'] == bus.id
+
+
+def test_nothing_recorded_when_disabled(client, session, monkeypatch):
+    # With no relay nothing would ever be purged
+    monkeypatch.setattr(outbox, 'enabled', False)
+    assert client.post('/bookings', json=booking(make_bus())).status_code == 201
+    assert topics(session) == []
+
+
+def test_relay_once_purges_old_events(app, relay, session):
+    old = utcnow() - outbox_module.RETENTION - timedelta(minutes=1)
+    make_bus(), make_bus()
+    session.query(OutboxEvent).update({'created_at': old})
+    result = app.test_cli_runner().invoke(args=['relay-outbox', '--once'])
+    assert 'Relayed 2 events to memory' in result.output
+    assert 'Purged 2 events' in result.output
+    assert topics(session) == []
@@ -0,0 +1,33 @@
+# tests/test_ratelimit.py
+import pytest
+from ratelimit import limiter, MemoryBackend
+
+
+@pytest.fixture
+def limits(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'RATELIMIT_ENABLED', True)
+    monkeypatch.setattr(limiter, 'backend', MemoryBackend())
+
+
+def attempt(client, phone):
+    return client.post('/bookings', json={'bus_id': 999999, 'seat_number': '1', 'name': 'Bot',
+                                          'idNumber': '1', 'phoneNumber': phone})
+
+
+def test_bookings_limited_per_phone(client, limits):
+    assert [attempt(client, '0700000001').status_code for _ in range(11)][-2:] == [404, 429]
+
+
+def test_rotating_phone_numbers_is_limited_per_address(client, limits):
+    statuses = [attempt(client, f'07{n:08d}').status_code for n in range(31)]
+    assert statuses[:30] == [404] * 30
+    assert statuses[30] == 429
+
+
+def test_request_refused_by_one_limit_counts_against_none(client, limits, monkeypatch):
+    monkeypatch.setitem(client.application.config, 'RATE_LIMITS', {'manage_bookings': '2/minute'})
+    assert [attempt(client, '0700000002').status_code for _ in range(4)] == [404, 404, 429, 429]
+    # The refused attempts didn't use up the phone's own quota
+    client.environ_base['REMOTE_ADDR'] = '10.0.0.2'
+    monkeypatch.setitem(client.application.config, 'RATE_LIMITS', {})
+    assert [attempt(client, '0700000002').status_code for _ in range(9)] == [404] * 8 + [429]
@@ -0,0 +1,102 @@
+# tests/test_reviews.py
+import os, sqlite3, subprocess, sys
+import pytest
+from datetime import datetime, timedelta
+from pathlib import Path
+from sqlalchemy.exc import IntegrityError
+from models import ContactUs
+from tests.factories import make_review, persist
+
+
+def test_summary_follows_every_write(client, session):
+    assert client.get('/reviews/summary').json['count'] == 0
+    first, second = make_review(rating=5), make_review(rating=3)
+    make_review(rating=3)
+    second.rating = 1
+    session.delete(first)
+    session.flush()
+    assert client.get('/reviews/summary').json == {
+        'count': 2, 'sum': 4, 'average': 2.0, 'histogram': {'1': 1, '2': 0, '3': 1, '4': 0, '5': 0}}
+
+
+def test_edit_checks_rating(client, session):
+    review = make_review(rating=4)
+    for rating in (0, 6, '5', True):
+        assert client.patch(f'/reviews/{review.id}', json={'rating': rating}).status_code == 400
+    assert client.patch(f'/reviews/{review.id}', json={'rating': 2}).json['rating'] == 2
+    assert client.get('/reviews/summary').json['histogram'] == {'1': 0, '2': 1, '3': 0, '4': 0, '5': 0}
+    # Written any other way, the database refuses it
+    review.rating = 9
+    with pytest.raises(IntegrityError):
+        session.flush()
+
+
+def test_keyset_pages_newest_first(client):
+    start = datetime(2030, 1, 1)
+    reviews = [make_review(created_at=start + timedelta(minutes=n)) for n in range(5)]
+    first = client.get('/reviews?limit=2')
+    assert [row['id'] for row in first.json] == [reviews[4].id, reviews[3].id]
+    seen = [row['id'] for row in first.json]
+    url = first.headers['Link'][1:first.headers['Link'].index('>')]
+    while url:
+        page = client.get(url)
+        seen += [row['id'] for row in page.json]
+        link = page.headers.get('Link')
+        url = link[1:link.index('>')] if link else None
+    assert seen == [review.id for review in reversed(reviews)]
+
+
+def test_pages_by_rating(client):
+    start = datetime(2030, 1, 1)
+    low = make_review(rating=2, created_at=start)
+    old_high = make_review(rating=5, created_at=start)
+    new_high = make_review(rating=5, created_at=start + timedelta(days=1))
+    page = client.get('/reviews?sort=rating&limit=2')
+    assert [row['id'] for row in page.json] == [new_high.id, old_high.id]
+    assert [row['id'] for row in client.get(page.headers['Link'][1:page.headers['Link'].index('>')]).json] == [low.id]
+    assert [row['id'] for row in client.get('/reviews?limit=5&rating=2').json] == [low.id]
+
+
+def test_bad_page_arguments(client):
+    assert client.get('/reviews?limit=5&sort=name').status_code == 400
+    assert client.get('/reviews?after=not-a-cursor').status_code == 400
+
+
+def test_search_reviews_and_contact(client):
+    late = make_review(review='The bus left two hours late from Nakuru')
+    make_review(review='Comfortable seats and friendly driver')
+    message = persist(ContactUs(name='Achieng', email='achieng@example.com', message='My bus was late, refund?'))
+    body = client.get('/search?q=late bus').json
+    assert [row['id'] for row in body['reviews']] == [late.id]
+    assert [row['id'] for row in body['contact']] == [message.id]
+    # Stemmed: "seat" finds "seats"
+    assert len(client.get('/search?q=seat&in=reviews').json['reviews']) == 1
+
+
+def test_search_follows_edits_and_deletes(client, session):
+    review = make_review(review='Lost luggage at the depot')
+    review.review = 'Found luggage at the depot'
+    session.flush()
+    assert client.get('/search?q=lost&in=reviews').json['reviews'] == []
+    session.delete(review)
+    session.flush()
+    assert client.get('/search?q=luggage&in=reviews').json['reviews'] == []
+
+
+def test_search_input_is_not_query_syntax(client):
+    make_review(review='Great "express" service')
+    assert client.get('/search?q=express" OR (&in=reviews').status_code == 200
+    assert client.get('/search?q=').status_code == 400
+
+
+def test_seeded_schema_has_summary_and_search(tmp_path):
+    # seed.py imports only the models, in a process of its own, so this catches DDL registered anywhere else
+    database = tmp_path / 'seed.db'
+    subprocess.run([sys.executable, 'seed.py', '--bookings', '100', '--days', '2', '--start', '2024-06-01'],
+                   cwd=Path(__file__).parents[1], env={**os.environ, 'DATABASE_URI': f'sqlite:///{database}'},
+                   check=True, capture_output=True)
+    with sqlite3.connect(database) as connection:
+        reviews, = connection.execute('SELECT count(*) FROM reviews').fetchone()
+        assert reviews
+        assert connection.execute('SELECT count FROM rating_summary').fetchone() == (reviews,)
+        assert connection.execute("SELECT count(*) FROM reviews_fts WHERE reviews_fts MATCH 'comfortable'").fetchone()[0]
@@ -0,0 +1,87 @@
+# tests/test_sync.py
+from datetime import timedelta
+import pytest
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql, sqlite
+import sync
+from sync import to_cursor, utcnow
+from archive import archive_departures
+from models import Bus
+from tests.factories import make_bus, make_booking, make_driver, make_route
+
+
+@pytest.fixture(autouse=True)
+def settled(monkeypatch):
+    # Serve changes the moment they are flushed
+    monkeypatch.setattr(sync, 'SETTLE', timedelta(0))
+
+
+def test_full_sync(client):
+    bus = make_bus()
+    booking = make_booking(bus=bus)
+    body = client.get('/sync').json
+    assert body['full'] is True
+    assert [row['id'] for row in body['changes']['buses']] == [bus.id]
+    assert [row['id'] for row in body['changes']['bookings']] == [booking.id]
+    assert body['changes']['drivers'] and body['changes']['routes'] == []
+    assert body['deleted'] == {}
+
+
+def test_only_changes_since_cursor(client):
+    make_bus()
+    second = make_bus()
+    cursor = client.get('/sync?tables=buses').json['cursor']
+    client.patch(f'/buses/{second.id}', json={'seats_available': 10})
+    body = client.get(f'/sync?since={cursor}&tables=buses').json
+    assert body['full'] is False
+    assert [row['id'] for row in body['changes']['buses']] == [second.id]
+    assert body['cursor'] >= cursor
+    # Nothing new since the latest cursor
+    assert client.get(f"/sync?since={body['cursor']}&tables=buses").json['changes'] == {'buses': []}
+
+
+def test_new_rows_since_cursor(client):
+    cursor = client.get('/sync').json['cursor']
+    driver, route = make_driver(), make_route()
+    body = client.get(f'/sync?since={cursor}&tables=drivers,routes').json
+    assert [row['id'] for row in body['changes']['drivers']] == [driver.id]
+    assert [row['id'] for row in body['changes']['routes']] == [route.id]
+    assert set(body['changes']) == {'drivers', 'routes'}
+
+
+def test_deletes_leave_tombstones(client):
+    bus = make_bus()
+    cursor = client.get('/sync').json['cursor']
+    assert client.delete(f'/buses/{bus.id}').status_code == 204
+    body = client.get(f'/sync?since={cursor}').json
+    assert body['deleted']['buses'] == [bus.id]
+    assert body['changes']['buses'] == []
+
+
+def test_archived_trips_leave_tombstones(client):
+    bus = make_bus(departure_time=utcnow() - timedelta(days=60))
+    ids = {'buses': [bus.id], 'bookings': [make_booking(bus=bus).id]}
+    cursor = client.get('/sync').json['cursor']
+    assert archive_departures() == 1
+    body = client.get(f'/sync?since={cursor}&tables=buses,bookings').json
+    assert body['deleted'] == ids
+
+
+def test_unknown_table(client):
+    assert client.get('/sync?tables=buses,users').status_code == 400
+
+
+def test_malformed_cursor(client):
+    assert client.get('/sync?since=yesterday').status_code == 400
+
+
+def test_expired_cursor(client):
+    old = to_cursor(utcnow() - sync.RETENTION - timedelta(days=1))
+    assert client.get(f'/sync?since={old}').status_code == 410
+
+
+def test_rows_record_their_transaction_on_postgresql():
+    # PostgreSQL cursors are transaction ids, so each write stamps its own; SQLite falls back to updated_at
+    statement = update(Bus).where(Bus.id == 1).values(price_per_seat=100)
+    assert 'sync_xid=pg_current_xact_id()::text::bigint' in str(statement.compile(dialect=postgresql.dialect()))
+    assert 'sync_xid=NULL' in str(statement.compile(dialect=sqlite.dialect()))
@@ -0,0 +1,31 @@
+# tests/test_tickets.py
+import base64, hashlib, hmac
+import pytest
+from flask import Flask
+from tickets import TicketSigner
+
+
+@pytest.fixture
+def unkeyed(monkeypatch):
+    monkeypatch.delenv('TICKET_SIGNING_KEY', raising=False)
+    return TicketSigner(Flask(__name__))
+
+
+def test_no_key_refuses_to_sign(unkeyed):
+    assert not unkeyed.configured
+    with pytest.raises(RuntimeError):
+        unkeyed.sign(b'payload')
+
+
+def test_no_key_accepts_no_ticket(unkeyed):
+    # What the old fallback key, sha256('tickets:'), would have signed with
+    payload = b'1|1|12345A|9999999999'
+    signature = hmac.new(hashlib.sha256(b'tickets:').digest(), payload, hashlib.sha256).digest()
+    token = '.'.join(['t1', *(base64.urlsafe_b64encode(part).rstrip(b'=').decode() for part in (payload, signature))])
+    with pytest.raises(ValueError):
+        unkeyed.decode(token)
+
+
+def test_bookings_refused_without_a_key(client, unkeyed, monkeypatch):
+    monkeypatch.setattr('api.reservations.signer', unkeyed)
+    assert client.post('/bookings', json={}).status_code == 503
@@ -0,0 +1,74 @@
+# tests/test_write_behind.py
+import json, os, uuid
+import pytest
+from models import Review, ContactUs
+from writebehind import write_behind
+
+
+@pytest.fixture
+def buffer(app, session):
+    yield write_behind
+    # Leave nothing for the next test's flush
+    with write_behind.lock:
+        write_behind.seal()
+        for segment in write_behind.sealed:
+            segment.remove()
+        write_behind.sealed.clear()
+
+
+def review(**values):
+    return {'name': 'Wanjiru', 'email': 'wanjiru@example.com', 'review': 'On time and clean.', 'rating': 5, **values}
+
+
+def spool(app, entries, torn=''):
+    path = os.path.join(app.config['WRITE_BEHIND_SPOOL'], f'dead-{uuid.uuid4().hex[:8]}.ndjson')
+    with open(path, 'w') as file:
+        file.writelines(json.dumps(entry) + '\n' for entry in entries)
+        file.write(torn)
+    return path
+
+
+def test_review_acknowledged_before_insert(client, session, buffer):
+    response = client.post('/reviews', json=review())
+    assert response.status_code == 202
+    assert response.json['status'] == 'queued'
+    assert session.query(Review).count() == 0
+    assert buffer.flush() == 1
+    assert session.query(Review).one().submission_id == response.json['provisional_id']
+
+
+def test_full_buffer_is_flushed(client, session, buffer, monkeypatch):
+    monkeypatch.setitem(client.application.config, 'WRITE_BEHIND_MAX_ROWS', 3)
+    for rating in (1, 2):
+        client.post('/reviews', json=review(rating=rating))
+    client.post('/contact', json={'name': 'Otieno', 'email': 'otieno@example.com', 'message': 'Lost a bag'})
+    assert session.query(Review).count() == 2
+    assert session.query(ContactUs).one().message == 'Lost a bag'
+    assert buffer.metrics()['buffered'] == 0
+
+
+def test_invalid_submission_rejected_up_front(client, buffer):
+    assert client.post('/reviews', json=review(rating=6)).status_code == 400
+    assert client.post('/reviews', json=review(name='')).status_code == 400
+    assert client.post('/contact', json={'name': 'Otieno'}).status_code == 400
+    assert buffer.metrics()['buffered'] == 0
+
+
+def test_spool_left_by_dead_worker_is_replayed_once(app, session, buffer):
+    entry = {'kind': 'review', 'values': {**review(), 'submission_id': uuid.uuid4().hex,
+                                          'created_at': '2030-01-01T10:00:00'}}
+    # The worker died after inserting the first file but before deleting it, and a torn write at the end
+    first = spool(app, [entry])
+    second = spool(app, [entry], torn='{"kind": "rev')
+    duplicates = buffer.metrics()['duplicates']
+    assert buffer.flush() == 1
+    assert session.query(Review).count() == 1
+    assert buffer.metrics()['duplicates'] == duplicates + 1
+    assert not os.path.exists(first) and not os.path.exists(second)
+
+
+def test_disabled_commits_in_request(client, session, monkeypatch):
+    monkeypatch.setitem(client.application.config, 'WRITE_BEHIND_ENABLED', False)
+    response = client.post('/reviews', json=review())
+    assert response.status_code == 201
+    assert session.get(Review, response.json['id']).rating == 5
@@ -0,0 +1,149 @@
+# tickets.py
+import base64, hashlib, hmac, json, os, time
+from datetime import timedelta, timezone
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from models import Booking, RevokedTicket
+
+# Tickets stay valid this long after the bus is due to arrive
+VALIDITY_AFTER_ARRIVAL = timedelta(hours=6)
+VERSION = 't1'
+
+
+def b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def b64decode(data):
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def epoch(value):
+    # Stored datetimes are naive UTC
+    return int(value.replace(tzinfo=timezone.utc).timestamp())
+
+
+class TicketSigner:
+    """Signs ticket payloads with Ed25519 when a private key is configured, HMAC-SHA256 otherwise.
+
+    Ed25519 lets driver devices verify with the public key from the manifest;
+    with HMAC the shared key has to be provisioned onto the devices.
+    """
+
+    def __init__(self, app=None):
+        self.private_key = None
+        self.secret = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.private_key = self.secret = None
+        key = os.getenv('TICKET_SIGNING_KEY') or app.secret_key
+        if not key:
+            # A key derived from nothing is public, and so would be every signature made with it
+            app.logger.warning('Neither TICKET_SIGNING_KEY nor SECRET_KEY is set; tickets cannot be issued')
+            return
+        if 'PRIVATE KEY' in key:
+            from cryptography.hazmat.primitives.serialization import load_pem_private_key
+            self.private_key = load_pem_private_key(key.replace('\\n', '\n').encode(), password=None)
+        else:
+            self.secret = hashlib.sha256(('tickets:' + key).encode()).digest()
+
+    @property
+    def configured(self):
+        return self.private_key is not None or self.secret is not None
+
+    def require_key(self):
+        if not self.configured:
+            raise RuntimeError('TICKET_SIGNING_KEY or SECRET_KEY must be set to sign tickets')
+
+    @property
+    def algorithm(self):
+        return 'ed25519' if self.private_key else 'hmac-sha256'
+
+    @property
+    def public_key(self):
+        if not self.private_key:
+            return None
+        from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+        return b64encode(self.private_key.public_key().public_bytes(Encoding.Raw, PublicFormat.Raw))
+
+    @property
+    def key_id(self):
+        self.require_key()
+        material = self.public_key.encode() if self.private_key else self.secret
+        return hashlib.sha256(material).hexdigest()[:8]
+
+    def sign(self, message):
+        self.require_key()
+        if self.private_key:
+            return self.private_key.sign(message)
+        return hmac.new(self.secret, message, hashlib.sha256).digest()
+
+    def verify_signature(self, message, signature):
+        if not self.configured:
+            return False
+        if self.private_key:
+            from cryptography.exceptions import InvalidSignature
+            try:
+                self.private_key.public_key().verify(signature, message)
+                return True
+            except InvalidSignature:
+                return False
+        return hmac.compare_digest(self.sign(message), signature)
+
+    def issue(self, booking, bus):
+        """Compact QR string: t1.<bus_id|seat_number|ticket|expiry>.<signature>"""
+        expiry = epoch(bus.arrival_time + VALIDITY_AFTER_ARRIVAL)
+        payload = f'{bus.id}|{booking.seat_number}|{booking.ticket}|{expiry}'.encode()
+        return f'{VERSION}.{b64encode(payload)}.{b64encode(self.sign(payload))}'
+
+    def decode(self, token, now=None):
+        """Returns the ticket fields, or raises ValueError if the token is not valid."""
+        try:
+            version, payload, signature = token.split('.')
+            payload, signature = b64decode(payload), b64decode(signature)
+            bus_id, seat_number, ticket, expiry = payload.decode().split('|')
+        except (ValueError, UnicodeDecodeError):
+            raise ValueError('Malformed ticket')
+        if version != VERSION or not self.verify_signature(payload, signature):
+            raise ValueError('Invalid signature')
+        if int(expiry) < (now or time.time()):
+            raise ValueError('Ticket expired')
+        return {'bus_id': int(bus_id), 'seat_number': seat_number, 'ticket': ticket, 'expiry': int(expiry)}
+
+    def manifest(self, bus, bookings, revoked):
+        body = {
+            'bus_id': bus.id,
+            'number_plate': bus.number_plate,
+            'departure_time': bus.departure_time.isoformat(),
+            'issued_at': int(time.time()),
+            'algorithm': self.algorithm,
+            'key_id': self.key_id,
+            'public_key': self.public_key,
+            'passengers': [{
+                'ticket': booking.ticket,
+                'seat_number': booking.seat_number,
+                'name': booking.name,
+                'idNumber': booking.idNumber
+            } for booking in bookings],
+            'revoked': revoked
+        }
+        canonical = json.dumps(body, sort_keys=True, separators=(',', ':')).encode()
+        return {'manifest': body, 'signature': b64encode(self.sign(canonical))}
+
+
+signer = TicketSigner()
+
+
+@event.listens_for(Session, 'before_flush')
+def revoke_cancelled_tickets(session, flush_context, instances):
+    # Cancelled or deleted bookings go on the revocation list in the same transaction
+    for obj in list(session.deleted) + list(session.dirty):
+        if not isinstance(obj, Booking) or not obj.ticket:
+            continue
+        cancelled_now = obj.status == 'cancelled' and inspect(obj).attrs.status.history.has_changes()
+        # Bookings cancelled earlier are already on the list
+        deleted_live = obj in session.deleted and obj.status != 'cancelled'
+        if cancelled_now or deleted_live:
+            session.add(RevokedTicket(ticket=obj.ticket, bus_id=obj.bus_id))
@@ -0,0 +1,108 @@
+# timetable.py
+import os, threading, time
+from datetime import date, datetime, timedelta
+from models import db, Bus, Seat, Schedule, bus_routes
+from bulk import insert_ignore
+
+# How many days of departures are kept materialized ahead of today
+DAYS_AHEAD = int(os.getenv('TIMETABLE_DAYS_AHEAD', 30))
+
+
+def parse_days(value):
+    # Accepts '1111100' or a list of weekday numbers where Monday is 0
+    if isinstance(value, str):
+        if len(value) != 7 or set(value) - {'0', '1'}:
+            raise ValueError('days_of_week must be 7 characters of 0 or 1')
+        return value
+    days = {int(day) for day in value}
+    if days - set(range(7)):
+        raise ValueError('days_of_week must be between 0 and 6')
+    return ''.join('1' if day in days else '0' for day in range(7))
+
+
+def departures(schedule, start, end):
+    day = start
+    while day <= end:
+        if schedule.runs_on(day):
+            departure_time = datetime.combine(day, schedule.departure_time)
+            arrival_time = datetime.combine(day, schedule.arrival_time)
+            if arrival_time <= departure_time:
+                arrival_time += timedelta(days=1)
+            yield departure_time, arrival_time
+        day += timedelta(days=1)
+
+
+def materialize(days_ahead=DAYS_AHEAD, today=None, schedule_ids=None):
+    """Create the missing Bus departures and seat maps for active schedules."""
+    today = today or date.today()
+    horizon = today + timedelta(days=days_ahead)
+    query = Schedule.query.filter_by(active=True)
+    if schedule_ids:
+        query = query.filter(Schedule.id.in_(schedule_ids))
+
+    created = 0
+    try:
+        for schedule in query.all():
+            # Only the days after what was generated last time
+            start = max(today, schedule.start_date)
+            if schedule.generated_until and schedule.generated_until >= start:
+                start = schedule.generated_until + timedelta(days=1)
+            end = min(horizon, schedule.end_date) if schedule.end_date else horizon
+            if start > end:
+                continue
+
+            route = schedule.route
+            insert_ignore(Bus.__table__, [{
+                'driver_id': schedule.driver_id,
+                'schedule_id': schedule.id,
+                'number_plate': schedule.number_plate,
+                'number_of_seats': schedule.number_of_seats,
+                'seats_available': schedule.number_of_seats,
+                'departure_from': route.departure_from,
+                'departure_to': route.departure_to,
+                'departure_from_id': route.departure_from_id,
+                'departure_to_id': route.departure_to_id,
+                'departure_time': departure_time,
+                'arrival_time': arrival_time,
+                'price_per_seat': schedule.price_per_seat
+            } for departure_time, arrival_time in departures(schedule, start, end)])
+
+            # Departures in the window without a seat map are the ones just inserted
+            new_ids = [id for id, in db.session.query(Bus.id).filter(
+                Bus.schedule_id == schedule.id,
+                Bus.departure_time >= datetime.combine(start, datetime.min.time()),
+                Bus.departure_time < datetime.combine(end + timedelta(days=1), datetime.min.time()),
+                ~Bus.seats.any()
+            )]
+            insert_ignore(Seat.__table__, [
+                {'bus_id': bus_id, 'seat_number': str(number), 'status': 'available'}
+                for bus_id in new_ids for number in range(1, schedule.number_of_seats + 1)
+            ])
+            insert_ignore(bus_routes, [{'bus_id': bus_id, 'route_id': schedule.route_id} for bus_id in new_ids])
+
+            schedule.generated_until = end
+            created += len(new_ids)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return created
+
+
+def start_generator(app, interval, days_ahead=DAYS_AHEAD):
+    # Keeps departures materialized in a daemon thread; safe to run on every
+    # worker because inserts are idempotent on (schedule_id, departure_time)
+    def run():
+        while True:
+            with app.app_context():
+                try:
+                    materialize(days_ahead)
+                except Exception:
+                    app.logger.exception('Departure generation failed')
+                finally:
+                    db.session.remove()
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name='timetable-generator', daemon=True)
+    thread.start()
+    return thread
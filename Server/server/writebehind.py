@@ -0,0 +1,250 @@
+# writebehind.py
+"""Reviews and contact messages, acknowledged at once and inserted in batches.
+
+Each submission is appended to a spool file before it is acknowledged, and
+buffered in memory. A background thread inserts the buffer with multi-row
+INSERTs every WRITE_BEHIND_MAX_DELAY seconds, or as soon as it holds
+WRITE_BEHIND_MAX_ROWS, then deletes the spool file.
+
+A process that dies leaves its spool files behind; the next flush in any
+worker replays them. Every submission carries a unique submission_id, so rows
+written just before a crash aren't inserted twice.
+"""
+import glob, json, os, threading, uuid
+from datetime import datetime
+from itertools import count
+from sqlalchemy.exc import DataError, IntegrityError
+from models import db, Review, ContactUs
+from bulk import insert_ignore
+from jobs import utcnow
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+MODELS = {'review': Review, 'contact': ContactUs}
+
+
+def lock(file, wait=True):
+    """Locks a spool file until it is closed or its process dies; False if another process holds it."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(file, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            # The first byte stands for the file; appends and reads are unaffected
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK if wait else msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+class Segment:
+    """One spool file, locked for as long as this process is writing to or flushing it."""
+
+    def __init__(self, path, file):
+        self.path = path
+        self.file = file
+        self.entries = []
+
+    @classmethod
+    def create(cls, directory, number):
+        path = os.path.join(directory, f'{os.getpid()}-{uuid.uuid4().hex[:8]}-{number:06d}.ndjson')
+        file = open(path, 'a', encoding='utf-8')
+        if not lock(file):
+            file.close()
+            raise OSError(f'Could not lock {path}')
+        return cls(path, file)
+
+    @classmethod
+    def claim(cls, path):
+        # Another live process holds the lock on its own files
+        try:
+            file = open(path, 'r+', encoding='utf-8')
+        except FileNotFoundError:
+            # Flushed by another worker since the directory was listed
+            return None
+        if not lock(file, wait=False):
+            file.close()
+            return None
+        segment = cls(path, file)
+        # A torn last line is a submission that was never acknowledged
+        for line in file:
+            try:
+                segment.entries.append(json.loads(line))
+            except ValueError:
+                pass
+        return segment
+
+    def append(self, entry):
+        # On disk before the client hears back, so a crash can't lose an acknowledged row
+        self.file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.entries.append(entry)
+
+    def seal(self):
+        self.file.flush()
+
+    def remove(self):
+        if fcntl is None:
+            # Windows can't delete an open file
+            self.close()
+        os.remove(self.path)
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+
+def write(entries):
+    """Inserts the entries; returns how many rows went in."""
+    written = 0
+    for kind, model in MODELS.items():
+        rows = [dict(entry['values'], created_at=datetime.fromisoformat(entry['values']['created_at']))
+                for entry in entries if entry['kind'] == kind]
+        if rows:
+            # ON CONFLICT DO NOTHING skips submissions a replayed spool already inserted
+            written += insert_ignore(model.__table__, rows)
+    return written
+
+
+class WriteBehind:
+    def __init__(self, app=None):
+        self.app = None
+        self.segment = None
+        self.sealed = []
+        self.numbers = count(1)
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+        self.stats = {'queued': 0, 'written': 0, 'batches': 0, 'dropped': 0, 'duplicates': 0, 'recovered': 0,
+                      'failures': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # Off: reviews and contact messages are committed in the request, as before
+        app.config.setdefault('WRITE_BEHIND_ENABLED', True)
+        app.config.setdefault('WRITE_BEHIND_MAX_ROWS', 200)
+        # None: no background thread; the buffer is flushed by size or by calling flush()
+        app.config.setdefault('WRITE_BEHIND_MAX_DELAY', 2.0)
+        app.config.setdefault('WRITE_BEHIND_SPOOL', os.getenv('WRITE_BEHIND_SPOOL', 'spool'))
+        self.app = app
+
+    @property
+    def enabled(self):
+        return self.app.config['WRITE_BEHIND_ENABLED']
+
+    def submit(self, kind, values):
+        """Spools and buffers a row for MODELS[kind]; returns its provisional id."""
+        config = self.app.config
+        submission_id = uuid.uuid4().hex
+        entry = {'kind': kind, 'values': {**values, 'submission_id': submission_id,
+                                          'created_at': utcnow().isoformat()}}
+        with self.lock:
+            if self.segment is None:
+                os.makedirs(config['WRITE_BEHIND_SPOOL'], exist_ok=True)
+                self.segment = Segment.create(config['WRITE_BEHIND_SPOOL'], next(self.numbers))
+            self.segment.append(entry)
+            self.stats['queued'] += 1
+            full = len(self.segment.entries) >= config['WRITE_BEHIND_MAX_ROWS']
+            if full:
+                self.seal()
+            if self.thread is None and config['WRITE_BEHIND_MAX_DELAY'] is not None:
+                self.thread = threading.Thread(target=self.run, name='write-behind', daemon=True)
+                self.thread.start()
+        if full:
+            if self.thread is not None:
+                self.wake.set()
+            else:
+                self.flush()
+        return submission_id
+
+    def seal(self):
+        # Called with self.lock held; later submissions start a new spool file
+        if self.segment is not None and self.segment.entries:
+            self.segment.seal()
+            self.sealed.append(self.segment)
+            self.segment = None
+
+    def flush(self):
+        """Inserts the buffer and any spool files left by dead processes; returns the submissions written."""
+        with self.flush_lock:
+            with self.lock:
+                self.seal()
+                segments = list(self.sealed)
+            orphans = [segment for segment in map(Segment.claim, sorted(glob.glob(
+                os.path.join(self.app.config['WRITE_BEHIND_SPOOL'], '*.ndjson')))) if segment is not None]
+            written = 0
+            try:
+                for segment in segments + orphans:
+                    written += self.insert(segment)
+                    with self.lock:
+                        if segment in self.sealed:
+                            self.sealed.remove(segment)
+                        elif segment in orphans:
+                            self.stats['recovered'] += len(segment.entries)
+                    segment.remove()
+            finally:
+                # Unlocked, so whichever worker flushes next picks them up
+                for segment in orphans:
+                    if not segment.file.closed:
+                        segment.close()
+            return written
+
+    def insert(self, segment):
+        written = dropped = 0
+        try:
+            written = write(segment.entries)
+            db.session.commit()
+        except (IntegrityError, DataError):
+            # One bad row fails the whole statement; insert the rest one at a time
+            db.session.rollback()
+            for entry in segment.entries:
+                try:
+                    written += write([entry])
+                    db.session.commit()
+                except (IntegrityError, DataError):
+                    db.session.rollback()
+                    dropped += 1
+                    self.app.logger.warning('Dropped %s submission %s', entry['kind'], entry['values']['submission_id'])
+        except Exception:
+            db.session.rollback()
+            with self.lock:
+                self.stats['failures'] += 1
+            raise
+        with self.lock:
+            self.stats['written'] += written
+            self.stats['dropped'] += dropped
+            # Already inserted from this spool file before a crash
+            self.stats['duplicates'] += len(segment.entries) - written - dropped
+            self.stats['batches'] += 1
+        return written
+
+    def run(self):
+        while True:
+            self.wake.wait(self.app.config['WRITE_BEHIND_MAX_DELAY'])
+            self.wake.clear()
+            with self.app.app_context():
+                try:
+                    self.flush()
+                except Exception:
+                    # The spool files stay; the next pass tries them again
+                    self.app.logger.exception('Flushing buffered submissions failed')
+                finally:
+                    db.session.remove()
+
+    def metrics(self):
+        with self.lock:
+            buffered = sum(len(segment.entries) for segment in self.sealed)
+            if self.segment is not None:
+                buffered += len(self.segment.entries)
+            return {**self.stats, 'buffered': buffered}
+
+
+write_behind = WriteBehind()
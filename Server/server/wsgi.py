@@ -0,0 +1,9 @@
+# wsgi.py
+# gunicorn wsgi:app
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app import create_app
+
+app = create_app()